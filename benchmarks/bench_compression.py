@@ -0,0 +1,82 @@
+"""Benchmark compressing recorded experiment data.
+
+Typical records (per-epoch metrics, repeated keys and a small array) are
+serialized without compression and with zlib and zstd (if installed) at
+several levels. For each setting, the size of the stored documents and the
+encode and decode throughput are reported. Run with::
+
+    python benchmarks/bench_compression.py --records 1000 --epochs 200
+"""
+import argparse
+import time
+import numpy as np
+from pytest_experiments.compression import (
+    CompressionError,
+    compressing_serializer,
+)
+from pytest_experiments.json_tools import json_deserializer, json_serializer
+
+SETTINGS = [
+    (None, None),
+    ("zlib", 1),
+    ("zlib", 6),
+    ("zlib", 9),
+    ("zstd", 1),
+    ("zstd", 3),
+    ("zstd", 9),
+    ("zstd", 19),
+]
+
+
+def make_record(i: int, epochs: int) -> dict:
+    rng = np.random.default_rng(i)
+    losses = np.round(1.0 / np.arange(1, epochs + 1) + rng.random(epochs), 6)
+    return {
+        "history": [
+            {"epoch": epoch, "loss": loss, "lr": 0.01}
+            for epoch, loss in enumerate(losses.tolist())
+        ],
+        "confusion": rng.integers(0, 100, (10, 10)),
+    }
+
+
+def bench(records: list, algorithm, level) -> tuple:
+    """Return the total size and the encode and decode seconds."""
+    serialize = json_serializer
+    if algorithm is not None:
+        serialize = compressing_serializer(algorithm, level)
+    start = time.perf_counter()
+    documents = [serialize(record) for record in records]
+    encoded = time.perf_counter()
+    for document in documents:
+        json_deserializer(document)
+    decoded = time.perf_counter()
+    size = sum(len(document) for document in documents)
+    return size, encoded - start, decoded - encoded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--epochs", type=int, default=200)
+    args = parser.parse_args()
+    records = [make_record(i, args.epochs) for i in range(args.records)]
+    baseline = None
+    for algorithm, level in SETTINGS:
+        try:
+            size, encode, decode = bench(records, algorithm, level)
+        except CompressionError as error:
+            print(f"{algorithm}-{level}: {error}")
+            continue
+        baseline = baseline or size
+        megabytes = size / 1e6
+        print(
+            f"{algorithm or 'none'}-{level or '':<2}  "
+            f"{megabytes:8.2f}MB ({100 * size / baseline:5.1f}%)  "
+            f"encode {args.records / encode:8.0f} records/s  "
+            f"decode {args.records / decode:8.0f} records/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark serializing experiments to JSON with each backend.
+
+Records with many parameters and recorded values, including numpy arrays
+and datetimes, are serialized with the standard library and with orjson
+(if installed). Run with::
+
+    python benchmarks/bench_json.py --records 2000 --keys 200
+"""
+import argparse
+import datetime as dt
+import time
+import numpy as np
+from pytest_experiments import json_tools
+
+
+def make_record(i: int, keys: int) -> dict:
+    return {
+        "when": dt.datetime.utcnow(),
+        "losses": [1.0 / (i + k + 1) for k in range(keys)],
+        "metrics": {f"metric_{k}": k * 0.5 for k in range(keys)},
+        "weights": np.linspace(0.0, 1.0, 64),
+        "labels": [f"label_{k}" for k in range(keys // 10)],
+    }
+
+
+def bench(records: list, backend: str) -> float:
+    """Return the seconds taken to serialize `records`."""
+    json_tools.use_json_backend(backend)
+    start = time.perf_counter()
+    for record in records:
+        json_tools.json_serializer(record)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--keys", type=int, default=200)
+    args = parser.parse_args()
+    records = [make_record(i, args.keys) for i in range(args.records)]
+    for backend in ("json", "orjson"):
+        try:
+            elapsed = bench(records, backend)
+        except ImportError:
+            print(f"{backend:6}  not installed")
+            continue
+        print(
+            f"{backend:6}  {args.records} records in {elapsed:.2f}s  "
+            f"({1e6 * elapsed / args.records:.0f}us/record)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Benchmark the overhead of the plugin on every test.
+
+Two benchmarks are run against each database: SQLite in a temporary
+directory and, if ``--postgres`` is given, a PostgreSQL database (e.g. a
+local ``postgresql://localhost/experiments`` server, which requires
+psycopg2).
+
+- *sessions*: a test module with 1k, 10k and 100k parametrized cases runs
+  in a pytest subprocess with and without the ``notebook`` fixture. The
+  difference between the two wall times, divided by the number of cases,
+  is the per-test overhead of the plugin.
+- *payloads*: the stages of recording one experiment are timed in process
+  for payloads from a scalar to large numpy arrays: constructing the
+  `Experiment`, rendering it with `to_model`, encoding it to JSON and
+  recording it (which encodes it again and commits it).
+
+Results are printed and written as JSON to ``--output``, so that changes to
+storage and serialization can be compared. Run with::
+
+    python benchmarks/bench_overhead.py --cases 1000,10000 --output a.json
+"""
+import argparse
+import datetime as dt
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+import numpy as np
+import sqlalchemy
+from pytest_experiments.common import ExperimentOutcome
+from pytest_experiments.experiment import Experiment
+from pytest_experiments.json_tools import json_serializer
+from pytest_experiments.store import StorageManager
+
+TEST_MODULE = """
+import pytest
+
+@pytest.mark.parametrize("i", range({cases}))
+def test_case({fixtures}i):
+    {body}
+"""
+
+PAYLOADS: Dict[str, Callable[[], dict]] = {
+    "scalar": lambda: {"loss": 0.5},
+    "dict_100": lambda: {f"metric_{k}": k * 0.5 for k in range(100)},
+    "list_1k": lambda: {"losses": [1.0 / (k + 1) for k in range(1_000)]},
+    "ndarray_1k": lambda: {"weights": np.random.rand(1_000)},
+    "ndarray_100k": lambda: {"weights": np.random.rand(100_000)},
+    "ndarray_1m": lambda: {"weights": np.random.rand(1_000_000)},
+}
+
+
+def bench_session(tmp: Path, db_uri: str, cases: int) -> dict:
+    """Return the wall times of sessions with and without the plugin."""
+    seconds = {}
+    for variant, fixtures, body in (
+        ("plain", "", "pass"),
+        ("notebook", "notebook, ", "notebook.record(loss=1.0 / (i + 1))"),
+    ):
+        path = tmp / f"test_{variant}_{cases}.py"
+        path.write_text(
+            TEST_MODULE.format(cases=cases, fixtures=fixtures, body=body)
+        )
+        start = time.perf_counter()
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "pytest",
+                "-q",
+                "-p",
+                "no:cacheprovider",
+                f"--experiments-database={db_uri}",
+                str(path),
+            ],
+            cwd=tmp,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        seconds[variant] = time.perf_counter() - start
+    overhead = seconds["notebook"] - seconds["plain"]
+    return {
+        "cases": cases,
+        "plain_seconds": seconds["plain"],
+        "notebook_seconds": seconds["notebook"],
+        "overhead_us_per_test": 1e6 * overhead / cases,
+    }
+
+
+def bench_payload(store: StorageManager, name: str, repeat: int) -> dict:
+    """Return the mean time of each stage of recording a payload."""
+    data = PAYLOADS[name]()
+    timings: Dict[str, List[float]] = {
+        "construct": [],
+        "to_model": [],
+        "encode": [],
+        "record": [],
+    }
+    encoded_bytes = 0
+    for i in range(repeat):
+        request = _fake_request(f"bench_overhead.py::test_{name}[{i}]", i)
+        start = time.perf_counter()
+        experiment = Experiment(request, store)
+        timings["construct"].append(time.perf_counter() - start)
+        experiment.record(**data)
+        experiment.completed_at = dt.datetime.utcnow()
+        experiment.outcome = ExperimentOutcome.passed
+        start = time.perf_counter()
+        model = experiment.to_model()
+        timings["to_model"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        encoded_bytes = len(json_serializer(model.data).encode())
+        timings["encode"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        store.record_experiment(model)
+        timings["record"].append(time.perf_counter() - start)
+    result: dict = {"payload": name, "encoded_bytes": encoded_bytes}
+    for stage, seconds in timings.items():
+        result[f"{stage}_us"] = 1e6 * sum(seconds) / repeat
+    return result
+
+
+def _fake_request(nodeid: str, i: int) -> SimpleNamespace:
+    """A stand-in for the fixture request of a test."""
+    node = SimpleNamespace(nodeid=nodeid, funcargs={"i": i})
+    return SimpleNamespace(node=node)
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "numpy": np.__version__,
+        "time": dt.datetime.utcnow().isoformat(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--cases",
+        default="1000,10000,100000",
+        help="Comma separated numbers of test cases per session.",
+    )
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument(
+        "--payloads", default=",".join(PAYLOADS), help="Comma separated."
+    )
+    parser.add_argument("--postgres", metavar="URI", default=None)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+    cases = [int(n) for n in args.cases.split(",") if n]
+    payloads = [name for name in args.payloads.split(",") if name]
+    report: dict = {"environment": environment(), "databases": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        databases = {"sqlite": f"sqlite:///{Path(tmp) / 'experiments.db'}"}
+        if args.postgres is not None:
+            databases["postgresql"] = args.postgres
+        for database, db_uri in databases.items():
+            results = report["databases"][database] = {
+                "sessions": [],
+                "payloads": [],
+            }
+            for n in cases:
+                result = bench_session(Path(tmp), db_uri, n)
+                results["sessions"].append(result)
+                print(
+                    f"{database:10}  {n:>7} cases  "
+                    f"plain {result['plain_seconds']:7.2f}s  "
+                    f"notebook {result['notebook_seconds']:7.2f}s  "
+                    f"({result['overhead_us_per_test']:.0f}us/test)"
+                )
+            store = StorageManager(db_uri)
+            for name in payloads:
+                result = bench_payload(store, name, args.repeat)
+                results["payloads"].append(result)
+                print(
+                    f"{database:10}  {name:12}  "
+                    f"{result['encoded_bytes']:>10} bytes  "
+                    f"construct {result['construct_us']:6.0f}us  "
+                    f"to_model {result['to_model_us']:6.0f}us  "
+                    f"encode {result['encode_us']:8.0f}us  "
+                    f"record {result['record_us']:8.0f}us"
+                )
+            store.dispose()
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark the memory and time taken to read experiments.
+
+Experiments are read as ORM ``ExperimentModel`` instances and as compact
+``ExperimentRow`` records (``lazy=True``), whose JSON columns are decoded
+on first access. Memory is measured with ``tracemalloc`` while every row
+is held in memory. Run with::
+
+    python benchmarks/bench_rows.py --experiments 100000
+"""
+import argparse
+import datetime as dt
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from pytest_experiments.store import StorageManager, ExperimentModel
+
+
+def make_experiment(i: int) -> ExperimentModel:
+    now = dt.datetime.utcnow()
+    return ExperimentModel(
+        name=f"bench_rows.py::test_experiment[{i}]",
+        start_time=now,
+        end_time=now,
+        outcome="passed",
+        parameters={"i": i, "learning_rate": 0.01, "optimizer": "sgd"},
+        data={"loss": 1.0 / (i + 1), "accuracy": 0.5},
+    )
+
+
+def bench(store: StorageManager, lazy: bool, decode: bool) -> tuple:
+    """Return the bytes per row and the seconds taken to read all rows."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = store.get_all_experiments(lazy=lazy)
+    for row in rows:
+        if decode:
+            row.data  # pylint: disable=pointless-statement
+        else:
+            row.name  # pylint: disable=pointless-statement
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(rows), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--experiments", type=int, default=100_000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = StorageManager(f"sqlite:///{Path(tmp) / 'experiments.db'}")
+        store.record_experiments(
+            make_experiment(i) for i in range(args.experiments)
+        )
+        for label, lazy, decode in [
+            ("ExperimentModel", False, True),
+            ("ExperimentRow", True, False),
+            ("ExperimentRow, data decoded", True, True),
+        ]:
+            per_row, elapsed = bench(store, lazy, decode)
+            print(
+                f"{label:28} {per_row:6.0f} bytes/row  "
+                f"{args.experiments} rows in {elapsed:.2f}s"
+            )
+        store.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Benchmark recording experiments to SQLite with the fast profile.
+
+Experiments are recorded with and without ``--experiments-sqlite-fast``.
+
+Each experiment is recorded in its own transaction, as the ``notebook``
+fixture does by default. Run with::
+
+    python benchmarks/bench_sqlite.py --experiments 5000
+"""
+import argparse
+import datetime as dt
+import tempfile
+import time
+from pathlib import Path
+from pytest_experiments.store import StorageManager, ExperimentModel
+
+
+def make_experiment(i: int) -> ExperimentModel:
+    now = dt.datetime.utcnow()
+    return ExperimentModel(
+        name=f"bench_sqlite.py::test_experiment[{i}]",
+        start_time=now,
+        end_time=now,
+        outcome="passed",
+        parameters={"i": i, "learning_rate": 0.01},
+        data={"loss": 1.0 / (i + 1), "accuracy": 0.5},
+    )
+
+
+def bench(db_path: Path, experiments: int, sqlite_fast: bool) -> float:
+    """Return the seconds taken to record `experiments` experiments."""
+    store = StorageManager(f"sqlite:///{db_path}", sqlite_fast=sqlite_fast)
+    start = time.perf_counter()
+    for i in range(experiments):
+        store.record_experiment(make_experiment(i))
+    elapsed = time.perf_counter() - start
+    store.dispose()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--experiments", type=int, default=5000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        for sqlite_fast in (False, True):
+            db_path = Path(tmp) / f"fast-{sqlite_fast}.db"
+            elapsed = bench(db_path, args.experiments, sqlite_fast)
+            print(
+                f"sqlite_fast={sqlite_fast!s:5}  "
+                f"{args.experiments} experiments in {elapsed:.2f}s  "
+                f"({1e6 * elapsed / args.experiments:.0f}us/experiment)"
+            )
+
+
+if __name__ == "__main__":
+    main()
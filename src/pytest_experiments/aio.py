@@ -0,0 +1,399 @@
+"""Record experiments from asyncio code without blocking the event loop.
+
+`AsyncStorageManager` is the asyncio counterpart of `StorageManager`, built
+on `sqlalchemy.ext.asyncio`. It requires an asyncio database driver:
+`aiosqlite`_ for SQLite or `asyncpg`_ for PostgreSQL.
+
+Asyncio engines and their pooled connections belong to the event loop they
+are used in, while test frameworks may run each test in its own loop. The
+`async_notebook` fixture therefore writes through an `AsyncWriter`, which
+runs one engine for the whole session on an event loop of its own, in a
+`LoopThread`. Tests share its connection pool, and writes are awaited from
+any loop (or scheduled from none) without blocking it.
+
+.. _`aiosqlite`: https://pypi.org/project/aiosqlite/
+.. _`asyncpg`: https://pypi.org/project/asyncpg/
+"""
+import asyncio
+import concurrent.futures
+import datetime as dt
+import threading
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Union,
+)
+from sqlalchemy import select, update
+from sqlalchemy.engine import make_url
+from .common import PytestExperimentsError, PytestOutcome, PytestReportPhase
+from .compression import compressing_serializer
+from .config import ASYNC_DRIVERS, QUERY_BATCH_SIZE
+from .experiment import Experiment, ExperimentError
+from .json_tools import json_deserializer, json_serializer
+from .store import (
+    ExperimentModel,
+    RunModel,
+    experiment_filters,
+    initialize_database,
+    promoted_values,
+    split_promoted_key,
+)
+from .writers import WriteFailure
+
+
+def async_db_uri(db_uri: str) -> str:
+    """Return the URI of a database with an asyncio driver.
+
+    URIs without an explicit driver get the asyncio driver of their
+    backend (see `config.ASYNC_DRIVERS`), e.g. ``sqlite:///experiments.db``
+    becomes ``sqlite+aiosqlite:///experiments.db``.
+    """
+    url = make_url(db_uri)
+    backend = url.get_backend_name()
+    if url.drivername == backend and backend in ASYNC_DRIVERS:
+        url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+    return str(url)
+
+
+class AsyncStorageManager:
+    """Manage the connection to an experiments database from asyncio code.
+
+    The schema is created, or migrated, the first time the database is
+    used. An instance must only be used from one event loop at a time (see
+    `AsyncWriter` to share one across loops).
+
+    Args:
+        db_uri (str): The database URI. The asyncio driver of SQLite and
+            PostgreSQL URIs is selected automatically.
+        promote: Parameters and data keys to promote to the indexed
+            experiment values table (see `StorageManager`).
+        compression (str): If ``"zlib"`` or ``"zstd"``, compress large JSON
+            documents.
+        compression_level (int): The compression level; the algorithm's
+            default if None.
+        engine_options: Passed to `create_async_engine` (e.g. the pool
+            size).
+    """
+
+    def __init__(
+        self,
+        db_uri: str,
+        promote: Iterable[str] = (),
+        compression: Optional[str] = None,
+        compression_level: Optional[int] = None,
+        **engine_options,
+    ) -> None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        self._db_uri = db_uri
+        self.promote = tuple(promote)
+        for column in self.promote:
+            split_promoted_key(column)
+        serializer = json_serializer
+        if compression is not None:
+            serializer = compressing_serializer(compression, compression_level)
+        uri = async_db_uri(db_uri)
+        try:
+            self.engine = create_async_engine(
+                uri,
+                json_serializer=serializer,
+                json_deserializer=json_deserializer,
+                **engine_options,
+            )
+        except ImportError as error:
+            raise AsyncStorageError(
+                f"{make_url(uri).drivername} requires its asyncio driver "
+                f"({error.name}) to be installed"
+            ) from error
+        self._initialization: Optional[asyncio.Future] = None
+
+    @property
+    def db_uri(self) -> str:
+        return self._db_uri
+
+    async def initialize(self):
+        """Create or migrate the schema, once.
+
+        Concurrent callers wait for the same initialization.
+        """
+        if self._initialization is None:
+            self._initialization = asyncio.ensure_future(self._initialize())
+        await asyncio.shield(self._initialization)
+
+    async def _initialize(self):
+        async with self.engine.begin() as connection:
+            await connection.run_sync(initialize_database)
+
+    async def create_session(self):
+        """Create an asyncio database session.
+
+        Loaded objects are not expired on commit, so their attributes can be
+        read without further IO.
+        """
+        from sqlalchemy.ext.asyncio import AsyncSession
+
+        await self.initialize()
+        return AsyncSession(self.engine, expire_on_commit=False)
+
+    async def record_experiment(self, experiment: ExperimentModel):
+        """Record an experiment to the database."""
+        if self.promote:
+            experiment.values = promoted_values(experiment, self.promote)
+        async with await self.create_session() as session:
+            async with session.begin():
+                session.add(experiment)
+
+    async def record_experiments(self, experiments: Iterable[ExperimentModel]):
+        """Record many experiments to the database in one transaction."""
+        experiments = list(experiments)
+        if self.promote:
+            for experiment in experiments:
+                experiment.values = promoted_values(experiment, self.promote)
+        async with await self.create_session() as session:
+            async with session.begin():
+                session.add_all(experiments)
+
+    async def record_run(self, run: RunModel):
+        """Record a run."""
+        async with await self.create_session() as session:
+            async with session.begin():
+                session.add(run)
+
+    async def finish_run(self, run_id: str, end_time: dt.datetime):
+        """Record the end of a run."""
+        statement = (
+            update(RunModel)
+            .where(RunModel.id == run_id)
+            .values(end_time=end_time)
+        )
+        async with await self.create_session() as session:
+            async with session.begin():
+                await session.execute(statement)
+
+    async def get_all_experiments(self) -> List[ExperimentModel]:
+        """Return all experiments in the database."""
+        async with await self.create_session() as session:
+            result = await session.execute(select(ExperimentModel))
+            return result.scalars().all()
+
+    async def query_experiments(
+        self,
+        name: Optional[str] = None,
+        outcome: Union[str, Iterable[str], None] = None,
+        since: Optional[dt.datetime] = None,
+        until: Optional[dt.datetime] = None,
+        parameters: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        batch_size: int = QUERY_BATCH_SIZE,
+        run_id: Optional[str] = None,
+    ) -> AsyncIterator[ExperimentModel]:
+        """Stream the experiments that match some criteria.
+
+        See `StorageManager.query_experiments` for the criteria. Rows are
+        fetched `batch_size` at a time.
+        """
+        criteria = experiment_filters(
+            name, outcome, since, until, parameters, self.promote, run_id
+        )
+        statement = (
+            select(ExperimentModel)
+            .where(*criteria)
+            .order_by(ExperimentModel.id)
+            .execution_options(yield_per=batch_size)
+        )
+        if limit is not None:
+            statement = statement.limit(limit)
+        async with await self.create_session() as session:
+            result = await session.stream(statement)
+            async for experiment in result.scalars():
+                yield experiment
+
+    async def dispose(self):
+        """Close all pooled connections held by the engine."""
+        await self.engine.dispose()
+
+
+class LoopThread:
+    """An event loop running in a daemon thread, started on first use."""
+
+    def __init__(self, name: str = "experiments-loop") -> None:
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run, name=name, daemon=True
+        )
+        self._lock = threading.Lock()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine: Awaitable) -> concurrent.futures.Future:
+        """Run a coroutine on the loop and return its future."""
+        with self._lock:
+            if self.loop.is_closed():
+                raise AsyncStorageError("The event loop thread is closed")
+            if not self._thread.is_alive():
+                self._thread.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def close(self):
+        """Stop the loop and wait for its thread to exit."""
+        with self._lock:
+            if self._thread.is_alive():
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self._thread.join()
+            if not self.loop.is_closed():
+                self.loop.close()
+
+
+class AsyncWriter:
+    """Write experiments through an `AsyncStorageManager` on its own loop.
+
+    The store is only used from the loop of `loop_thread`, so its engine
+    and connection pool are shared by every caller, whatever event loop
+    they run in. Failed writes are collected in `errors` rather than
+    raised by `record_experiment_soon`.
+
+    Args:
+        store (AsyncStorageManager): The store to write to.
+        loop_thread (LoopThread): The loop to run the store on; a new one by
+            default.
+    """
+
+    def __init__(
+        self,
+        store: AsyncStorageManager,
+        loop_thread: Optional[LoopThread] = None,
+    ) -> None:
+        self.store = store
+        self.loop_thread = loop_thread or LoopThread()
+        self.errors: List[WriteFailure] = []
+        self._pending: Set[concurrent.futures.Future] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def db_uri(self) -> str:
+        return self.store.db_uri
+
+    def record_experiment_soon(
+        self, experiment: ExperimentModel
+    ) -> concurrent.futures.Future:
+        """Schedule the write of an experiment and return without waiting.
+
+        This may be called from any thread, with or without a running event
+        loop.
+        """
+        future = self.loop_thread.submit(
+            self.store.record_experiment(experiment)
+        )
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    async def record_experiment(self, experiment: ExperimentModel):
+        """Write an experiment, suspending the caller until it is written."""
+        await asyncio.wrap_future(self.record_experiment_soon(experiment))
+
+    def _done(self, future: concurrent.futures.Future):
+        with self._lock:
+            self._pending.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            self.errors.append(WriteFailure(future.exception(), 1))
+
+    def flush(self):
+        """Block until every scheduled experiment has been written."""
+        with self._lock:
+            pending = list(self._pending)
+        concurrent.futures.wait(pending)
+
+    def close(self):
+        """Wait for scheduled writes, then dispose of the store and loop."""
+        self.flush()
+        self.loop_thread.submit(self.store.dispose()).result()
+        self.loop_thread.close()
+
+
+class AsyncExperiment(Experiment):
+    """An experiment whose results are written without blocking.
+
+    Its writer is usually an `AsyncWriter`: `finish` is a coroutine that
+    suspends the caller until the experiment is written, and `finish_soon`
+    schedules the write and returns at once. Other writers (e.g. the
+    `WorkerOutputWriter` of pytest-xdist workers) are called directly.
+
+    An experiment is finished, and written, once the outcome of its test
+    is known: the `async_notebook` fixture finishes it at teardown, and
+    finishing it while the test runs raises an `ExperimentError`.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._finished = False
+        self._write: Optional[concurrent.futures.Future] = None
+
+    def save_soon(self) -> concurrent.futures.Future:
+        """Schedule the write of this experiment."""
+        model = self.to_model()
+        record_soon = getattr(self.writer, "record_experiment_soon", None)
+        if record_soon is not None:
+            return record_soon(model)
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        try:
+            self.writer.record_experiment(model)
+        except Exception as e:  # pylint: disable=broad-except
+            future.set_exception(e)
+        else:
+            future.set_result(None)
+        return future
+
+    async def save(self):  # pylint: disable=invalid-overridden-method
+        """Save this experiment, waiting until it is written."""
+        await asyncio.wrap_future(self.save_soon())
+
+    def finish_soon(self) -> Optional[concurrent.futures.Future]:
+        """Post process the experiment and schedule its write.
+
+        Returns the future of the write, or None if the results of the
+        experiment were reused from a previous run. Later calls return the
+        future of the first one without writing the experiment again.
+
+        Raises:
+            ExperimentError: If the test has been set up but has not been
+                reported yet.
+        """
+        if self._finished:
+            return self._write
+        reports = self.get_reports()
+        setup = reports.get(PytestReportPhase.setup)
+        if (
+            setup is PytestOutcome.passed
+            and PytestReportPhase.call not in reports
+        ):
+            raise ExperimentError(
+                "An async experiment may only be finished after its test has "
+                "run; the async_notebook fixture finishes it at teardown."
+            )
+        self._finished = True
+        self.post_process()
+        if not self.reused:
+            self._write = self.save_soon()
+        if self._series is not None:
+            self._series.close()
+        return self._write
+
+    async def finish(self):  # pylint: disable=invalid-overridden-method
+        """Post process the experiment and wait until it is written."""
+        future = self.finish_soon()
+        if future is not None:
+            await asyncio.wrap_future(future)
+
+
+class AsyncStorageError(PytestExperimentsError):
+    pass
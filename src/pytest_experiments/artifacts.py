@@ -0,0 +1,199 @@
+"""A content-addressed store for large recorded values.
+
+Large values recorded in a notebook are written to files named by the hash
+of their content and only a small `ArtifactRef` is stored with the
+experiment. Identical values recorded by different experiments are stored
+once.
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Union
+from .config import ARTIFACT_MIN_SIZE
+from .common import PytestExperimentsError
+from .json_tools import json_serializer, json_deserializer
+
+_CHUNK_SIZE = 1 << 20
+_SCALAR_TYPES = (bool, int, float, type(None))
+_MAX_NUMBER_SIZE = 24  # characters, e.g. -1.2345678901234567e-308
+
+
+@dataclass(frozen=True)
+class ArtifactRef:
+    """A reference to a value in an `ArtifactStore`."""
+
+    digest: str
+    """The SHA-256 digest of the artifact content."""
+    kind: str
+    """How the content is encoded: one of "npy", "bytes" or "json"."""
+    size: int
+    """The size of the artifact content in bytes."""
+
+
+class ArtifactStore:
+    """Store values in a directory as files named by their content hash.
+
+    Args:
+        root: The directory in which to store artifacts.
+        min_size (int): Values smaller than this many bytes are not stored
+            by `maybe_put`.
+    """
+
+    def __init__(
+        self, root: Union[str, Path], min_size: int = ARTIFACT_MIN_SIZE
+    ) -> None:
+        self.root = Path(root)
+        self.min_size = min_size
+
+    def path(self, ref: ArtifactRef) -> Path:
+        """Return the path of the file holding an artifact."""
+        return self.root / ref.digest[:2] / f"{ref.digest[2:]}.{ref.kind}"
+
+    def put(self, value: Any) -> ArtifactRef:
+        """Store a value and return a reference to it."""
+        kind = _kind(value)
+        return self._write(kind, _content(kind, value))
+
+    def maybe_put(self, value: Any) -> Any:
+        """Store a value if it is at least `min_size` bytes.
+
+        Values stored as JSON are only encoded if an upper bound of their
+        encoded size (see `max_json_size`) reaches `min_size`, so that small
+        values are not encoded twice.
+
+        Returns an `ArtifactRef` if the value was stored and the value itself
+        otherwise.
+        """
+        if isinstance(value, _SCALAR_TYPES):
+            return value
+        kind = _kind(value)
+        if kind == "json":
+            bound = max_json_size(value, self.min_size)
+            if bound is not None and bound < self.min_size:
+                return value
+        content = _content(kind, value)
+        if _size_of(content) < self.min_size:
+            return value
+        return self._write(kind, content)
+
+    def load(self, ref: ArtifactRef, mmap_mode: bool = True) -> Any:
+        """Load a stored value.
+
+        If `mmap_mode` is True, numpy arrays and bytes are memory-mapped
+        read-only rather than read into memory.
+        """
+        path = self.path(ref)
+        if not path.exists():
+            raise ArtifactError(
+                f"Artifact {ref.digest} was not found in {self.root}"
+            )
+        if ref.kind == "npy":
+            import numpy  # noqa
+
+            return numpy.load(path, mmap_mode="r" if mmap_mode else None)
+        if ref.kind == "bytes":
+            if not mmap_mode or ref.size == 0:
+                return path.read_bytes()
+            with open(path, "rb") as f:
+                return memoryview(
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                )
+        return json_deserializer(path.read_text())
+
+    def _write(self, kind: str, content: Any) -> ArtifactRef:
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if kind == "npy":
+                    import numpy  # noqa
+
+                    numpy.save(f, content, allow_pickle=False)
+                else:
+                    f.write(content)
+            digest, size = _hash_file(tmp_name)
+            ref = ArtifactRef(digest, kind, size)
+            path = self.path(ref)
+            if path.exists():
+                os.remove(tmp_name)
+            else:
+                path.parent.mkdir(exist_ok=True)
+                os.replace(tmp_name, path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+        return ref
+
+
+def max_json_size(value: Any, limit: int) -> Optional[int]:
+    """Return an upper bound of the size of a value encoded as JSON.
+
+    The value is walked without encoding it, and the walk stops as soon as
+    the bound reaches `limit`. Returns None if the size of the value cannot
+    be bounded, e.g. if it contains values of registered custom types.
+    """
+    size = 0
+    stack = [value]
+    while stack and size < limit:
+        item = stack.pop()
+        if isinstance(item, str):
+            size += 6 * len(item) + 2  # every character may be escaped
+        elif isinstance(item, (bool, type(None))):
+            size += 5
+        elif isinstance(item, int):
+            size += item.bit_length() // 3 + 2
+        elif isinstance(item, float):
+            size += _MAX_NUMBER_SIZE
+        elif isinstance(item, dict):
+            size += 2 + 4 * len(item)
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            size += 2 + 2 * len(item)
+            stack.extend(item)
+        elif type(item).__name__ == "ndarray" and item.dtype.kind in "biuf":
+            # as a list of numbers or base64 encoded bytes, with its dtype
+            size += (_MAX_NUMBER_SIZE + 2) * item.size + 2 * item.nbytes
+            size += 256
+        else:
+            return None
+    return size
+
+
+def _kind(value: Any) -> str:
+    """Return how a value is stored: one of "npy", "bytes" or "json"."""
+    if type(value).__name__ == "ndarray" and not value.dtype.hasobject:
+        return "npy"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "bytes"
+    return "json"
+
+
+def _content(kind: str, value: Any):
+    """Return the content to write for a value of some kind."""
+    if kind == "json":
+        return json_serializer(value).encode()
+    return value
+
+
+def _size_of(content: Any) -> int:
+    nbytes = getattr(content, "nbytes", None)
+    return len(content) if nbytes is None else nbytes
+
+
+def _hash_file(path: str):
+    sha = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            sha.update(chunk)
+            size += len(chunk)
+    return sha.hexdigest(), size
+
+
+class ArtifactError(PytestExperimentsError):
+    pass
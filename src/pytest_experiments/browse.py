@@ -0,0 +1,345 @@
+"""Browse and aggregate experiments without loading them into python.
+
+These queries back the ``list``, ``compare``, ``trends`` and ``stats``
+commands of the command line interface. They select only the columns they
+need and aggregate in SQL, or over rows streamed in batches, so that they
+stay fast on stores with millions of experiments. Keys promoted to the
+indexed experiment values table (see `StorageManager`) are read from its
+typed column rather than extracted from JSON.
+
+Every function accepts the selection criteria of
+`StorageManager.query_experiments` (`name`, `outcome`, `since`, `until`,
+`parameters` and `run_id`).
+"""
+from array import array
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence
+from sqlalchemy import and_, func, literal, select
+from sqlalchemy.orm import aliased
+from .common import PytestExperimentsError, as_number
+from .config import QUERY_BATCH_SIZE
+from .store import (
+    ExperimentModel,
+    ExperimentValueModel,
+    RunModel,
+    StorageManager,
+    experiment_column,
+    experiment_filters,
+)
+from .timing import quantile
+
+_SOURCES = ("parameters", "data")
+
+
+class Delta(NamedTuple):
+    """The change of a metric of an experiment between two runs."""
+
+    name: str
+    metric: str
+    before: float
+    after: float
+
+    @property
+    def delta(self) -> float:
+        return self.after - self.before
+
+    @property
+    def relative(self) -> Optional[float]:
+        """The change relative to the value before; None if it was 0."""
+        return self.delta / abs(self.before) if self.before else None
+
+
+class Trend(NamedTuple):
+    """The number of experiments by outcome in one day or run."""
+
+    period: str
+    outcomes: Dict[str, int]
+
+    @property
+    def total(self) -> int:
+        return sum(self.outcomes.values())
+
+    @property
+    def pass_rate(self) -> float:
+        return self.outcomes.get("passed", 0) / self.total
+
+
+class Stats(NamedTuple):
+    """Summary statistics of a metric over a group of experiments."""
+
+    group: Any
+    count: int
+    mean: float
+    min: float
+    max: float
+    percentiles: Dict[float, float]
+
+
+def latest_experiments(
+    store: StorageManager,
+    columns: Sequence[str] = ("outcome", "start_time"),
+    batch_size: int = QUERY_BATCH_SIZE,
+    **criteria,
+) -> Iterator[tuple]:
+    """Stream the latest recorded experiment of each name.
+
+    Yields:
+        Rows of the experiment name followed by `columns` (see
+        `StorageManager.query_experiments`), ordered by name.
+    """
+    where = _criteria(store, criteria)
+    latest = (
+        select(func.max(ExperimentModel.id))
+        .where(*where)
+        .group_by(ExperimentModel.name)
+    )
+    statement = (
+        select(ExperimentModel.name, *map(experiment_column, columns))
+        .where(ExperimentModel.id.in_(latest))
+        .order_by(ExperimentModel.name)
+        .execution_options(yield_per=batch_size)
+    )
+    with store.create_session() as session:
+        yield from session.execute(statement)
+
+
+def compare_runs(
+    store: StorageManager,
+    before: str,
+    after: str,
+    metrics: Optional[Sequence[str]] = None,
+    batch_size: int = QUERY_BATCH_SIZE,
+    **criteria,
+) -> List[Delta]:
+    """Compare the metrics of the experiments of two runs.
+
+    Experiments are matched by name; if a run recorded an experiment more
+    than once, its last record is compared.
+
+    Args:
+        store (StorageManager): The store holding both runs.
+        before (str): The id of the earlier run.
+        after (str): The id of the later run.
+        metrics: The metrics to compare, e.g. ``["data.loss"]``. By default
+            every numeric datum is compared.
+        batch_size (int): The number of rows to fetch at a time.
+
+    Returns:
+        The deltas of the metrics recorded by both runs, by name and metric.
+    """
+    values = [
+        _run_values(store, run_id, metrics, batch_size, criteria)
+        for run_id in (before, after)
+    ]
+    deltas = []
+    for name in sorted(values[0].keys() & values[1].keys()):
+        old, new = values[0][name], values[1][name]
+        for metric in sorted(old.keys() & new.keys()):
+            deltas.append(Delta(name, metric, old[metric], new[metric]))
+    return deltas
+
+
+def trends(store: StorageManager, by: str = "day", **criteria) -> List[Trend]:
+    """Count experiments by outcome per day or per run.
+
+    Args:
+        store (StorageManager): The store to query.
+        by (str): ``"day"`` to count by the UTC date experiments started or
+            ``"run"`` to count by run, in the order the runs started.
+
+    Returns:
+        One `Trend` per day or run, oldest first.
+    """
+    where = _criteria(store, criteria)
+    count = func.count(ExperimentModel.id)
+    if by == "day":
+        period = func.date(ExperimentModel.start_time)
+        statement = (
+            select(period, ExperimentModel.outcome, count)
+            .where(ExperimentModel.start_time.isnot(None), *where)
+            .group_by(period, ExperimentModel.outcome)
+            .order_by(period)
+        )
+    elif by == "run":
+        statement = (
+            select(RunModel.id, ExperimentModel.outcome, count)
+            .join(RunModel, ExperimentModel.run_id == RunModel.id)
+            .where(*where)
+            .group_by(
+                RunModel.id, RunModel.start_time, ExperimentModel.outcome
+            )
+            .order_by(RunModel.start_time, RunModel.id)
+        )
+    else:
+        raise BrowseError(f"Cannot count by {by!r}; expected day or run")
+    periods: Dict[str, Dict[str, int]] = {}
+    with store.create_session() as session:
+        for key, outcome, n in session.execute(statement):
+            periods.setdefault(str(key), {})[outcome] = n
+    return [Trend(period, outcomes) for period, outcomes in periods.items()]
+
+
+def stats(
+    store: StorageManager,
+    column: str,
+    by: Optional[str] = "name",
+    percentiles: Sequence[float] = (),
+    batch_size: int = QUERY_BATCH_SIZE,
+    **criteria,
+) -> List[Stats]:
+    """Summarize a numeric parameter or datum over groups of experiments.
+
+    The count, mean, minimum and maximum are aggregated in SQL. Percentiles
+    are computed over the values streamed in order from the database, which
+    holds the values of one group in memory at a time.
+
+    Args:
+        store (StorageManager): The store to query.
+        column (str): The metric, e.g. ``"data.loss"``.
+        by (str): Group by ``"name"``, by a parameter (e.g.
+            ``"parameters.lr"``) or, if None, not at all.
+        percentiles: The percentiles to compute, between 0 and 100.
+        batch_size (int): The number of rows to fetch at a time.
+
+    Returns:
+        The statistics of each group with at least one value, by group.
+    """
+    for p in percentiles:
+        if not 0 <= p <= 100:
+            raise BrowseError(f"Percentiles must be in [0, 100], got {p}")
+    value, join, numeric = _numeric_column(store, column)
+    group = _group_column(by)
+    groups = [] if by is None else [group]
+    where = [value.isnot(None), *numeric, *_criteria(store, criteria)]
+
+    def selecting(*columns):
+        statement = select(group, *columns).select_from(ExperimentModel)
+        if join is not None:
+            statement = statement.join(*join)
+        return statement.where(*where)
+
+    aggregates = (
+        selecting(
+            func.count(value),
+            func.avg(value),
+            func.min(value),
+            func.max(value),
+        )
+        .group_by(*groups)
+        .order_by(*groups)
+    )
+    with store.create_session() as session:
+        results = {
+            row[0]: Stats(row[0], *row[1:], {})
+            for row in session.execute(aggregates)
+            if row[1]
+        }
+        if percentiles:
+            ordered = (
+                selecting(value)
+                .order_by(*groups, value)
+                .execution_options(yield_per=batch_size)
+            )
+            for key, values in _groups(session.execute(ordered)):
+                results[key].percentiles.update(
+                    (p, quantile(values, p / 100)) for p in percentiles
+                )
+    return list(results.values())
+
+
+def _criteria(store: StorageManager, criteria: Dict[str, Any]) -> list:
+    return experiment_filters(promote=store.promote, **criteria)
+
+
+def _split_metric(column: str):
+    source, _, key = column.partition(".")
+    if source not in _SOURCES or not key:
+        raise BrowseError(
+            f"Invalid metric {column!r}; expected parameters.<key> or "
+            "data.<key>"
+        )
+    return source, key
+
+
+def _numeric_column(store: StorageManager, column: str):
+    """Return the numeric SQL expression of a metric.
+
+    Returns the expression, the join it requires, if any, and the criteria
+    that select numeric values.
+    """
+    source, key = _split_metric(column)
+    if column in store.promote:
+        values = aliased(ExperimentValueModel)
+        on = and_(
+            values.experiment_id == ExperimentModel.id,
+            values.source == source,
+            values.key == key,
+        )
+        return values.number, (values, on), []
+    document = getattr(ExperimentModel, source)
+    dialect = store.engine.dialect.name
+    numeric = []
+    if dialect == "sqlite":
+        path = f'$."{key}"'
+        numeric.append(func.json_type(document, path).in_(["integer", "real"]))
+    elif dialect == "postgresql":
+        numeric.append(func.json_typeof(document[key]) == "number")
+    return document[key].as_float(), None, numeric
+
+
+def _group_column(by: Optional[str]):
+    if by is None:
+        return literal("all").label("group")
+    if by == "name":
+        return ExperimentModel.name.label("group")
+    source, key = _split_metric(by)
+    return getattr(ExperimentModel, source)[key].as_string().label("group")
+
+
+def _groups(rows) -> Iterator[tuple]:
+    """Group rows of ``(group, value)`` ordered by group into arrays."""
+    key, values = None, array("d")
+    for row_key, value in rows:
+        if values and row_key != key:
+            yield key, values
+            values = array("d")
+        key = row_key
+        values.append(value)
+    if values:
+        yield key, values
+
+
+def _run_values(
+    store, run_id, metrics, batch_size, criteria
+) -> Dict[str, Dict[str, float]]:
+    """Return the numeric metrics of the experiments of a run, by name."""
+    where = _criteria(store, dict(criteria, run_id=run_id))
+    if metrics is None:
+        statement = select(ExperimentModel.name, ExperimentModel.data)
+    else:
+        for metric in metrics:
+            _split_metric(metric)
+        statement = select(
+            ExperimentModel.name, *map(experiment_column, metrics)
+        )
+    statement = (
+        statement.where(*where)
+        .order_by(ExperimentModel.id)
+        .execution_options(yield_per=batch_size)
+    )
+    values = {}
+    with store.create_session() as session:
+        for name, *row in session.execute(statement):
+            if metrics is None:
+                items = (
+                    (f"data.{key}", value)
+                    for key, value in (row[0] or {}).items()
+                )
+            else:
+                items = zip(metrics, row)
+            numbers = ((k, as_number(v)) for k, v in items)
+            values[name] = {k: v for k, v in numbers if v is not None}
+    return values
+
+
+class BrowseError(PytestExperimentsError):
+    pass
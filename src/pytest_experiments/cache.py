@@ -0,0 +1,158 @@
+"""Reuse the results of experiments whose inputs and code are unchanged.
+
+An experiment's *fingerprint* is a digest of its name, its parameters, the
+source of its test module and the source of every other project module
+loaded in the session, except for the other test modules. Results thus do
+not depend on which tests are selected, and editing a test module only
+invalidates its own experiments. If a passed experiment with the same
+fingerprint is in the store, its recorded data is replayed instead of
+running the experiment again.
+"""
+import datetime as dt
+import hashlib
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Set, Union
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from .common import ExperimentOutcome
+from .json_tools import json_serializer
+from .store import StorageManager, ExperimentModel
+
+_INSTALLED_DIRS = {"site-packages", "dist-packages", "venv"}
+
+
+class ExperimentCache:
+    """Find previous results of experiments with the same fingerprint.
+
+    Args:
+        store (StorageManager): The store holding previous results.
+        rootdir: The project root; modules below it are project modules.
+        max_age (timedelta): Only reuse results younger than this.
+        max_runs (int): Only reuse results among the `max_runs` most recent
+            runs of an experiment.
+    """
+
+    def __init__(
+        self,
+        store: StorageManager,
+        rootdir: Union[str, Path],
+        max_age: Optional[dt.timedelta] = None,
+        max_runs: Optional[int] = None,
+    ) -> None:
+        self.store = store
+        self.rootdir = Path(rootdir).resolve()
+        self.max_age = max_age
+        self.max_runs = max_runs
+        self.hits = 0
+        self.lookups = 0
+        self.test_modules: Set[Path] = set()
+        self._project_digest: Optional[str] = None
+        self._module_digests: Dict[Path, str] = {}
+
+    def add_test_modules(self, paths: Iterable[Union[str, Path]]):
+        """Exclude collected test modules from the project digest."""
+        self.test_modules.update(Path(path).resolve() for path in paths)
+
+    @property
+    def project_digest(self) -> str:
+        """A digest of the source of the project modules.
+
+        Test modules (see `add_test_modules`) are left out. This is computed
+        once, the first time it is needed, by which time every test module
+        has been imported.
+        """
+        if self._project_digest is None:
+            sha = hashlib.sha256()
+            paths = set(project_modules(self.rootdir)) - self.test_modules
+            for path in sorted(paths):
+                sha.update(str(path.relative_to(self.rootdir)).encode())
+                sha.update(path.read_bytes())
+            self._project_digest = sha.hexdigest()
+        return self._project_digest
+
+    def module_digest(self, path: Union[str, Path]) -> str:
+        """A digest of the source of a test module, computed once."""
+        path = Path(path).resolve()
+        if path not in self._module_digests:
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()
+            self._module_digests[path] = digest
+        return self._module_digests[path]
+
+    def fingerprint(self, experiment) -> str:
+        """Return the fingerprint of an experiment."""
+        sha = hashlib.sha256()
+        for part in (
+            experiment.name,
+            json_serializer(experiment.parameters),
+            self.module_digest(experiment.test_fn.module.__file__),
+            self.project_digest,
+        ):
+            sha.update(part.encode())
+            sha.update(b"\0")
+        return sha.hexdigest()
+
+    def find(self, name: str, fingerprint: str) -> Optional[ExperimentModel]:
+        """Return the latest reusable result of an experiment, if any."""
+        recent = select(ExperimentModel)
+        if self.max_age is not None:
+            since = dt.datetime.utcnow() - self.max_age
+            recent = recent.where(ExperimentModel.start_time >= since)
+        if self.max_runs is not None:
+            recent = (
+                recent.where(ExperimentModel.name == name)
+                .order_by(ExperimentModel.start_time.desc())
+                .limit(self.max_runs)
+            )
+        candidate = aliased(ExperimentModel, recent.subquery())
+        statement = (
+            select(candidate)
+            .where(
+                candidate.fingerprint == fingerprint,
+                candidate.outcome == ExperimentOutcome.passed.name,
+            )
+            .order_by(candidate.start_time.desc())
+            .limit(1)
+        )
+        with self.store.create_session() as session:
+            return session.execute(statement).scalars().first()
+
+    def replay(self, experiment) -> bool:
+        """Replay the result of an unchanged experiment.
+
+        The experiment's fingerprint is set in any case. If a reusable
+        result exists, its data is recorded in the experiment, which is
+        marked as reused.
+
+        Returns:
+            bool: True if a result was replayed.
+        """
+        self.lookups += 1
+        experiment.fingerprint = self.fingerprint(experiment)
+        cached = self.find(experiment.name, experiment.fingerprint)
+        if cached is None:
+            return False
+        self.hits += 1
+        experiment.record(**cached.data)
+        experiment.reused = True
+        return True
+
+
+def project_modules(rootdir: Path) -> Iterator[Path]:
+    """Yield the source files of the loaded modules below `rootdir`.
+
+    Modules installed in a virtual environment or in hidden directories
+    below `rootdir` are skipped.
+    """
+    for module in list(sys.modules.values()):
+        filename = getattr(module, "__file__", None)
+        if not filename or not filename.endswith(".py"):
+            continue
+        path = Path(filename).resolve()
+        try:
+            parts = path.relative_to(rootdir).parts[:-1]
+        except ValueError:
+            continue
+        if any(p.startswith(".") or p in _INSTALLED_DIRS for p in parts):
+            continue
+        yield path
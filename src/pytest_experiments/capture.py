@@ -0,0 +1,171 @@
+"""Capture the parameters of experiments without storing large values.
+
+Large parameter values, e.g. a dataset yielded by a fixture, are recorded
+as a `ValueDigest`: a digest of their content along with a summary of their
+type, shape, dtype and size. So are values that cannot be stored as JSON,
+which are summarized by their type only.
+"""
+import dataclasses
+import hashlib
+import numbers
+import weakref
+from typing import Any, Dict, Hashable, Optional, Tuple
+from .config import CAPTURE_MAX_SIZE
+from .json_tools import TYPES, TypeRegistry, json_serializer
+
+_SCALAR_TYPES = (numbers.Number, type(None))
+_CONTAINER_ITEM_SIZE = 8  # bytes per item, a lower bound on their size
+
+
+@dataclasses.dataclass(frozen=True)
+class ValueDigest:
+    """A digest and summary of a value that is not stored."""
+
+    type: str
+    """The qualified name of the type of the value."""
+    digest: Optional[str] = None
+    """The SHA-256 digest of the content of the value, if it can be read."""
+    shape: Optional[Tuple[int, ...]] = None
+    """The shape of an array, or the length of a sequence or mapping."""
+    dtype: Optional[str] = None
+    """The dtype of an array."""
+    size: Optional[int] = None
+    """The size of the value in bytes, if known."""
+
+
+class ParameterCapture:
+    """A policy to capture parameter values.
+
+    Values of at least `max_size` bytes, and values of types that cannot be
+    stored as JSON, are replaced by their `ValueDigest`. Digests are
+    memoized per object for as long as the object lives, so that a value
+    shared by many experiments (e.g. yielded by a session-scoped fixture)
+    is hashed once. Memoized values are assumed not to be modified in
+    place. Objects that do not support weak references (e.g. `dict`,
+    `list` or `bytes`) are hashed every time they are captured, unless
+    they are captured with a `key` identifying where they come from.
+
+    Args:
+        max_size (int): The size in bytes from which values are digested.
+        registry (TypeRegistry): The registry of types that can be stored.
+    """
+
+    def __init__(
+        self, max_size: int = CAPTURE_MAX_SIZE, registry: TypeRegistry = TYPES
+    ) -> None:
+        self.max_size = max_size
+        self.registry = registry
+        self.hashed = 0
+        self._memo: Dict[int, Tuple[weakref.ref, ValueDigest]] = {}
+        self._sources: Dict[Hashable, Tuple[Any, Any]] = {}
+
+    def capture(self, value: Any, key: Optional[Hashable] = None) -> Any:
+        """Return the value to store for a parameter value.
+
+        If given, `key` identifies the source of the value, e.g. a fixture
+        instance. The captured value is then memoized for as long as the
+        source yields this very object, or until the key is forgotten.
+        """
+        if key is None:
+            return self._capture(value)
+        memoized = self._sources.get(key)
+        if memoized is not None and memoized[0] is value:
+            return memoized[1]
+        captured = self._capture(value)
+        self._sources[key] = (value, captured)
+        return captured
+
+    def remembers(self, key: Hashable) -> bool:
+        """Whether a value captured with `key` is memoized."""
+        return key in self._sources
+
+    def forget(self, key: Hashable) -> None:
+        """Release the value memoized for `key`, if any."""
+        self._sources.pop(key, None)
+
+    def _capture(self, value: Any) -> Any:
+        if isinstance(value, _SCALAR_TYPES):
+            return value
+        size = value_size(value)
+        if size is not None and size >= self.max_size:
+            return self.digest(value)
+        if isinstance(value, dict):
+            return {key: self._capture(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._capture(item) for item in value]
+        if size is not None or self.registry.encoder(type(value)):
+            return value
+        return self.digest(value)
+
+    def digest(self, value: Any) -> ValueDigest:
+        """Return the digest of a value, memoized per object."""
+        key = id(value)
+        memoized = self._memo.get(key)
+        if memoized is not None and memoized[0]() is value:
+            return memoized[1]
+        digest = value_digest(value)
+        self.hashed += 1
+        try:
+            ref = weakref.ref(value, lambda _: self._memo.pop(key, None))
+        except TypeError:
+            return digest
+        self._memo[key] = (ref, digest)
+        return digest
+
+
+def value_size(value: Any) -> Optional[int]:
+    """Estimate the size of a value in bytes without serializing it.
+
+    Returns None for values whose size is unknown.
+    """
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (memoryview, *_array_types())):
+        return value.nbytes
+    if isinstance(value, (dict, list, tuple)):
+        return len(value) * _CONTAINER_ITEM_SIZE
+    return None
+
+
+def value_digest(value: Any) -> ValueDigest:
+    """Return the digest and summary of a value."""
+    cls = type(value)
+    typename = cls.__qualname__
+    if cls.__module__ != "builtins":
+        typename = f"{cls.__module__}.{typename}"
+    sha = hashlib.sha256()
+    if isinstance(value, _array_types()):
+        summary = ValueDigest(
+            typename,
+            shape=tuple(value.shape),
+            dtype=value.dtype.str,
+            size=value.nbytes,
+        )
+        if value.dtype.hasobject:
+            return summary
+        import numpy  # noqa
+
+        sha.update(value.dtype.str.encode())
+        sha.update(repr(value.shape).encode())
+        sha.update(numpy.ascontiguousarray(value).data)
+        return dataclasses.replace(summary, digest=sha.hexdigest())
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        sha.update(value)
+        size = value.nbytes if isinstance(value, memoryview) else len(value)
+        return ValueDigest(typename, sha.hexdigest(), size=size)
+    if isinstance(value, str):
+        sha.update(value.encode())
+        return ValueDigest(typename, sha.hexdigest(), size=len(value))
+    if isinstance(value, (dict, list, tuple)):
+        sha.update(json_serializer(value).encode())
+        return ValueDigest(typename, sha.hexdigest(), shape=(len(value),))
+    return ValueDigest(typename)
+
+
+def _array_types() -> tuple:
+    import sys
+
+    numpy = sys.modules.get("numpy")
+    return () if numpy is None else (numpy.ndarray,)
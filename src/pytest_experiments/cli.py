@@ -0,0 +1,421 @@
+"""The ``pytest-experiments`` command line interface."""
+import argparse
+import datetime as dt
+import json
+import sys
+from typing import Any, Iterable, List, Optional, Sequence
+from .config import DEFAULT_DATABASE_URI, PRUNE_BATCH_SIZE
+from .common import PytestExperimentsError
+from .browse import compare_runs, latest_experiments, stats, trends
+from .export import FORMATS, export_experiments
+from .retention import compact, prune
+from .store import StorageManager
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the command line interface."""
+    args = build_parser().parse_args(argv)
+    try:
+        # commands that only read neither create nor migrate the database
+        store = StorageManager(
+            args.database, promote=args.promote, initialize=args.initialize
+        )
+        try:
+            return args.command(store, args) or 0
+        finally:
+            store.dispose()
+    except PytestExperimentsError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Return the parser of the command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="pytest-experiments",
+        description="Inspect the results of pytest experiments.",
+    )
+    parser.add_argument(
+        "--database",
+        default=DEFAULT_DATABASE_URI,
+        metavar="URI",
+        help=f"The experiments database (default: {DEFAULT_DATABASE_URI}).",
+    )
+    parser.add_argument(
+        "--promote",
+        action="append",
+        default=[],
+        metavar="KEY",
+        help=(
+            "Read the promoted parameter or datum KEY (e.g. data.loss) from "
+            "the indexed experiment values table, as recorded with "
+            "--experiments-promote. May be given more than once."
+        ),
+    )
+    commands = parser.add_subparsers(title="commands", dest="command_name")
+    commands.required = True
+
+    export = commands.add_parser(
+        "export",
+        help="Export experiments to a Parquet, Arrow or NumPy file.",
+        description=(
+            "Export experiments to a columnar file with one typed column "
+            "per parameter and recorded datum."
+        ),
+    )
+    export.add_argument(
+        "output", help=f"The file to write ({', '.join(FORMATS)})."
+    )
+    export.add_argument(
+        "--format",
+        choices=sorted(set(FORMATS.values())),
+        help="The output format; inferred from the extension by default.",
+    )
+    add_filter_arguments(export)
+    export.set_defaults(command=export_command, initialize=False)
+
+    list_parser = commands.add_parser(
+        "list",
+        help="List the latest experiment of each test.",
+        description="List the latest selected experiment of each test.",
+    )
+    list_parser.add_argument(
+        "--column",
+        action="append",
+        default=[],
+        metavar="COLUMN",
+        help=(
+            "Also show this column (e.g. data.loss). May be given more than "
+            "once."
+        ),
+    )
+    add_filter_arguments(list_parser)
+    list_parser.set_defaults(command=list_command, initialize=False)
+
+    compare = commands.add_parser(
+        "compare",
+        help="Compare the metrics of two runs.",
+        description=(
+            "Show the change of the metrics of each test between two runs, "
+            "the two latest runs by default."
+        ),
+    )
+    compare.add_argument("before", nargs="?", help="The earlier run id.")
+    compare.add_argument("after", nargs="?", help="The later run id.")
+    compare.add_argument(
+        "--metric",
+        action="append",
+        metavar="COLUMN",
+        help=(
+            "Compare this metric (e.g. data.loss) rather than every numeric "
+            "datum. May be given more than once."
+        ),
+    )
+    add_filter_arguments(compare, run=False)
+    compare.set_defaults(command=compare_command, initialize=False)
+
+    trends_parser = commands.add_parser(
+        "trends",
+        help="Count passed and failed experiments over time.",
+        description="Count the selected experiments by outcome over time.",
+    )
+    trends_parser.add_argument(
+        "--by",
+        choices=["day", "run"],
+        default="day",
+        help="Count by UTC day (the default) or by run.",
+    )
+    add_filter_arguments(trends_parser)
+    trends_parser.set_defaults(command=trends_command, initialize=False)
+
+    stats_parser = commands.add_parser(
+        "stats",
+        help="Summarize a metric.",
+        description=(
+            "Show the count, mean, minimum, maximum and percentiles of a "
+            "numeric parameter or datum per group of experiments."
+        ),
+    )
+    stats_parser.add_argument("column", help="The metric, e.g. data.loss.")
+    stats_parser.add_argument(
+        "--by",
+        default="name",
+        metavar="GROUP",
+        help=(
+            "Group by name (the default), by a parameter (e.g. "
+            "parameters.lr) or by nothing (all)."
+        ),
+    )
+    stats_parser.add_argument(
+        "--percentile",
+        action="append",
+        type=float,
+        default=[],
+        metavar="P",
+        help="Also compute this percentile. May be given more than once.",
+    )
+    add_filter_arguments(stats_parser)
+    stats_parser.set_defaults(command=stats_command, initialize=False)
+
+    prune_parser = commands.add_parser(
+        "prune",
+        help="Remove old experiments.",
+        description=(
+            "Remove the experiments that are neither among the latest of "
+            "their name nor within a recent period, in small batches."
+        ),
+    )
+    prune_parser.add_argument(
+        "--keep-last",
+        type=int,
+        metavar="N",
+        help="Keep the N most recent experiments of each name.",
+    )
+    prune_parser.add_argument(
+        "--keep-days",
+        type=float,
+        metavar="DAYS",
+        help="Keep every experiment started in the last DAYS days.",
+    )
+    prune_parser.add_argument(
+        "--name", metavar="GLOB", help="Only prune experiments by name."
+    )
+    prune_parser.add_argument(
+        "--downsample",
+        action="store_true",
+        help="Add removed experiments to daily summaries.",
+    )
+    prune_parser.add_argument(
+        "--archive",
+        metavar="FILE",
+        help="Append removed experiments to FILE as gzipped JSON lines.",
+    )
+    prune_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=PRUNE_BATCH_SIZE,
+        metavar="N",
+        help=(
+            "Remove at most N experiments per transaction "
+            f"(default: {PRUNE_BATCH_SIZE})."
+        ),
+    )
+    prune_parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Reclaim the freed space with VACUUM and ANALYZE afterwards.",
+    )
+    prune_parser.set_defaults(command=prune_command, initialize=True)
+
+    migrate = commands.add_parser(
+        "migrate",
+        help="Create the database, or add missing tables and columns.",
+        description=(
+            "Create the experiments database, or migrate the schema of a "
+            "database created by an earlier version."
+        ),
+    )
+    migrate.set_defaults(command=migrate_command, initialize=True)
+    return parser
+
+
+def add_filter_arguments(parser: argparse.ArgumentParser, run: bool = True):
+    """Add arguments that select experiments to a parser."""
+    group = parser.add_argument_group("selection")
+    group.add_argument(
+        "--name", metavar="GLOB", help="Select experiments by name."
+    )
+    group.add_argument(
+        "--outcome",
+        action="append",
+        help="Select experiments by outcome. May be given more than once.",
+    )
+    group.add_argument(
+        "--since",
+        type=dt.datetime.fromisoformat,
+        metavar="TIMESTAMP",
+        help="Select experiments started at or after this UTC timestamp.",
+    )
+    group.add_argument(
+        "--until",
+        type=dt.datetime.fromisoformat,
+        metavar="TIMESTAMP",
+        help="Select experiments started before this UTC timestamp.",
+    )
+    group.add_argument(
+        "--param",
+        action="append",
+        type=parse_parameter,
+        default=[],
+        metavar="KEY=VALUE",
+        help=(
+            "Select experiments by parameter value. VALUE is parsed as JSON "
+            "if possible. May be given more than once."
+        ),
+    )
+    if run:
+        group.add_argument(
+            "--run", metavar="ID", help="Select the experiments of a run."
+        )
+
+
+def parse_parameter(argument: str):
+    """Parse a ``KEY=VALUE`` argument into a ``(key, value)`` pair."""
+    key, sep, value = argument.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE: {argument!r}")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def selection(args: argparse.Namespace) -> dict:
+    """Return the `StorageManager.query_experiments` criteria of args."""
+    return {
+        "name": args.name,
+        "outcome": args.outcome,
+        "since": args.since,
+        "until": args.until,
+        "parameters": dict(args.param),
+        "run_id": getattr(args, "run", None),
+    }
+
+
+def export_command(store: StorageManager, args: argparse.Namespace):
+    """Export experiments to a columnar file."""
+    count = export_experiments(
+        store, args.output, format=args.format, **selection(args)
+    )
+    print(f"exported {count} experiment(s) to {args.output}")
+
+
+def list_command(store: StorageManager, args: argparse.Namespace):
+    """List the latest experiment of each test."""
+    columns = ["outcome", "start_time", *args.column]
+    rows = latest_experiments(store, columns, **selection(args))
+    print_table(["name", *columns], rows)
+
+
+def compare_command(store: StorageManager, args: argparse.Namespace):
+    """Compare the metrics of two runs."""
+    before, after = args.before, args.after
+    if after is None:
+        runs = [run.id for run in store.get_runs(limit=2)]
+        if before is not None or len(runs) < 2:
+            raise PytestExperimentsError(
+                "Give two run ids, or record two runs to compare the latest"
+            )
+        after, before = runs
+    criteria = selection(args)
+    del criteria["run_id"]
+    deltas = compare_runs(store, before, after, args.metric, **criteria)
+    print(f"comparing run {before} to run {after}")
+    print_table(
+        ["name", "metric", "before", "after", "delta", "relative"],
+        (
+            (d.name, d.metric, d.before, d.after, d.delta, _percent(d))
+            for d in deltas
+        ),
+    )
+
+
+def trends_command(store: StorageManager, args: argparse.Namespace):
+    """Count experiments by outcome over time."""
+    results = trends(store, by=args.by, **selection(args))
+    outcomes = sorted({o for trend in results for o in trend.outcomes})
+    print_table(
+        [args.by, *outcomes, "total", "pass rate"],
+        (
+            (
+                trend.period,
+                *(trend.outcomes.get(o, 0) for o in outcomes),
+                trend.total,
+                f"{trend.pass_rate:.1%}",
+            )
+            for trend in results
+        ),
+    )
+
+
+def stats_command(store: StorageManager, args: argparse.Namespace):
+    """Summarize a metric."""
+    by = None if args.by == "all" else args.by
+    results = stats(store, args.column, by, args.percentile, **selection(args))
+    print_table(
+        [
+            args.by,
+            "count",
+            "mean",
+            "min",
+            "max",
+            *(f"p{p:g}" for p in args.percentile),
+        ],
+        (
+            (
+                s.group,
+                s.count,
+                s.mean,
+                s.min,
+                s.max,
+                *(s.percentiles[p] for p in args.percentile),
+            )
+            for s in results
+        ),
+    )
+
+
+def print_table(header: Sequence[str], rows: Iterable[Sequence[Any]]):
+    """Print rows as a table with aligned columns."""
+    cells = [list(header)] + [list(map(format_cell, row)) for row in rows]
+    widths = [max(map(len, column)) for column in zip(*cells)]
+    for row in cells:
+        print("  ".join(c.ljust(w) for c, w in zip(row, widths)).rstrip())
+
+
+def format_cell(value: Any) -> str:
+    """Format a value for a table."""
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    if isinstance(value, dt.datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+def _percent(delta) -> Optional[str]:
+    return None if delta.relative is None else f"{delta.relative:+.1%}"
+
+
+def prune_command(store: StorageManager, args: argparse.Namespace):
+    """Remove old experiments."""
+    keep_within = None
+    if args.keep_days is not None:
+        keep_within = dt.timedelta(days=args.keep_days)
+    result = prune(
+        store,
+        keep_last=args.keep_last,
+        keep_within=keep_within,
+        name=args.name,
+        downsample=args.downsample,
+        archive=args.archive,
+        batch_size=args.batch_size,
+    )
+    print(
+        f"removed {result.experiments} experiment(s), {result.values} "
+        f"promoted value(s) and {result.runs} run(s)"
+    )
+    if args.compact:
+        compact(store)
+
+
+def migrate_command(store: StorageManager, args: argparse.Namespace):
+    """Create or migrate the database, which opening the store does."""
+    print(f"the schema of {args.database} is up to date")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,8 @@
 """Package tools common across modules."""
 import enum
 import datetime as dt
-from typing import Any
+import math
+from typing import Any, Optional
 
 
 class PytestExperimentsError(Exception):
@@ -78,3 +79,17 @@ def any_are_none(*args):
         if arg is None:
             return True
     return False
+
+
+def as_number(value: Any) -> Optional[float]:
+    """Return a recorded value as a float, or None if it is not a number.
+
+    Booleans are not numbers, and neither are NaN and infinite values.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    try:
+        number = float(value)
+    except OverflowError:  # integers beyond the range of floats
+        return None
+    return number if math.isfinite(number) else None
@@ -0,0 +1,107 @@
+"""Compress large JSON documents stored in the database.
+
+A compressed document is itself a small JSON document that wraps the
+base64 encoded compressed text with the name of the algorithm, e.g.
+``{"__typename__": "zlib", "__data__": "eJzt..."}``. It is decompressed by
+the JSON deserializer like any other custom type, so compressed and
+uncompressed rows can be read alike.
+"""
+import base64
+import json
+import zlib
+from typing import Any, Callable, Optional
+from .common import PytestExperimentsError
+from .config import COMPRESSION_MIN_SIZE, DATA_KEY, TYPE_KEY
+from .json_tools import json_serializer
+
+ALGORITHMS = ("zlib", "zstd")
+
+
+def compress(
+    algorithm: str, data: bytes, level: Optional[int] = None
+) -> bytes:
+    """Compress bytes with `algorithm` at `level` (its default if None)."""
+    if algorithm == "zlib":
+        return zlib.compress(data, -1 if level is None else level)
+    if algorithm == "zstd":
+        compressor = _import_zstandard().ZstdCompressor(
+            level=3 if level is None else level
+        )
+        return compressor.compress(data)
+    raise CompressionError(_unknown(algorithm))
+
+
+def decompress(algorithm: str, data: bytes) -> bytes:
+    """Decompress bytes compressed with `algorithm`."""
+    if algorithm == "zlib":
+        return zlib.decompress(data)
+    if algorithm == "zstd":
+        return _import_zstandard().ZstdDecompressor().decompress(data)
+    raise CompressionError(_unknown(algorithm))
+
+
+def compressing_serializer(
+    algorithm: str,
+    level: Optional[int] = None,
+    min_size: int = COMPRESSION_MIN_SIZE,
+    serializer: Callable[[Any], str] = json_serializer,
+) -> Callable[[Any], str]:
+    """Return a JSON serializer that compresses large documents.
+
+    Documents of at least `min_size` characters are compressed, unless the
+    compressed document would be larger.
+
+    Args:
+        algorithm (str): ``"zlib"`` or ``"zstd"`` (which requires the
+            `zstandard` package).
+        level (int): The compression level; the algorithm's default if None.
+        min_size (int): The minimum length of a document to compress.
+        serializer: Serializes objects to uncompressed JSON.
+    """
+    check_compression(algorithm, level)
+
+    def serialize(obj: Any) -> str:
+        text = serializer(obj)
+        if len(text) < min_size:
+            return text
+        data = compress(algorithm, text.encode(), level)
+        compressed = json.dumps(
+            {
+                TYPE_KEY: algorithm,
+                DATA_KEY: base64.b64encode(data).decode("ascii"),
+            }
+        )
+        return compressed if len(compressed) < len(text) else text
+
+    return serialize
+
+
+def check_compression(algorithm: str, level: Optional[int] = None):
+    """Raise a `CompressionError` if `algorithm` or `level` is unusable."""
+    try:
+        compress(algorithm, b"", level)
+    except (ValueError, zlib.error) as error:
+        raise CompressionError(
+            f"Invalid {algorithm} compression level {level}"
+        ) from error
+
+
+def _import_zstandard():
+    try:
+        import zstandard  # noqa
+    except ImportError as error:
+        raise CompressionError(
+            "zstd compression requires the zstandard package"
+        ) from error
+    return zstandard
+
+
+def _unknown(algorithm: str) -> str:
+    return (
+        f"Unknown compression algorithm {algorithm!r}; expected one of "
+        f"{list(ALGORITHMS)}"
+    )
+
+
+class CompressionError(PytestExperimentsError):
+    pass
@@ -1,12 +1,66 @@
 """Package configuration."""
 from . import serde
 
+DEFAULT_DATABASE_URI = "sqlite:///experiments.db"
 OUTCOMES_ATTR = "outcomes"
+STORAGE_REGISTRY_ATTR = "_experiments_storage"
+EXPERIMENT_CACHE_ATTR = "_experiments_cache"
+REGRESSION_DETECTOR_ATTR = "_experiments_regressions"
+CAPTURE_ATTR = "_experiments_capture"
+PLUGIN_FIXTURES = frozenset(
+    [
+        "experiments_store",
+        "experiments_writer",
+        "experiments_artifacts",
+        "experiments_run",
+        "experiments_async_writer",
+    ]
+)
 EXPERIMENT_TABLENAME = "experiments"
+EXPERIMENT_VALUES_TABLENAME = "experiment_values"
+RUN_TABLENAME = "runs"
+SUMMARY_TABLENAME = "experiment_summaries"
+RUN_ATTR = "_experiments_run"
+RUN_WORKERINPUT_KEY = "experiments_run_id"
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+SQLITE_FAST_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64_000,  # in KiB, i.e. 64MB
+    "mmap_size": 268_435_456,  # 256MB
+    "busy_timeout": 5_000,  # in milliseconds
+    "temp_store": "MEMORY",
+}
 TYPE_KEY = "__typename__"
 DATA_KEY = "__data__"
 SKIP_UNKNOWN_JSON_TYPES = True
+JSON_BACKEND = "json"
+MAX_PENDING_EXPERIMENTS = 10_000
+WRITER_BATCH_SIZE = 500
+WORKEROUTPUT_KEY = "experiments"
+REPORT_PAYLOADS_ATTR = "experiments_payloads"  # sent with xdist test reports
+REUSE_WORKEROUTPUT_KEY = "experiments_reuse"
+REGRESSION_WORKEROUTPUT_KEY = "experiments_regressions"
+QUERY_BATCH_SIZE = 1_000
+SCHEMA_ATTEMPTS = 5  # concurrent xdist workers may race to create the schema
+SCHEMA_RETRY_DELAY = 0.1  # seconds, times the number of failed attempts
+PRUNE_BATCH_SIZE = 500  # below the default SQLite limit of 999 variables
+COMPRESSION_MIN_SIZE = 1_024  # in characters of JSON
+ARTIFACT_MIN_SIZE = 1 << 20  # 1MB
+CAPTURE_MAX_SIZE = 1 << 16  # 64KB
+SERIES_CHUNK_SIZE = 65_536
+REGRESSION_BASELINE_RUNS = 20
+REGRESSION_MIN_RUNS = 5
+REGRESSION_THRESHOLD = 3.0
+REGRESSION_RELATIVE_FLOOR = 0.01
+MAD_SCALE = 1.4826  # the MAD of a normal distribution times this is sigma
 TYPE_MAPPINGS = {
     "ndarray": (serde.numpy_encode, serde.numpy_decode),
+    "generic": (serde.numpy_scalar_encode, None),
+    "array": (serde.array_encode, serde.numpy_decode),
     "datetime": (serde.datetime_encode, serde.datetime_decode),
+    "ArtifactRef": (serde.artifact_encode, serde.artifact_decode),
+    "ValueDigest": (serde.digest_encode, serde.digest_decode),
+    "zlib": (None, serde.zlib_decode),
+    "zstd": (None, serde.zstd_decode),
 }
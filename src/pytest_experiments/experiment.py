@@ -1,23 +1,50 @@
 import datetime as dt
+import functools
+from array import array
+from typing import Any, Callable, Dict, Optional
 import pytest
-from .config import OUTCOMES_ATTR
+from .config import OUTCOMES_ATTR, PLUGIN_FIXTURES
 from .common import (
     PytestExperimentsError,
     PytestOutcome,
     PytestReportPhase,
     ExperimentOutcome,
 )
+from .artifacts import ArtifactStore
+from .capture import ParameterCapture
+from .instrument import ResourceUsage
+from .series import Series
+from .timing import Timer, benchmark, summarize
 from .store import StorageManager, ExperimentModel
 
 
 class Experiment:
-    def __init__(self, request: pytest.FixtureRequest) -> None:
+    def __init__(
+        self,
+        request: pytest.FixtureRequest,
+        store: Optional[StorageManager] = None,
+        writer: Any = None,
+        artifacts: Optional[ArtifactStore] = None,
+        run_id: Optional[str] = None,
+        capture: Optional[ParameterCapture] = None,
+    ) -> None:
         self.context = request
-        self.store = StorageManager(experiments_db_uri(self.context))
+        if store is None:
+            store = StorageManager(experiments_db_uri(self.context))
+        self.store = store
+        self.writer = store if writer is None else writer
+        self.artifacts = artifacts
+        self.run_id = run_id
+        self.capture = ParameterCapture() if capture is None else capture
         self.created_at = dt.datetime.utcnow()
         self.completed_at = None
         self.outcome = ExperimentOutcome.not_reported
         self.data = {}
+        self.fingerprint = None
+        self.reused = False
+        self.resources: Optional[ResourceUsage] = None
+        self._samples: Dict[str, array] = {}
+        self._series: Optional[Series] = None
 
     def record(self, **kwargs):
         """Record data about this experiment.
@@ -25,9 +52,96 @@ class Experiment:
         As this data will be serialized as JSON, keys *must* be strings. This
         is enforced by the stricter requirement that keys be valid python
         identifiers.
+
+        If the notebook has an artifact store, values larger than its
+        `min_size` are saved to the store and only a reference to them is
+        recorded.
         """
+        if self.artifacts is not None:
+            kwargs = {
+                k: self.artifacts.maybe_put(v) for k, v in kwargs.items()
+            }
         self.data.update(**kwargs)
 
+    def log(self, step: int, **metrics: float):
+        """Log metrics at one step of an iterative algorithm.
+
+        Use this rather than `record` for metrics computed at every step
+        (e.g. the loss of every epoch)::
+
+            for epoch in range(epochs):
+                notebook.log(epoch, loss=loss, accuracy=accuracy)
+
+        Metrics are buffered in typed arrays and spilled to disk for long
+        series, so logging takes bounded memory. They are saved with the
+        experiment in the ``series`` column, which is read back as a dict of
+        numpy arrays: ``"step"`` and one array per metric. Metrics missing
+        at some step are NaN. The whole series is loaded to be saved.
+        """
+        if self._series is None:
+            self._series = Series()
+        self._series.append(step, metrics)
+
+    def timer(self, name: str) -> Timer:
+        """Time a section of the experiment.
+
+        Use the timer as a context manager::
+
+            with notebook.timer("fit"):
+                model.fit(x, y)
+
+        or as a decorator; every call of the decorated function is timed::
+
+            predict = notebook.timer("predict")(model.predict)
+
+        Summary statistics of the durations of each named section are saved
+        with the experiment (see `timings`).
+        """
+        return Timer(self._samples_of(name))
+
+    def benchmark(
+        self,
+        fn: Callable[[], Any],
+        repeat: int = 100,
+        warmup: int = 1,
+        name: Optional[str] = None,
+    ) -> Dict[str, float]:
+        """Benchmark a function and save its timings with the experiment.
+
+        Args:
+            fn: The function to benchmark; it is called without arguments.
+            repeat (int): The number of timed calls.
+            warmup (int): The number of untimed calls made first.
+            name (str): The name of the timings; by default the name of
+                `fn`.
+
+        Returns:
+            dict: Summary statistics of the durations of the calls.
+        """
+        if name is None:
+            name = getattr(fn, "__name__", "benchmark")
+        samples = self._samples_of(name)
+        samples.extend(benchmark(fn, repeat, warmup))
+        return summarize(samples)
+
+    def _samples_of(self, name: str) -> array:
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = array("q")
+        return samples
+
+    @property
+    def timings(self) -> Dict[str, Dict[str, float]]:
+        """Summary statistics of each timed section, in nanoseconds.
+
+        See `pytest_experiments.timing.summarize` for the statistics.
+        """
+        return {
+            name: summarize(samples)
+            for name, samples in self._samples.items()
+            if samples
+        }
+
     @property
     def test_fn(self) -> pytest.Function:
         """The test function."""
@@ -43,15 +157,44 @@ class Experiment:
         """The input parameters of the test.
 
         This will contain the closure of inputs supplied to the test,
-        some of which we do not care about.
+        some of which we do not care about. Large values, and values that
+        cannot be stored, are replaced by their digest (see
+        `pytest_experiments.capture.ParameterCapture`).
         """
-        return dict(
-            filter(self._ignore_funcargs_items, self.test_fn.funcargs.items())
-        )
+        return {
+            k: self.capture.capture(v, self._fixture_key(k))
+            for k, v in filter(
+                self._ignore_funcargs_items, self.test_fn.funcargs.items()
+            )
+        }
+
+    def _fixture_key(self, name: str) -> Optional[tuple]:
+        """Identify the instance of the fixture `name` if it is shared.
+
+        Values of function-scoped fixtures are created for each test, so
+        they are not memoized. The memoized value is released when the
+        fixture instance is torn down. The instance is identified by its
+        value rather than its cache key, which may be an unhashable param.
+        """
+        info = getattr(self.test_fn, "_fixtureinfo", None)
+        fixturedefs = info.name2fixturedefs.get(name) if info else None
+        if not fixturedefs:
+            return None
+        fixturedef = fixturedefs[-1]
+        cached = fixturedef.cached_result
+        if fixturedef.scope == "function" or cached is None:
+            return None
+        key = (fixturedef, id(cached[0]))
+        if not self.capture.remembers(key):
+            forget = functools.partial(self.capture.forget, key)
+            fixturedef.addfinalizer(forget)
+        return key
 
     def _ignore_funcargs_items(self, item) -> bool:
         """Ignores some funcarg items that we do not care about."""
-        _, v = item
+        k, v = item
+        if k in PLUGIN_FIXTURES:
+            return False
         if v is self:
             return False
         if isinstance(v, pytest.FixtureRequest):
@@ -82,6 +225,9 @@ class Experiment:
 
     def to_model(self) -> ExperimentModel:
         """Render the experiment into its database model."""
+        resources = {}
+        if self.resources is not None:
+            resources = self.resources._asdict()
         return ExperimentModel(
             name=self.name,
             start_time=self.created_at,
@@ -89,16 +235,28 @@ class Experiment:
             outcome=self.outcome.name,
             parameters=self.parameters,
             data=self.data,
+            fingerprint=self.fingerprint,
+            timings=self.timings or None,
+            series=self._series.arrays() if self._series else None,
+            run_id=self.run_id,
+            **resources,
         )
 
     def save(self):
         """Save this experiment to the database."""
-        self.store.record_experiment(self.to_model())
+        self.writer.record_experiment(self.to_model())
 
     def finish(self):
-        """Post process the experiment and save to the database."""
+        """Post process the experiment and save to the database.
+
+        Experiments whose results were reused from a previous run are not
+        saved again.
+        """
         self.post_process()
-        self.save()
+        if not self.reused:
+            self.save()
+        if self._series is not None:
+            self._series.close()
 
 
 def experiments_db_uri(request: pytest.FixtureRequest) -> str:
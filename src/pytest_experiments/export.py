@@ -0,0 +1,260 @@
+"""Export experiments to columnar files for analysis.
+
+Experiments are flattened into one row per experiment with a typed column
+for each parameter and each recorded datum, e.g. ``parameters.lr`` and
+``data.loss``. The following formats are supported:
+
+- Parquet (``.parquet``) and Arrow IPC (``.arrow``, ``.feather``), which
+  require `pyarrow`_ and are written in streaming batches.
+- NumPy (``.npz``), which holds one array per column.
+
+.. _`pyarrow`: https://arrow.apache.org/docs/python/
+"""
+import datetime as dt
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+from .config import QUERY_BATCH_SIZE
+from .common import PytestExperimentsError
+from .json_tools import json_serializer
+from .store import StorageManager
+
+FORMATS = {
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".npz": "npz",
+}
+BASE_COLUMNS = ["id", "name", "outcome", "start_time", "end_time"]
+PAYLOAD_COLUMNS = ["parameters", "data"]
+
+
+def export_experiments(
+    store: StorageManager,
+    path: Union[str, Path],
+    format: Optional[str] = None,  # pylint: disable=redefined-builtin
+    batch_size: int = QUERY_BATCH_SIZE,
+    **criteria,
+) -> int:
+    """Export experiments to a columnar file.
+
+    The experiments are read twice: once to determine the columns and their
+    types and once to write them. Both passes stream the experiments so
+    memory use does not grow with the number of experiments (except for
+    ``.npz`` files, which are assembled in memory).
+
+    Args:
+        store (StorageManager): The store to export from.
+        path: The file to write.
+        format (str): One of "parquet", "arrow" or "npz". By default this is
+            inferred from the file extension.
+        batch_size (int): The number of experiments to write at a time.
+        criteria: Select experiments to export; see
+            `StorageManager.query_experiments`.
+
+    Returns:
+        int: The number of experiments exported.
+    """
+    path = Path(path)
+    if format is None:
+        format = FORMATS.get(path.suffix)
+    if format not in FORMATS.values():
+        raise ExportError(
+            f"Cannot export to {path}; use one of {', '.join(FORMATS)} "
+            "or specify the format"
+        )
+    columns = infer_columns(
+        store.query_experiments(
+            columns=PAYLOAD_COLUMNS, batch_size=batch_size, **criteria
+        )
+    )
+    rows = store.query_experiments(
+        columns=BASE_COLUMNS + PAYLOAD_COLUMNS,
+        batch_size=batch_size,
+        **criteria,
+    )
+    batches = column_batches(rows, columns, batch_size)
+    if format == "npz":
+        return _write_npz(path, columns, batches)
+    return _write_arrow(path, format, columns, batches)
+
+
+def infer_columns(rows: Iterable[Any]) -> Dict[str, str]:
+    """Return the flattened columns of experiments and their kinds.
+
+    Args:
+        rows: ``(parameters, data)`` pairs.
+
+    Returns:
+        dict: A mapping from column name to one of "bool", "int", "float",
+        "str", "json" or "datetime", in order of first appearance, preceded
+        by the base columns.
+    """
+    kinds: Dict[str, set] = {}
+    for row in rows:
+        for column, value in flatten(row).items():
+            seen = kinds.setdefault(column, set())
+            if value is not None:
+                seen.add(_kind_of(value))
+    columns = {
+        "id": "int",
+        "name": "str",
+        "outcome": "str",
+        "start_time": "datetime",
+        "end_time": "datetime",
+    }
+    for column, seen in kinds.items():
+        columns[column] = _resolve_kind(seen)
+    return columns
+
+
+def flatten(row) -> Dict[str, Any]:
+    """Flatten ``(parameters, data)`` into prefixed columns."""
+    flat = {}
+    for prefix, payload in zip(PAYLOAD_COLUMNS, row):
+        for key, value in payload.items():
+            flat[f"{prefix}.{key}"] = value
+    return flat
+
+
+def column_batches(
+    rows: Iterable[Any], columns: Dict[str, str], batch_size: int
+) -> Iterator[Dict[str, List[Any]]]:
+    """Group experiment rows into batches of typed column values.
+
+    Values of "json" columns are serialized to JSON strings.
+    """
+    batch = _empty_batch(columns)
+    size = 0
+    for row in rows:
+        values = dict(zip(BASE_COLUMNS, row))
+        values.update(flatten(row[len(BASE_COLUMNS) :]))
+        for column, kind in columns.items():
+            value = values.get(column)
+            if kind == "json" and value is not None:
+                value = json_serializer(value)
+            batch[column].append(value)
+        size += 1
+        if size == batch_size:
+            yield batch
+            batch = _empty_batch(columns)
+            size = 0
+    if size:
+        yield batch
+
+
+def _empty_batch(columns: Dict[str, str]) -> Dict[str, List[Any]]:
+    return {column: [] for column in columns}
+
+
+def _kind_of(value: Any) -> str:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str):
+        return "str"
+    if isinstance(value, dt.datetime):
+        return "datetime"
+    return "json"
+
+
+def _resolve_kind(kinds: set) -> str:
+    if not kinds:
+        return "float"
+    if len(kinds) == 1:
+        return next(iter(kinds))
+    if kinds == {"int", "float"}:
+        return "float"
+    return "json"
+
+
+_ARROW_TYPES = {
+    "bool": "bool_",
+    "int": "int64",
+    "float": "float64",
+    "str": "string",
+    "json": "string",
+}
+
+
+def _write_arrow(path, format, columns, batches) -> int:
+    try:
+        import pyarrow  # noqa
+        import pyarrow.ipc  # noqa
+        import pyarrow.parquet  # noqa
+    except ImportError as e:
+        raise ExportError(f"Exporting to {format} requires pyarrow") from e
+
+    schema = pyarrow.schema(
+        [
+            (
+                column,
+                pyarrow.timestamp("us")
+                if kind == "datetime"
+                else getattr(pyarrow, _ARROW_TYPES[kind])(),
+            )
+            for column, kind in columns.items()
+        ]
+    )
+    if format == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(str(path), schema)
+    else:
+        writer = pyarrow.ipc.new_file(str(path), schema)
+    count = 0
+    with writer:
+        for batch in batches:
+            table = pyarrow.Table.from_pydict(batch, schema=schema)
+            writer.write_table(table)
+            count += table.num_rows
+    return count
+
+
+_NUMPY_DTYPES = {
+    "bool": "?",
+    "int": "i8",
+    "float": "f8",
+    "datetime": "datetime64[us]",
+}
+
+
+def _write_npz(path, columns, batches) -> int:
+    import numpy  # noqa
+
+    chunks: Dict[str, List[Any]] = {column: [] for column in columns}
+    for batch in batches:
+        for column, values in batch.items():
+            chunks[column].append(_to_numpy(values, columns[column]))
+    arrays = {
+        column: numpy.concatenate(parts) if parts else numpy.array([])
+        for column, parts in chunks.items()
+    }
+    numpy.savez(path, **arrays)
+    return len(arrays["id"])
+
+
+def _to_numpy(values: List[Any], kind: str):
+    """Convert a batch of column values to a numpy array.
+
+    Missing values are NaN in numeric columns (integer and boolean columns
+    with missing values become floating point), NaT in datetime columns and
+    empty strings in string columns.
+    """
+    import numpy  # noqa
+
+    if kind in ("str", "json"):
+        values = ["" if v is None else v for v in values]
+        return numpy.array(values, dtype=str)
+    if any(v is None for v in values):
+        if kind == "datetime":
+            missing = numpy.datetime64("NaT")
+        else:
+            kind = "float"
+            missing = numpy.nan
+        values = [missing if v is None else v for v in values]
+    return numpy.array(values, dtype=_NUMPY_DTYPES[kind])
+
+
+class ExportError(PytestExperimentsError):
+    pass
@@ -1,9 +1,47 @@
+import datetime as dt
+import functools
+from typing import Optional
 import pytest
-from .experiment import Experiment
-from .config import OUTCOMES_ATTR
+from . import hooks, json_tools, serde
+from .aio import AsyncExperiment, AsyncStorageManager, AsyncWriter
+from .artifacts import ArtifactStore
+from .cache import ExperimentCache
+from .capture import ParameterCapture
+from .compression import ALGORITHMS, CompressionError, check_compression
+from .experiment import Experiment, experiments_db_uri
+from .instrument import ResourceMonitor
+from .regression import Regression, RegressionDetector, RegressionError
+from .runs import Run
+from .config import (
+    ARTIFACT_MIN_SIZE,
+    CAPTURE_ATTR,
+    CAPTURE_MAX_SIZE,
+    DEFAULT_DATABASE_URI,
+    EXPERIMENT_CACHE_ATTR,
+    JSON_BACKEND,
+    OUTCOMES_ATTR,
+    REGRESSION_BASELINE_RUNS,
+    REGRESSION_DETECTOR_ATTR,
+    REGRESSION_THRESHOLD,
+    REGRESSION_WORKEROUTPUT_KEY,
+    REPORT_PAYLOADS_ATTR,
+    REUSE_WORKEROUTPUT_KEY,
+    RUN_ATTR,
+    RUN_WORKERINPUT_KEY,
+    STORAGE_REGISTRY_ATTR,
+    WRITER_BATCH_SIZE,
+    WORKEROUTPUT_KEY,
+)
+from .store import StorageManager, StorageRegistry, experiment_from_payload
+from .writers import BufferedWriter, BackgroundWriter, WorkerOutputWriter
 from .common import PytestOutcome, PytestReportPhase
 
 
+def pytest_addhooks(pluginmanager):
+    """Add our hooks."""
+    pluginmanager.add_hookspecs(hooks)
+
+
 def pytest_addoption(parser):
     """Add our pytest cli options."""
     group = parser.getgroup("experiments")
@@ -11,16 +49,501 @@ def pytest_addoption(parser):
         "--experiments-database",
         action="store",
         dest="experiments_database_uri",
-        default="sqlite:///experiments.db",
+        default=DEFAULT_DATABASE_URI,
         help='Set the value for the fixture "bar".',
     )
+    group.addoption(
+        "--experiments-flush-every",
+        action="store",
+        dest="experiments_flush_every",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Buffer experiments and write them in batches of N.",
+    )
+    group.addoption(
+        "--experiments-flush-interval",
+        action="store",
+        dest="experiments_flush_interval",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Buffer experiments and write them at most every SECONDS.",
+    )
+    group.addoption(
+        "--experiments-sqlite-fast",
+        action="store_true",
+        dest="experiments_sqlite_fast",
+        default=False,
+        help="Tune SQLite databases for write throughput (WAL mode).",
+    )
+    group.addoption(
+        "--experiments-numpy-binary-min-size",
+        action="store",
+        dest="experiments_numpy_binary_min_size",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Store numpy arrays with at least N elements in binary form.",
+    )
+    group.addoption(
+        "--experiments-json-backend",
+        action="store",
+        dest="experiments_json_backend",
+        choices=["json", "orjson"],
+        default=JSON_BACKEND,
+        help=(
+            "The library used to serialize experiments to JSON; orjson is "
+            "much faster but must be installed."
+        ),
+    )
+    group.addoption(
+        "--experiments-compression",
+        action="store",
+        dest="experiments_compression",
+        choices=list(ALGORITHMS),
+        default=None,
+        help="Compress large parameters and data with zlib or zstd.",
+    )
+    group.addoption(
+        "--experiments-compression-level",
+        action="store",
+        dest="experiments_compression_level",
+        type=int,
+        default=None,
+        metavar="LEVEL",
+        help="The compression level; the algorithm's default if omitted.",
+    )
+    group.addoption(
+        "--experiments-artifacts",
+        action="store",
+        dest="experiments_artifacts_dir",
+        default=None,
+        metavar="DIR",
+        help="Store large recorded values in DIR by content hash.",
+    )
+    group.addoption(
+        "--experiments-artifact-min-size",
+        action="store",
+        dest="experiments_artifact_min_size",
+        type=int,
+        default=ARTIFACT_MIN_SIZE,
+        metavar="BYTES",
+        help="Store recorded values of at least BYTES in the artifact store.",
+    )
+    group.addoption(
+        "--experiments-capture-max-size",
+        action="store",
+        dest="experiments_capture_max_size",
+        type=int,
+        default=CAPTURE_MAX_SIZE,
+        metavar="BYTES",
+        help=(
+            "Store a digest rather than the value of test parameters of at "
+            "least BYTES."
+        ),
+    )
+    group.addoption(
+        "--experiments-promote",
+        action="append",
+        dest="experiments_promote",
+        default=[],
+        metavar="KEY",
+        help=(
+            "Also write this parameter or data key (e.g. parameters.lr) to "
+            "an indexed table. May be given more than once."
+        ),
+    )
+    group.addoption(
+        "--experiments-reuse",
+        action="store_true",
+        dest="experiments_reuse",
+        default=False,
+        help=(
+            "Replay the recorded results of passed experiments whose "
+            "parameters and code are unchanged instead of running them."
+        ),
+    )
+    group.addoption(
+        "--experiments-reuse-max-age",
+        action="store",
+        dest="experiments_reuse_max_age",
+        type=float,
+        default=None,
+        metavar="DAYS",
+        help="Only reuse results recorded in the last DAYS days.",
+    )
+    group.addoption(
+        "--experiments-reuse-max-runs",
+        action="store",
+        dest="experiments_reuse_max_runs",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Only reuse results among the N latest runs of an experiment.",
+    )
+    group.addoption(
+        "--experiments-instrument",
+        action="store_true",
+        dest="experiments_instrument",
+        default=False,
+        help="Record the CPU time, peak memory and GC runs of experiments.",
+    )
+    group.addoption(
+        "--experiments-trace-allocations",
+        action="store_true",
+        dest="experiments_trace_allocations",
+        default=False,
+        help=(
+            "Also record the peak memory allocated by python using "
+            "tracemalloc (slow). Implies --experiments-instrument."
+        ),
+    )
+    group.addoption(
+        "--experiments-regression",
+        action="append",
+        dest="experiments_regression",
+        default=[],
+        metavar="METRIC",
+        help=(
+            "Compare METRIC (e.g. data.loss, data.accuracy:higher or "
+            "timings.fit) with its baseline over previous passing runs. "
+            "May be given more than once."
+        ),
+    )
+    group.addoption(
+        "--experiments-baseline-runs",
+        action="store",
+        dest="experiments_baseline_runs",
+        type=int,
+        default=REGRESSION_BASELINE_RUNS,
+        metavar="N",
+        help="Compute baselines over the N latest passing runs.",
+    )
+    group.addoption(
+        "--experiments-regression-threshold",
+        action="store",
+        dest="experiments_regression_threshold",
+        type=float,
+        default=REGRESSION_THRESHOLD,
+        metavar="MADS",
+        help=(
+            "Report metrics worse than their baseline median by more than "
+            "MADS scaled median absolute deviations."
+        ),
+    )
+    group.addoption(
+        "--experiments-fail-on-regression",
+        action="store_true",
+        dest="experiments_fail_on_regression",
+        default=False,
+        help="Fail the session if any metric regressed.",
+    )
+    group.addoption(
+        "--experiments-async",
+        action="store_true",
+        dest="experiments_async",
+        default=False,
+        help="Write experiments to the database from a background thread.",
+    )
 
 
 def pytest_configure(config):
-    """Add the `experiment` marker."""
+    """Add the `experiment` marker and the session storage registry."""
     config.addinivalue_line(
         "markers", "experiment: mark a test as an experiment"
     )
+    if config.option.experiments_numpy_binary_min_size is not None:
+        # restore the default when pytest unconfigures, so the option does
+        # not leak into later sessions in the same process
+        config.add_cleanup(
+            functools.partial(
+                setattr,
+                serde,
+                "NUMPY_BINARY_MIN_SIZE",
+                serde.NUMPY_BINARY_MIN_SIZE,
+            )
+        )
+        serde.NUMPY_BINARY_MIN_SIZE = (
+            config.option.experiments_numpy_binary_min_size
+        )
+    # likewise restore the JSON backend and the registered types
+    config.add_cleanup(
+        functools.partial(
+            json_tools.use_json_backend, json_tools.json_backend()
+        )
+    )
+    config.add_cleanup(
+        functools.partial(json_tools.TYPES.restore, json_tools.TYPES.copy())
+    )
+    try:
+        json_tools.use_json_backend(config.option.experiments_json_backend)
+    except ImportError as error:
+        raise pytest.UsageError(
+            "--experiments-json-backend=orjson requires orjson"
+        ) from error
+    if config.option.experiments_compression is not None:
+        try:
+            check_compression(
+                config.option.experiments_compression,
+                config.option.experiments_compression_level,
+            )
+        except CompressionError as error:
+            raise pytest.UsageError(str(error)) from error
+    config.hook.pytest_experiments_register_types.call_historic(
+        kwargs={"registry": json_tools.TYPES}
+    )
+    registry = StorageRegistry(
+        store_factory=functools.partial(
+            StorageManager,
+            sqlite_fast=config.option.experiments_sqlite_fast,
+            promote=config.option.experiments_promote,
+            compression=config.option.experiments_compression,
+            compression_level=config.option.experiments_compression_level,
+        ),
+    )
+    setattr(config, STORAGE_REGISTRY_ATTR, registry)
+    capture = ParameterCapture(config.option.experiments_capture_max_size)
+    setattr(config, CAPTURE_ATTR, capture)
+    run_id = None
+    if is_xdist_worker(config):
+        run_id = config.workerinput.get(RUN_WORKERINPUT_KEY)
+    run = Run(run_id, config.rootpath, config.invocation_params.args)
+    setattr(config, RUN_ATTR, run)
+    if config.option.experiments_reuse:
+        setattr(config, EXPERIMENT_CACHE_ATTR, experiment_cache(config))
+    if config.option.experiments_regression:
+        setattr(config, REGRESSION_DETECTOR_ATTR, regression_detector(config))
+
+
+def experiment_cache(config) -> ExperimentCache:
+    """Return the experiment cache configured by the command line options."""
+    option = config.option
+    registry = getattr(config, STORAGE_REGISTRY_ATTR)
+    max_age = option.experiments_reuse_max_age
+    return ExperimentCache(
+        registry.get(option.experiments_database_uri),
+        config.rootpath,
+        max_age=None if max_age is None else dt.timedelta(days=max_age),
+        max_runs=option.experiments_reuse_max_runs,
+    )
+
+
+def regression_detector(config) -> RegressionDetector:
+    """Return the regression detector configured by the command line."""
+    option = config.option
+    registry = getattr(config, STORAGE_REGISTRY_ATTR)
+    try:
+        return RegressionDetector(
+            registry.get(option.experiments_database_uri),
+            option.experiments_regression,
+            runs=option.experiments_baseline_runs,
+            threshold=option.experiments_regression_threshold,
+        )
+    except RegressionError as error:
+        raise pytest.UsageError(str(error)) from error
+
+
+def writer_factory(config):
+    """Return the writer factory selected by the command line options.
+
+    Under pytest-xdist, workers send their experiments to the controller
+    which buffers them and writes them in bulk.
+    """
+    if is_xdist_worker(config):
+        return functools.partial(
+            WorkerOutputWriter, workeroutput=config.workeroutput
+        )
+    option = config.option
+    flush_every = option.experiments_flush_every
+    flush_interval = option.experiments_flush_interval
+    if option.experiments_async:
+        return functools.partial(
+            BackgroundWriter, batch_size=flush_every or WRITER_BATCH_SIZE
+        )
+    if flush_every is None and flush_interval is None:
+        if is_xdist_controller(config):
+            return BufferedWriter
+        return None
+    return functools.partial(
+        BufferedWriter,
+        flush_every=flush_every,
+        flush_interval=flush_interval,
+    )
+
+
+def is_xdist_worker(config) -> bool:
+    """Return True if this process is a pytest-xdist worker."""
+    return hasattr(config, "workerinput")
+
+
+def is_xdist_controller(config) -> bool:
+    """Return True if this process distributes tests to xdist workers."""
+    return config.pluginmanager.has_plugin("dsession")
+
+
+def pytest_sessionstart(session):
+    """Select the writer of the session.
+
+    pytest-xdist registers its controller plugin in a `pytest_configure`
+    that runs after ours, so the controller is only recognized once the
+    session starts.
+    """
+    registry = getattr(session.config, STORAGE_REGISTRY_ATTR)
+    registry.writer_factory = writer_factory(session.config)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    """Send the identifier of the run to a pytest-xdist worker."""
+    node.workerinput[RUN_WORKERINPUT_KEY] = getattr(node.config, RUN_ATTR).id
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):  # pylint: disable=unused-argument
+    """Record what a finished pytest-xdist worker sends at the end.
+
+    Experiments are sent along with test reports (see
+    `pytest_runtest_logreport`); the worker output only holds those
+    finished after the last report.
+    """
+    workeroutput = getattr(node, "workeroutput", {})
+    record_payloads(node.config, workeroutput.get(WORKEROUTPUT_KEY, ()))
+    cache = getattr(node.config, EXPERIMENT_CACHE_ATTR, None)
+    if cache is not None:
+        hits, lookups = workeroutput.get(REUSE_WORKEROUTPUT_KEY, (0, 0))
+        cache.hits += hits
+        cache.lookups += lookups
+    detector = getattr(node.config, REGRESSION_DETECTOR_ATTR, None)
+    if detector is not None:
+        checked, regressions = workeroutput.get(
+            REGRESSION_WORKEROUTPUT_KEY, (0, ())
+        )
+        detector.checked += checked
+        detector.regressions.extend(Regression(*r) for r in regressions)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_logreport(report):
+    """Record the experiments a pytest-xdist worker sent with a report.
+
+    On the controller, pytest-xdist sets the `node` of the reports of its
+    workers.
+    """
+    payloads = getattr(report, REPORT_PAYLOADS_ATTR, None)
+    node = getattr(report, "node", None)
+    if payloads and node is not None:
+        delattr(report, REPORT_PAYLOADS_ATTR)
+        record_payloads(node.config, payloads)
+
+
+def record_payloads(config, payloads):
+    """Write the experiments sent by a pytest-xdist worker.
+
+    The run of the session is recorded with the first experiments, so that
+    sessions without experiments leave no trace in the database.
+    """
+    if not payloads:
+        return
+    db_uri = config.option.experiments_database_uri
+    registry = getattr(config, STORAGE_REGISTRY_ATTR)
+    getattr(config, RUN_ATTR).record(registry.get(db_uri))
+    writer = registry.get_writer(db_uri)
+    for payload in payloads:
+        writer.record_experiment(experiment_from_payload(payload))
+
+
+def pytest_itemcollected(item):
+    """Let the experiment cache tell test modules from project modules."""
+    cache = getattr(item.config, EXPERIMENT_CACHE_ATTR, None)
+    module = getattr(item, "module", None)
+    if cache is not None and module is not None:
+        cache.add_test_modules([module.__file__])
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    """Replay the results of an unchanged experiment instead of running it."""
+    cache = getattr(pyfuncitem.config, EXPERIMENT_CACHE_ATTR, None)
+    funcargs = pyfuncitem.funcargs
+    exp = funcargs.get("notebook") or funcargs.get("async_notebook")
+    if cache is None or not isinstance(exp, Experiment):
+        return None
+    if cache.replay(exp):
+        return True
+    return None
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_sessionfinish(session):
+    """Write pending experiments and dispose of the database connections.
+
+    pytest calls this hook even when the session is interrupted (e.g. by
+    `KeyboardInterrupt`) and we run it after fixture teardown so that
+    experiments buffered by the last notebooks are written as well.
+
+    With ``--experiments-fail-on-regression``, the session fails if any
+    metric regressed.
+    """
+    config = session.config
+    run = getattr(config, RUN_ATTR, None)
+    if run is not None:
+        run.finish()
+    registry = getattr(config, STORAGE_REGISTRY_ATTR, None)
+    if registry is not None:
+        registry.close()
+    cache = getattr(config, EXPERIMENT_CACHE_ATTR, None)
+    detector = getattr(config, REGRESSION_DETECTOR_ATTR, None)
+    if is_xdist_worker(config):
+        if cache is not None:
+            config.workeroutput[REUSE_WORKEROUTPUT_KEY] = (
+                cache.hits,
+                cache.lookups,
+            )
+        if detector is not None:
+            config.workeroutput[REGRESSION_WORKEROUTPUT_KEY] = (
+                detector.checked,
+                [list(r) for r in detector.regressions],
+            )
+    elif (
+        detector is not None
+        and detector.regressions
+        and config.option.experiments_fail_on_regression
+        and session.exitstatus == pytest.ExitCode.OK
+    ):
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    """Report experiment statistics and write failures."""
+    registry = getattr(config, STORAGE_REGISTRY_ATTR, None)
+    errors = getattr(registry, "errors", [])
+    cache = getattr(config, EXPERIMENT_CACHE_ATTR, None)
+    reused = cache is not None and cache.lookups
+    detector = getattr(config, REGRESSION_DETECTOR_ATTR, None)
+    if not (errors or reused or detector is not None):
+        return
+    regressions = detector.regressions if detector is not None else []
+    terminalreporter.section("experiments", red=bool(errors or regressions))
+    if reused:
+        terminalreporter.line(
+            f"reused {cache.hits} of {cache.lookups} experiment result(s) "
+            f"({100 * cache.hits / cache.lookups:.1f}%)"
+        )
+    if detector is not None:
+        terminalreporter.line(
+            f"{len(regressions)} regression(s) in {detector.checked} "
+            "checked experiment(s)",
+            red=bool(regressions),
+        )
+        for regression in regressions:
+            terminalreporter.line(f"  {regression}", red=True)
+    for failure in errors:
+        terminalreporter.line(
+            f"failed to write {failure.experiments} experiment(s): "
+            f"{failure.error!r}",
+            red=True,
+        )
 
 
 @pytest.hookimpl(tryfirst=True, hookwrapper=True)
@@ -36,11 +559,135 @@ def pytest_runtest_makereport(item, call):  # pylint: disable=unused-argument
     report = result.get_result()
     outcomes[PytestReportPhase[report.when]] = PytestOutcome[report.outcome]
     setattr(item, OUTCOMES_ATTR, outcomes)
+    if is_xdist_worker(item.config):
+        # send the experiments finished so far along with the report, so
+        # that workers do not hold on to them until the end of the session
+        payloads = item.config.workeroutput.get(WORKEROUTPUT_KEY)
+        if payloads:
+            setattr(report, REPORT_PAYLOADS_ATTR, payloads[:])
+            payloads.clear()
+
+
+@pytest.fixture(scope="session")
+def experiments_store(request) -> StorageManager:
+    """The storage manager shared by all notebooks in the session."""
+    registry = getattr(request.config, STORAGE_REGISTRY_ATTR)
+    return registry.get(experiments_db_uri(request))
+
+
+@pytest.fixture(scope="session")
+def experiments_writer(request, experiments_store):
+    """The writer that records finished experiments to the store."""
+    registry = getattr(request.config, STORAGE_REGISTRY_ATTR)
+    return registry.get_writer(experiments_store.db_uri)
+
+
+@pytest.fixture(scope="session")
+def experiments_artifacts(request) -> Optional[ArtifactStore]:
+    """The artifact store for large recorded values, if one is configured."""
+    root = request.config.option.experiments_artifacts_dir
+    if root is None:
+        return None
+    return ArtifactStore(
+        root, min_size=request.config.option.experiments_artifact_min_size
+    )
+
+
+@pytest.fixture(scope="session")
+def experiments_run(request, experiments_store) -> Run:
+    """The run of this session, recorded in the store.
+
+    pytest-xdist workers share the run of their controller, which records
+    it.
+    """
+    run = getattr(request.config, RUN_ATTR)
+    if not is_xdist_worker(request.config):
+        run.record(experiments_store)
+    return run
 
 
 @pytest.fixture
-def notebook(request):
+def notebook(
+    request,
+    experiments_store,
+    experiments_writer,
+    experiments_artifacts,
+    experiments_run,
+):
     """A notebook for your experiments."""
-    exp = Experiment(request)
-    yield exp
-    exp.finish()
+    exp = Experiment(
+        request,
+        experiments_store,
+        experiments_writer,
+        experiments_artifacts,
+        experiments_run.id,
+        getattr(request.config, CAPTURE_ATTR),
+    )
+    yield from run_experiment(request, exp, exp.finish)
+
+
+@pytest.fixture(scope="session")
+def experiments_async_writer(request, experiments_store) -> AsyncWriter:
+    """The asyncio writer shared by all async notebooks in the session.
+
+    It owns one asyncio engine, and its connection pool, for the session.
+    Its write failures are reported with those of the other writers.
+    """
+    option = request.config.option
+    store = AsyncStorageManager(
+        experiments_store.db_uri,
+        promote=option.experiments_promote,
+        compression=option.experiments_compression,
+        compression_level=option.experiments_compression_level,
+    )
+    writer = AsyncWriter(store)
+    yield writer
+    writer.close()
+    registry = getattr(request.config, STORAGE_REGISTRY_ATTR)
+    registry.errors.extend(writer.errors)
+
+
+@pytest.fixture
+def async_notebook(
+    request,
+    experiments_store,
+    experiments_writer,
+    experiments_artifacts,
+    experiments_run,
+):
+    """A notebook for experiments that run in an asyncio event loop.
+
+    Its experiment is written without blocking the event loop: the write
+    is scheduled at teardown and runs on the session's asyncio engine while
+    the next tests run. pytest-xdist workers send experiments to their
+    controller as usual.
+    """
+    writer = experiments_writer
+    if not is_xdist_worker(request.config):
+        writer = request.getfixturevalue("experiments_async_writer")
+    exp = AsyncExperiment(
+        request,
+        experiments_store,
+        writer,
+        experiments_artifacts,
+        experiments_run.id,
+        getattr(request.config, CAPTURE_ATTR),
+    )
+    yield from run_experiment(request, exp, exp.finish_soon)
+
+
+def run_experiment(request, exp: Experiment, finish):
+    """Yield an experiment to its test, then finish and check it."""
+    option = request.config.option
+    trace_allocations = option.experiments_trace_allocations
+    if option.experiments_instrument or trace_allocations:
+        monitor = ResourceMonitor(trace_allocations)
+        monitor.start()
+        yield exp
+        exp.resources = monitor.stop()
+    else:
+        yield exp
+    finish()
+    detector = getattr(request.config, REGRESSION_DETECTOR_ATTR, None)
+    if detector is not None and not exp.reused:
+        detector.check(exp)
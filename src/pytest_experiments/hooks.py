@@ -0,0 +1,26 @@
+"""Hooks that plugins and conftest files can implement."""
+import pluggy
+
+hookspec = pluggy.HookspecMarker("pytest")
+
+
+@hookspec(historic=True)
+def pytest_experiments_register_types(registry):
+    """Register JSON encoders and decoders of custom types.
+
+    Implement this hook, e.g. in a ``conftest.py``, to store objects of your
+    own types in experiment parameters and data::
+
+        def pytest_experiments_register_types(registry):
+            registry.register(
+                Fraction,
+                encoder=lambda f: [f.numerator, f.denominator],
+                decoder=lambda d: Fraction(*d),
+            )
+
+    An encoder also encodes the subclasses of its type.
+
+    Args:
+        registry (pytest_experiments.json_tools.TypeRegistry): The registry
+            of encoders and decoders.
+    """
@@ -0,0 +1,97 @@
+"""Measure the resources used by experiments."""
+import gc
+import sys
+import time
+import tracemalloc
+from typing import NamedTuple, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover; not available on Windows
+    resource = None
+
+# ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+class ResourceUsage(NamedTuple):
+    """The resources used by an experiment."""
+
+    cpu_time: float
+    """The CPU time used by the process, in seconds."""
+    peak_rss_delta: Optional[int]
+    """How much the peak resident set size of the process grew, in bytes.
+
+    This is None on platforms without the `resource` module.
+    """
+    alloc_peak: Optional[int]
+    """The peak size of memory allocated by python, in bytes.
+
+    This is None unless allocations are traced.
+    """
+    gc_collections: int
+    """The number of garbage collections run."""
+
+
+class ResourceMonitor:
+    """Measure the resources used between `start` and `stop`.
+
+    CPU time and peak memory are measured for the whole process, so they
+    include e.g. background threads.
+
+    Args:
+        trace_allocations (bool): If True, trace python memory allocations
+            with `tracemalloc` to measure their peak. This slows down
+            allocation-heavy code considerably.
+    """
+
+    def __init__(self, trace_allocations: bool = False) -> None:
+        self.trace_allocations = trace_allocations
+        self._started_tracing = False
+        self._cpu_time = 0.0
+        self._maxrss: Optional[int] = None
+        self._alloc_base = 0
+        self._gc_collections = 0
+
+    def start(self):
+        """Start measuring."""
+        if self.trace_allocations:
+            if tracemalloc.is_tracing():
+                if hasattr(tracemalloc, "reset_peak"):  # python >= 3.9
+                    tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                self._started_tracing = True
+            self._alloc_base = tracemalloc.get_traced_memory()[0]
+        self._maxrss = _maxrss()
+        self._gc_collections = _gc_collections()
+        self._cpu_time = time.process_time()
+
+    def stop(self) -> ResourceUsage:
+        """Stop measuring and return the resources used."""
+        cpu_time = time.process_time() - self._cpu_time
+        gc_collections = _gc_collections() - self._gc_collections
+        maxrss = _maxrss()
+        peak_rss_delta = None
+        if maxrss is not None and self._maxrss is not None:
+            peak_rss_delta = maxrss - self._maxrss
+        alloc_peak = None
+        if self.trace_allocations:
+            peak = tracemalloc.get_traced_memory()[1]
+            alloc_peak = max(peak - self._alloc_base, 0)
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+        return ResourceUsage(
+            cpu_time, peak_rss_delta, alloc_peak, gc_collections
+        )
+
+
+def _maxrss() -> Optional[int]:
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+
+
+def _gc_collections() -> int:
+    return sum(stats["collections"] for stats in gc.get_stats())
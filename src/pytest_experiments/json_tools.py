@@ -1,12 +1,145 @@
-from typing import Any
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+import functools
+import hashlib
 import json
-from .config import TYPE_KEY, DATA_KEY, SKIP_UNKNOWN_JSON_TYPES, TYPE_MAPPINGS
-from .common import type_name_of, any_are_none
+import warnings
+from .config import (
+    TYPE_KEY,
+    DATA_KEY,
+    SKIP_UNKNOWN_JSON_TYPES,
+    TYPE_MAPPINGS,
+    JSON_BACKEND,
+)
+from .common import any_are_none
+
+Encoder = Callable[[Any], Any]
+Decoder = Callable[[Any], Any]
+TypeMappings = Mapping[str, Tuple[Optional[Encoder], Optional[Decoder]]]
+
+
+class TypeRegistry:
+    """A registry of JSON encoders and decoders of custom types.
+
+    Encoders are looked up by the type of an object and then by each of its
+    base classes, so the encoder of a class also encodes its subclasses.
+    Lookups are cached per type.
+
+    Types that should not be imported eagerly (e.g. numpy arrays) may be
+    registered by the name of the class instead, which matches any class of
+    that name in the type's method resolution order.
+
+    Args:
+        mappings: Encoders and decoders keyed by type name, as in
+            `config.TYPE_MAPPINGS`.
+    """
+
+    def __init__(self, mappings: Optional[TypeMappings] = None) -> None:
+        self._by_type: Dict[type, Tuple[str, Encoder]] = {}
+        self._by_class_name: Dict[str, Tuple[str, Encoder]] = {}
+        self._decoders: Dict[str, Decoder] = {}
+        self._bare: Set[str] = set()
+        self._cache: Dict[type, Optional[Tuple[str, Encoder]]] = {}
+        for typename, (encoder, decoder) in (mappings or {}).items():
+            self.register(typename, encoder, decoder)
+
+    def register(
+        self,
+        type_: Union[type, str],
+        encoder: Optional[Encoder],
+        decoder: Optional[Decoder],
+        name: Optional[str] = None,
+    ):
+        """Register the encoder and decoder of a type.
+
+        Args:
+            type_: The type, or the name of the class.
+            encoder: Returns a JSON serializable representation of an object
+                of the type. If None, only the decoder is registered.
+            decoder: Returns the object from its representation. If None,
+                objects are stored as their bare representation, which is
+                read back as is (e.g. numpy scalars as python numbers).
+            name (str): The name stored along with encoded objects to find
+                their decoder; the name of the class by default.
+        """
+        if isinstance(type_, str):
+            name = name or type_
+            if encoder is not None:
+                self._by_class_name[type_] = (name, encoder)
+        else:
+            name = name or type_.__name__
+            if encoder is not None:
+                self._by_type[type_] = (name, encoder)
+        if decoder is None:
+            self._bare.add(name)
+        else:
+            self._decoders[name] = decoder
+        self._cache.clear()
+
+    def copy(self) -> "TypeRegistry":
+        """Return a copy of the registry, e.g. to `restore` it later."""
+        registry = TypeRegistry()
+        registry.restore(self)
+        return registry
+
+    def restore(self, registry: "TypeRegistry"):
+        """Replace the registered types by those of another registry."""
+        self._by_type = dict(registry._by_type)
+        self._by_class_name = dict(registry._by_class_name)
+        self._decoders = dict(registry._decoders)
+        self._bare = set(registry._bare)
+        self._cache.clear()
+
+    def is_bare(self, name: str) -> bool:
+        """Whether objects encoded as `name` are stored without their name."""
+        return name in self._bare
+
+    def encoder(self, cls: type) -> Optional[Tuple[str, Encoder]]:
+        """Return the name and encoder of a type, or None if unknown."""
+        try:
+            return self._cache[cls]
+        except KeyError:
+            pass
+        found = None
+        for base in cls.__mro__:
+            found = self._by_type.get(base)
+            if found is not None:
+                break
+            found = self._by_class_name.get(base.__name__)
+            if found is not None:
+                break
+        self._cache[cls] = found
+        return found
+
+    def decoder(self, name: str) -> Optional[Decoder]:
+        """Return the decoder registered under `name`, if any."""
+        return self._decoders.get(name)
+
+
+TYPES = TypeRegistry(TYPE_MAPPINGS)
+"""The registry used to encode and decode experiment data."""
 
 
 def json_serializer(obj: dict) -> str:
     """Serialize an object to a JSON string."""
-    return TypeDispatchedJSONEncoder().encode(obj)
+    return _serialize(obj)
+
+
+def json_digest(obj: Any) -> str:
+    """Return the SHA-256 digest of an object serialized to JSON.
+
+    The object is always serialized with the standard library, so that its
+    digest does not depend on the selected JSON backend.
+    """
+    return hashlib.sha256(_json_serialize(obj).encode()).hexdigest()
 
 
 def json_deserializer(s: str) -> dict:
@@ -16,17 +149,25 @@ def json_deserializer(s: str) -> dict:
 
 class TypeDispatchedJSONEncoder(json.JSONEncoder):
     def __init__(
-        self, *, skip_unknown_types=SKIP_UNKNOWN_JSON_TYPES, **kwargs
+        self,
+        *,
+        skip_unknown_types=SKIP_UNKNOWN_JSON_TYPES,
+        registry: TypeRegistry = TYPES,
+        **kwargs,
     ):
         super().__init__(**kwargs)
         self._skip_unknown_types = skip_unknown_types
+        self._registry = registry
 
     def default(self, o: Any) -> Any:
-        typename = type_name_of(o)
-        encoder, _ = TYPE_MAPPINGS.get(typename, (None, None))
-        if encoder is not None:
+        found = self._registry.encoder(type(o))
+        if found is not None:
+            typename, encoder = found
+            if self._registry.is_bare(typename):
+                return encoder(o)
             return {TYPE_KEY: typename, DATA_KEY: encoder(o)}
         if self._skip_unknown_types:
+            _warn_unknown_type(type(o))
             return None
         return super().default(o)
 
@@ -37,7 +178,81 @@ def object_hook(obj: dict) -> dict:
     if typename is None:
         return obj
     data = obj.get(DATA_KEY, None)
-    _, decoder = TYPE_MAPPINGS.get(typename, (None, None))
+    decoder = TYPES.decoder(typename)
     if not any_are_none(data, decoder):
         data = decoder(data)
     return data
+
+
+@functools.lru_cache(maxsize=None)
+def _warn_unknown_type(cls: type):
+    warnings.warn(
+        f"{cls.__module__}.{cls.__qualname__} objects cannot be serialized "
+        "to JSON and are stored as null; register an encoder with the "
+        "pytest_experiments_register_types hook.",
+        SerializationWarning,
+        stacklevel=2,
+    )
+
+
+def _json_serialize(obj: Any) -> str:
+    return _ENCODER.encode(obj)
+
+
+def _orjson_serialize(obj: Any) -> str:
+    import orjson  # noqa
+
+    try:
+        return orjson.dumps(
+            obj,
+            default=_orjson_default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        ).decode()
+    except orjson.JSONEncodeError:
+        # e.g. integers wider than 64 bits, which orjson does not support
+        return _json_serialize(obj)
+
+
+def _orjson_default(o: Any) -> Any:
+    if isinstance(o, float):  # e.g. numpy.float64
+        return float(o)
+    return _ENCODER.default(o)
+
+
+_ENCODER = TypeDispatchedJSONEncoder()
+_BACKENDS = {"json": _json_serialize, "orjson": _orjson_serialize}
+_backend = JSON_BACKEND
+_serialize = _BACKENDS[_backend]
+
+
+def json_backend() -> str:
+    """Return the name of the library used to serialize JSON."""
+    return _backend
+
+
+def use_json_backend(name: str):
+    """Select the library used to serialize JSON.
+
+    The ``"json"`` backend uses the standard library. The ``"orjson"``
+    backend is several times faster on large records and requires `orjson`
+    to be installed. Both produce the same documents, except that orjson
+    writes NaN and infinite floats as null rather than as the non-standard
+    ``NaN`` and ``Infinity``. Documents that orjson cannot serialize (e.g.
+    with integers wider than 64 bits) are serialized with the standard
+    library. Deserialization always uses the standard library.
+    """
+    global _backend, _serialize  # pylint: disable=global-statement
+    if name not in _BACKENDS:
+        raise ValueError(
+            f"Unknown JSON backend {name!r}; expected one of "
+            f"{sorted(_BACKENDS)}"
+        )
+    if name == "orjson":
+        import orjson  # noqa pylint: disable=unused-import
+
+    _backend = name
+    _serialize = _BACKENDS[name]
+
+
+class SerializationWarning(UserWarning):
+    """Warns that a value could not be serialized to JSON."""
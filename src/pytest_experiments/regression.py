@@ -0,0 +1,280 @@
+"""Detect regressions of experiments against their history.
+
+The *baseline* of a metric is computed from the latest passing runs of an
+experiment with the same name and parameters: its median and its median
+absolute deviation (MAD), scaled to estimate the standard deviation of
+normally distributed values. A new value is a regression if it is worse
+than the median by more than `threshold` scaled MADs. Medians and MADs
+are robust to the occasional outlier in the history.
+"""
+import math
+import statistics
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+from sqlalchemy import select
+from .common import ExperimentOutcome, PytestExperimentsError, as_number
+from .config import (
+    MAD_SCALE,
+    REGRESSION_BASELINE_RUNS,
+    REGRESSION_MIN_RUNS,
+    REGRESSION_RELATIVE_FLOOR,
+    REGRESSION_THRESHOLD,
+    TYPE_KEY,
+)
+from .json_tools import json_digest
+from .store import StorageManager, ExperimentModel
+from .timing import summarize
+
+_DIRECTIONS = {"higher": True, "lower": False}
+_TIMING_STATISTICS = frozenset(summarize([0]))
+
+
+class Metric(NamedTuple):
+    """A metric compared with its baseline.
+
+    Attributes:
+        column (str): ``"data"`` or ``"timings"``.
+        key (str): The recorded datum or the timed section.
+        statistic (str): The timing statistic (e.g. ``"median"``); None for
+            recorded data.
+        higher_is_better (bool): The direction in which the metric improves.
+    """
+
+    column: str
+    key: str
+    statistic: Optional[str] = None
+    higher_is_better: bool = False
+
+    @classmethod
+    def parse(cls, spec: str) -> "Metric":
+        """Parse a metric from a string.
+
+        A metric is a recorded datum (e.g. ``"data.loss"``) or a timed
+        section (e.g. ``"timings.fit"`` for its median duration, or
+        ``"timings.fit.min"``), optionally followed by ``":higher"`` if
+        higher values are better or ``":lower"`` (the default).
+        """
+        path, _, direction = spec.partition(":")
+        if direction and direction not in _DIRECTIONS:
+            raise RegressionError(
+                f"Unknown direction {direction!r} in metric {spec!r}; "
+                f"expected one of {sorted(_DIRECTIONS)}"
+            )
+        higher_is_better = _DIRECTIONS.get(direction, False)
+        column, _, key = path.partition(".")
+        if column == "data" and key:
+            return cls(column, key, None, higher_is_better)
+        if column == "timings" and key:
+            section, _, statistic = key.rpartition(".")
+            if statistic not in _TIMING_STATISTICS:
+                section, statistic = key, "median"
+            return cls(column, section, statistic, higher_is_better)
+        raise RegressionError(
+            f"Invalid metric {spec!r}; expected data.<key> or "
+            "timings.<section>[.<statistic>]"
+        )
+
+    @property
+    def label(self) -> str:
+        """The metric's name, e.g. ``data.loss`` or ``timings.fit.median``."""
+        return ".".join(filter(None, (self.column, self.key, self.statistic)))
+
+    def value(self, values: Optional[dict]) -> Optional[float]:
+        """Return the metric from the `data` or `timings` of an experiment.
+
+        Returns None if the metric is missing or not a number.
+        """
+        value = (values or {}).get(self.key)
+        if self.statistic is not None:
+            value = (
+                value.get(self.statistic) if isinstance(value, dict) else None
+            )
+        return as_number(value)
+
+    def element(self):
+        """Return the SQL expression selecting the metric of experiments."""
+        column = getattr(ExperimentModel, self.column)
+        if self.statistic is None:
+            return column[self.key]
+        return column[(self.key, self.statistic)]
+
+
+class Baseline(NamedTuple):
+    """The median and scaled MAD of a metric over previous runs."""
+
+    median: float
+    scale: float
+    runs: int
+
+
+class Regression(NamedTuple):
+    """A metric of an experiment that regressed from its baseline."""
+
+    name: str
+    metric: str
+    value: float
+    median: float
+    scale: float
+    runs: int
+    score: float
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name}: {self.metric} = {self.value:.6g}, baseline "
+            f"{self.median:.6g} ± {self.scale:.3g} over {self.runs} runs "
+            f"({self.score:+.1f} MADs)"
+        )
+
+
+class RegressionDetector:
+    """Compare the metrics of experiments with their baselines.
+
+    Baselines are looked up once per experiment, through the index on
+    experiment names and parameters digests, and read only the metrics of
+    at most the latest `runs` passing runs with the same parameters.
+    Experiments recorded without a parameters digest are ignored (see
+    `StorageManager.backfill_parameter_digests`).
+
+    Args:
+        store (StorageManager): The store holding previous runs.
+        metrics: The metrics to compare, as `Metric` instances or strings
+            (see `Metric.parse`).
+        runs (int): The number of previous passing runs in a baseline.
+        threshold (float): The number of scaled MADs by which a metric must
+            be worse than its median to be a regression.
+        min_runs (int): The minimum number of previous runs required to
+            compare a metric.
+        relative_floor (float): The minimum scale of a baseline relative to
+            its median, so that metrics which never varied do not flag
+            negligible changes.
+    """
+
+    def __init__(
+        self,
+        store: StorageManager,
+        metrics: Iterable,
+        runs: int = REGRESSION_BASELINE_RUNS,
+        threshold: float = REGRESSION_THRESHOLD,
+        min_runs: int = REGRESSION_MIN_RUNS,
+        relative_floor: float = REGRESSION_RELATIVE_FLOOR,
+    ) -> None:
+        self.store = store
+        self.metrics = [
+            m if isinstance(m, Metric) else Metric.parse(m) for m in metrics
+        ]
+        self.runs = runs
+        self.threshold = threshold
+        self.min_runs = min_runs
+        self.relative_floor = relative_floor
+        self.checked = 0
+        self.regressions: List[Regression] = []
+
+    def baselines(self, experiment) -> Dict[Metric, Baseline]:
+        """Return the baselines of the metrics of an experiment.
+
+        Only runs that started before `experiment` are considered, so the
+        experiment itself is never part of its baseline. Metrics with fewer
+        than `min_runs` previous values have no baseline.
+        """
+        columns = sorted({metric.column for metric in self.metrics})
+        # compressed documents (see `compressing_serializer`) are marked by
+        # a type key and their metrics must be read from the whole document
+        markers = [
+            getattr(ExperimentModel, c)[TYPE_KEY].as_string() for c in columns
+        ]
+        statement = (
+            select(
+                ExperimentModel.id,
+                *markers,
+                *(metric.element() for metric in self.metrics),
+            )
+            .where(
+                ExperimentModel.name == experiment.name,
+                ExperimentModel.parameters_digest
+                == json_digest(experiment.parameters),
+                ExperimentModel.start_time < experiment.created_at,
+                ExperimentModel.outcome == ExperimentOutcome.passed.name,
+            )
+            .order_by(ExperimentModel.start_time.desc())
+            .limit(self.runs)
+        )
+        history: Dict[Metric, List[float]] = {m: [] for m in self.metrics}
+        compressed = []
+        with self.store.create_session() as session:
+            for id_, *row in session.execute(statement):
+                if any(row[: len(columns)]):
+                    compressed.append(id_)
+                    continue
+                for metric, value in zip(self.metrics, row[len(columns) :]):
+                    value = as_number(value)
+                    if value is not None:
+                        history[metric].append(value)
+            if compressed:
+                documents = select(
+                    *(getattr(ExperimentModel, c) for c in columns)
+                ).where(ExperimentModel.id.in_(compressed))
+                for row in session.execute(documents):
+                    values = dict(zip(columns, row))
+                    for metric in self.metrics:
+                        value = metric.value(values[metric.column])
+                        if value is not None:
+                            history[metric].append(value)
+        return {
+            metric: self.baseline(values)
+            for metric, values in history.items()
+            if len(values) >= self.min_runs
+        }
+
+    def baseline(self, values: Sequence[float]) -> Baseline:
+        """Return the baseline of some values."""
+        median = statistics.median(values)
+        mad = statistics.median(abs(v - median) for v in values)
+        scale = max(MAD_SCALE * mad, self.relative_floor * abs(median))
+        return Baseline(median, scale, len(values))
+
+    def check(self, experiment) -> List[Regression]:
+        """Compare the metrics of a finished experiment with its baselines.
+
+        Only passed experiments are checked. Regressions are returned and
+        collected in `regressions`.
+        """
+        if experiment.outcome is not ExperimentOutcome.passed:
+            return []
+        self.checked += 1
+        current = {"data": experiment.data, "timings": experiment.timings}
+        regressions = []
+        for metric, baseline in self.baselines(experiment).items():
+            value = metric.value(current[metric.column])
+            if value is None:
+                continue
+            score = self.score(metric, value, baseline)
+            if score > self.threshold:
+                regressions.append(
+                    Regression(
+                        experiment.name,
+                        metric.label,
+                        value,
+                        baseline.median,
+                        baseline.scale,
+                        baseline.runs,
+                        score,
+                    )
+                )
+        self.regressions.extend(regressions)
+        return regressions
+
+    @staticmethod
+    def score(metric: Metric, value: float, baseline: Baseline) -> float:
+        """Return by how many scaled MADs `value` is worse than the median.
+
+        Negative scores are improvements.
+        """
+        delta = value - baseline.median
+        if metric.higher_is_better:
+            delta = -delta
+        if baseline.scale == 0:
+            return math.copysign(math.inf, delta) if delta else 0.0
+        return delta / baseline.scale
+
+
+class RegressionError(PytestExperimentsError):
+    pass
@@ -0,0 +1,329 @@
+"""Prune, downsample and compact the history of experiments.
+
+The experiments table grows with every session. `prune` removes old
+experiments according to a retention policy: keep the latest experiments
+of each name, keep every experiment within a time window, or both. Removed
+experiments may be downsampled to daily summaries (see
+`ExperimentSummaryModel`) and archived to a gzip compressed JSON lines
+file first. `compact` then reclaims the space they used.
+
+Experiments are removed in batches of at most `batch_size`, each in its
+own short transaction, so that a large prune never locks the database for
+long and may be interrupted and resumed.
+"""
+import datetime as dt
+import gzip
+import json
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Union
+from sqlalchemy import and_, delete, exists, or_, select
+from sqlalchemy.orm import Session
+from .common import PytestExperimentsError, as_number
+from .config import PRUNE_BATCH_SIZE
+from .store import (
+    ExperimentModel,
+    ExperimentSummaryModel,
+    ExperimentValueModel,
+    RunModel,
+    StorageManager,
+    experiment_to_payload,
+    glob_to_like,
+)
+
+_COMPACT_STATEMENTS = {
+    "sqlite": ("VACUUM", "ANALYZE"),
+    "postgresql": ("VACUUM", "ANALYZE"),
+}
+
+
+class PruneResult(NamedTuple):
+    """The number of rows removed by `prune`."""
+
+    experiments: int
+    values: int
+    runs: int
+
+
+def prune(
+    store: StorageManager,
+    keep_last: Optional[int] = None,
+    keep_within: Optional[dt.timedelta] = None,
+    name: Optional[str] = None,
+    downsample: bool = False,
+    archive: Union[str, Path, None] = None,
+    batch_size: int = PRUNE_BATCH_SIZE,
+    now: Optional[dt.datetime] = None,
+) -> PruneResult:
+    """Remove old experiments from a store.
+
+    An experiment is removed if it is not protected by any of the given
+    policies: it is not among the `keep_last` most recent experiments of
+    its name, and it started more than `keep_within` ago. At least one
+    policy must be given. Promoted values of removed experiments are
+    removed with them, as are finished runs that no longer have any
+    experiments.
+
+    Args:
+        store (StorageManager): The store to prune.
+        keep_last (int): The number of most recent experiments of each name
+            to keep.
+        keep_within (timedelta): Keep every experiment started within this
+            period before `now`.
+        name (str): A glob pattern; only experiments whose names match are
+            pruned.
+        downsample (bool): If True, add removed experiments to the daily
+            summaries of their name.
+        archive: A file to append removed experiments to, as gzip
+            compressed JSON lines in the format of
+            `pytest_experiments.store.experiment_to_payload` plus their
+            ``id``.
+        batch_size (int): The maximum number of experiments removed in one
+            transaction.
+        now (datetime): The current UTC time; used to test policies.
+
+    Returns:
+        PruneResult: The number of experiments, promoted values and runs
+        removed.
+    """
+    if keep_last is None and keep_within is None:
+        raise RetentionError("Give keep_last, keep_within or both")
+    if keep_last is not None and keep_last < 0:
+        raise RetentionError(f"keep_last must be >= 0, got {keep_last}")
+    if batch_size < 1:
+        raise RetentionError(f"batch_size must be >= 1, got {batch_size}")
+    cutoff = None
+    if keep_within is not None:
+        cutoff = (now or dt.datetime.utcnow()) - keep_within
+    archive_file = None
+    if archive is not None:
+        archive_file = gzip.open(archive, "at", encoding="utf-8")
+    experiments = values = 0
+    try:
+        for experiment_name in _names(store, name):
+            with store.create_session() as session:
+                criteria = _prune_criteria(
+                    session, experiment_name, keep_last, cutoff
+                )
+            if criteria is None:
+                continue
+            while True:
+                with store.create_session() as session, session.begin():
+                    removed = _prune_batch(
+                        session, criteria, batch_size, downsample, archive_file
+                    )
+                if removed is None:
+                    break
+                experiments += removed[0]
+                values += removed[1]
+    finally:
+        if archive_file is not None:
+            archive_file.close()
+    runs = prune_runs(store, batch_size)
+    return PruneResult(experiments, values, runs)
+
+
+def prune_runs(store: StorageManager, batch_size: int = PRUNE_BATCH_SIZE):
+    """Remove finished runs that have no experiments.
+
+    Returns:
+        int: The number of runs removed.
+    """
+    orphaned = (
+        select(RunModel.id)
+        .where(
+            RunModel.end_time.isnot(None),
+            ~exists().where(ExperimentModel.run_id == RunModel.id),
+        )
+        .limit(batch_size)
+    )
+    removed = 0
+    while True:
+        with store.create_session() as session, session.begin():
+            ids = session.execute(orphaned).scalars().all()
+            if not ids:
+                return removed
+            session.execute(delete(RunModel).where(RunModel.id.in_(ids)))
+        removed += len(ids)
+
+
+def compact(store: StorageManager, vacuum: bool = True):
+    """Reclaim unused space and refresh the statistics of the query planner.
+
+    ``VACUUM`` rewrites the whole database (SQLite) or table files
+    (PostgreSQL) and blocks writers while it runs, so run it when no tests
+    are recording experiments. ``ANALYZE`` is cheap.
+
+    Args:
+        store (StorageManager): The store to compact.
+        vacuum (bool): If False, only run ``ANALYZE``.
+    """
+    dialect = store.engine.dialect.name
+    statements = _COMPACT_STATEMENTS.get(dialect)
+    if statements is None:
+        raise RetentionError(f"Cannot compact {dialect} databases")
+    if not vacuum:
+        statements = statements[1:]
+    with store.engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        for statement in statements:
+            connection.exec_driver_sql(statement)
+
+
+def _names(store: StorageManager, pattern: Optional[str]) -> List[str]:
+    statement = select(ExperimentModel.name).distinct()
+    if pattern is not None:
+        statement = statement.where(
+            ExperimentModel.name.like(glob_to_like(pattern), escape="\\")
+        )
+    with store.create_session() as session:
+        return session.execute(statement).scalars().all()
+
+
+def _prune_criteria(
+    session: Session,
+    name: str,
+    keep_last: Optional[int],
+    cutoff: Optional[dt.datetime],
+) -> Optional[list]:
+    """Return the criteria of the experiments of `name` to prune.
+
+    Returns None if none of them are pruned.
+    """
+    criteria = [ExperimentModel.name == name]
+    if cutoff is not None:
+        criteria.append(ExperimentModel.start_time < cutoff)
+    if keep_last is not None:
+        # the most recent experiment that is not kept, through the index on
+        # names and start times; experiments without a start time are the
+        # oldest
+        boundary = session.execute(
+            select(ExperimentModel.start_time, ExperimentModel.id)
+            .where(ExperimentModel.name == name)
+            .order_by(
+                ExperimentModel.start_time.desc().nulls_last(),
+                ExperimentModel.id.desc(),
+            )
+            .offset(keep_last)
+            .limit(1)
+        ).first()
+        if boundary is None:
+            return None
+        start_time, id_ = boundary
+        if start_time is None:
+            older = and_(
+                ExperimentModel.start_time.is_(None),
+                ExperimentModel.id <= id_,
+            )
+        else:
+            older = or_(
+                ExperimentModel.start_time < start_time,
+                ExperimentModel.start_time.is_(None),
+                and_(
+                    ExperimentModel.start_time == start_time,
+                    ExperimentModel.id <= id_,
+                ),
+            )
+        criteria.append(older)
+    return criteria
+
+
+def _prune_batch(session, criteria, batch_size, downsample, archive_file):
+    """Remove one batch of experiments.
+
+    Returns the number of experiments and values removed, or None if there
+    was nothing left to remove.
+    """
+    ids = (
+        session.execute(
+            select(ExperimentModel.id)
+            .where(*criteria)
+            .order_by(ExperimentModel.id)
+            .limit(batch_size)
+        )
+        .scalars()
+        .all()
+    )
+    if not ids:
+        return None
+    if downsample or archive_file is not None:
+        experiments = (
+            session.execute(
+                select(ExperimentModel)
+                .where(ExperimentModel.id.in_(ids))
+                .order_by(ExperimentModel.id)
+            )
+            .scalars()
+            .all()
+        )
+        if archive_file is not None:
+            for experiment in experiments:
+                payload = {"id": experiment.id}
+                payload.update(experiment_to_payload(experiment))
+                archive_file.write(json.dumps(payload) + "\n")
+        if downsample:
+            summarize(session, experiments)
+    # promoted values are deleted explicitly since SQLite does not enforce
+    # foreign keys, and their cascade, by default
+    values = session.execute(
+        delete(ExperimentValueModel).where(
+            ExperimentValueModel.experiment_id.in_(ids)
+        )
+    ).rowcount
+    session.execute(
+        delete(ExperimentModel)
+        .where(ExperimentModel.id.in_(ids))
+        .execution_options(synchronize_session=False)
+    )
+    return len(ids), values
+
+
+def summarize(session: Session, experiments: List[ExperimentModel]):
+    """Add experiments to the daily summaries of their names."""
+    groups: Dict[tuple, List[ExperimentModel]] = {}
+    for experiment in experiments:
+        if experiment.start_time is None:
+            continue
+        key = (experiment.name, experiment.start_time.date())
+        groups.setdefault(key, []).append(experiment)
+    for (name, day), group in groups.items():
+        summary = session.execute(
+            select(ExperimentSummaryModel).where(
+                ExperimentSummaryModel.name == name,
+                ExperimentSummaryModel.day == day,
+            )
+        ).scalar_one_or_none()
+        if summary is None:
+            summary = ExperimentSummaryModel(
+                name=name, day=day, experiments=0, outcomes={}, data={}
+            )
+            session.add(summary)
+        outcomes = dict(summary.outcomes)
+        data = {key: dict(stats) for key, stats in summary.data.items()}
+        for experiment in group:
+            outcomes[experiment.outcome] = (
+                outcomes.get(experiment.outcome, 0) + 1
+            )
+            for key, value in (experiment.data or {}).items():
+                number = as_number(value)
+                if number is not None:
+                    data[key] = _add_to_stats(data.get(key), number)
+        summary.experiments += len(group)
+        # assign new objects so that the JSON columns are marked as changed
+        summary.outcomes = outcomes
+        summary.data = data
+
+
+def _add_to_stats(stats: Optional[dict], value: float) -> dict:
+    if stats is None:
+        return {"count": 1, "mean": value, "min": value, "max": value}
+    count = stats["count"] + 1
+    return {
+        "count": count,
+        "mean": stats["mean"] + (value - stats["mean"]) / count,
+        "min": min(stats["min"], value),
+        "max": max(stats["max"], value),
+    }
+
+
+class RetentionError(PytestExperimentsError):
+    pass
@@ -0,0 +1,95 @@
+"""Record the pytest sessions, or *runs*, that experiments belong to."""
+import datetime as dt
+import platform
+import socket
+import subprocess
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+from .store import RunModel, StorageManager
+
+
+class Run:
+    """The run of the current pytest session.
+
+    The run is recorded in a store the first time an experiment needs it, so
+    that sessions without experiments leave no trace in the database.
+
+    Args:
+        run_id (str): The identifier of the run; a new random identifier if
+            None (pytest-xdist workers share the identifier of their
+            controller).
+        rootdir: The project root, whose git commit is recorded.
+        argv: The command line arguments of the session.
+    """
+
+    def __init__(
+        self,
+        run_id: Optional[str] = None,
+        rootdir: Union[str, Path] = ".",
+        argv: Iterable[str] = (),
+    ) -> None:
+        self.id = run_id or uuid.uuid4().hex
+        self.start_time = dt.datetime.utcnow()
+        self.rootdir = Path(rootdir)
+        self.argv = list(argv)
+        self._stores: Dict[str, StorageManager] = {}
+
+    def to_model(self) -> RunModel:
+        """Collect the metadata of the run into its database model."""
+        return RunModel(
+            id=self.id,
+            start_time=self.start_time,
+            git_sha=git_sha(self.rootdir),
+            hostname=socket.gethostname(),
+            argv=self.argv,
+            python=platform.python_version(),
+            packages=installed_packages(),
+        )
+
+    def record(self, store: StorageManager):
+        """Record the run in a store, unless it is already recorded."""
+        if store.db_uri not in self._stores:
+            store.record_run(self.to_model())
+            self._stores[store.db_uri] = store
+
+    def finish(self):
+        """Record the end of the run in every store it was recorded in."""
+        end_time = dt.datetime.utcnow()
+        for store in self._stores.values():
+            store.finish_run(self.id, end_time)
+        self._stores.clear()
+
+
+def git_sha(path: Path) -> Optional[str]:
+    """Return the commit checked out in the git repository at `path`."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=path,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+            timeout=10,
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def installed_packages() -> Dict[str, str]:
+    """Return the versions of the installed distributions, keyed by name."""
+    try:
+        from importlib import metadata
+    except ImportError:  # python < 3.8
+        try:
+            import importlib_metadata as metadata  # type: ignore
+        except ImportError:
+            return {}
+    versions = {}
+    for distribution in metadata.distributions():
+        name = distribution.metadata["Name"]
+        if name:
+            versions[name] = distribution.version
+    return dict(sorted(versions.items()))
@@ -1,19 +1,73 @@
 """JSON serializers and deserializers for common datatypes."""
+import base64
+import dataclasses
 import datetime as dt
+import sys
+
+NUMPY_BINARY_MIN_SIZE = 1024
+"""Arrays with at least this many elements are encoded as binary."""
 
 
 def numpy_encode(obj):
-    """Encode a numpy array."""
-    return obj.tolist()
+    """Encode a numpy array.
+
+    Arrays with fewer than `NUMPY_BINARY_MIN_SIZE` elements are encoded as
+    nested lists. Larger arrays are encoded as their base64 encoded buffer
+    along with their dtype and shape, which is far more compact and avoids
+    building a python object for every element. Arrays of python objects or
+    structured dtypes are always encoded as nested lists.
+    """
+    if (
+        obj.size < NUMPY_BINARY_MIN_SIZE
+        or obj.dtype.hasobject
+        or obj.dtype.fields is not None
+    ):
+        return obj.tolist()
+    import numpy  # noqa
+
+    buffer = numpy.ascontiguousarray(obj).data
+    return {
+        "dtype": obj.dtype.str,
+        "shape": list(obj.shape),
+        "buffer": base64.b64encode(buffer).decode("ascii"),
+    }
 
 
 def numpy_decode(obj):
     """Decode a numpy array."""
     import numpy  # noqa
 
+    if isinstance(obj, dict):
+        buffer = bytearray(base64.b64decode(obj["buffer"]))
+        array = numpy.frombuffer(buffer, dtype=numpy.dtype(obj["dtype"]))
+        return array.reshape(obj["shape"])
     return numpy.array(obj)
 
 
+def numpy_scalar_encode(obj):
+    """Encode a numpy scalar as the equivalent python object."""
+    return obj.item()
+
+
+def array_encode(obj):
+    """Encode a python `array.array` in the binary form of `numpy_encode`.
+
+    Arrays are always encoded as binary, in little-endian byte order, and
+    are decoded by `numpy_decode` as one dimensional numpy arrays.
+    """
+    if sys.byteorder == "big":
+        obj = type(obj)(obj.typecode, obj)
+        obj.byteswap()
+    kind = "f" if obj.typecode in "fd" else "i"
+    if obj.typecode.isupper():
+        kind = "u"
+    return {
+        "dtype": f"<{kind}{obj.itemsize}",
+        "shape": [len(obj)],
+        "buffer": base64.b64encode(obj.tobytes()).decode("ascii"),
+    }
+
+
 def datetime_encode(obj):
     """Encode a datetime."""
     return obj.isoformat()
@@ -22,3 +76,51 @@ def datetime_encode(obj):
 def datetime_decode(obj):
     """Decode a datetime."""
     return dt.datetime.fromisoformat(obj)
+
+
+def artifact_encode(obj):
+    """Encode a reference to an artifact."""
+    return {"digest": obj.digest, "kind": obj.kind, "size": obj.size}
+
+
+def artifact_decode(obj):
+    """Decode a reference to an artifact."""
+    from .artifacts import ArtifactRef
+
+    return ArtifactRef(**obj)
+
+
+def digest_encode(obj):
+    """Encode the digest of a parameter value."""
+    return {
+        key: value
+        for key, value in dataclasses.asdict(obj).items()
+        if value is not None
+    }
+
+
+def digest_decode(obj):
+    """Decode the digest of a parameter value."""
+    from .capture import ValueDigest
+
+    if obj.get("shape") is not None:
+        obj = dict(obj, shape=tuple(obj["shape"]))
+    return ValueDigest(**obj)
+
+
+def zlib_decode(obj):
+    """Decode a zlib compressed JSON document."""
+    return _decompress_json("zlib", obj)
+
+
+def zstd_decode(obj):
+    """Decode a zstd compressed JSON document."""
+    return _decompress_json("zstd", obj)
+
+
+def _decompress_json(algorithm, obj):
+    from .compression import decompress
+    from .json_tools import json_deserializer
+
+    text = decompress(algorithm, base64.b64decode(obj)).decode()
+    return json_deserializer(text)
@@ -0,0 +1,113 @@
+"""Record series of metrics over the steps of iterative algorithms.
+
+Series are buffered in typed arrays, one per metric, rather than in python
+lists, and buffers are spilled to temporary files every `chunk_size` steps
+so that arbitrarily long series take bounded memory while they are being
+recorded. Memory is only bounded until then: a series is stored as a
+single document, so `Series.arrays` reads the whole series back when the
+experiment is saved, and storing it takes memory in proportion to its
+length (about 8 bytes per metric and step, and more once encoded).
+"""
+import math
+import tempfile
+from array import array
+from typing import IO, Dict, Iterator, List, Mapping, Tuple
+from .config import SERIES_CHUNK_SIZE
+
+STEP = "step"
+"""The name of the column holding the steps of a series."""
+
+_NAN = array("d", [math.nan])
+
+
+class Series:
+    """A series of metrics logged at increasing steps.
+
+    Metrics missing at some step, including steps logged before a metric
+    first appeared, are NaN.
+
+    Args:
+        chunk_size (int): The number of steps buffered in memory before
+            they are spilled to disk.
+    """
+
+    def __init__(self, chunk_size: int = SERIES_CHUNK_SIZE) -> None:
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.chunk_size = chunk_size
+        self._steps = array("q")
+        self._columns: Dict[str, array] = {}
+        self._files: Dict[str, IO[bytes]] = {}
+        self._spilled = 0
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._steps)
+
+    @property
+    def names(self) -> List[str]:
+        """The names of the logged metrics."""
+        return list(self._columns)
+
+    def append(self, step: int, metrics: Mapping[str, float]) -> None:
+        """Append the metrics of one step."""
+        for name in metrics:
+            if name not in self._columns:
+                self._add_column(name)
+        self._steps.append(step)
+        for name, column in self._columns.items():
+            column.append(metrics.get(name, math.nan))
+        if len(self._steps) >= self.chunk_size:
+            self.spill()
+
+    def _add_column(self, name: str) -> None:
+        if self._spilled:
+            spill = self._files[name] = tempfile.TemporaryFile()
+            remaining = self._spilled
+            while remaining:
+                count = min(remaining, self.chunk_size)
+                (_NAN * count).tofile(spill)
+                remaining -= count
+        self._columns[name] = _NAN * len(self._steps)
+
+    def spill(self) -> None:
+        """Write the buffered steps to disk."""
+        spilled = len(self)
+        for name, column in self._buffers():
+            spill = self._files.get(name)
+            if spill is None:
+                spill = self._files[name] = tempfile.TemporaryFile()
+            column.tofile(spill)
+            del column[:]
+        self._spilled = spilled
+
+    def arrays(self) -> Dict[str, array]:
+        """Return every column of the series as a typed array.
+
+        Spilled steps are read back, so the whole series is held in memory.
+        Columns are encoded as binary and decoded as numpy arrays when
+        stored with an experiment.
+        """
+        arrays = {}
+        for name, column in self._buffers():
+            values = array(column.typecode)
+            spill = self._files.get(name)
+            if spill is not None:
+                spill.seek(0)
+                values.fromfile(spill, self._spilled)
+                spill.seek(0, 2)
+            values.extend(column)
+            arrays[name] = values
+        return arrays
+
+    def close(self) -> None:
+        """Discard the series and remove its temporary files."""
+        for spill in self._files.values():
+            spill.close()
+        self._files.clear()
+        self._steps = array("q")
+        self._columns = {}
+        self._spilled = 0
+
+    def _buffers(self) -> Iterator[Tuple[str, array]]:
+        yield STEP, self._steps
+        yield from self._columns.items()
@@ -1,23 +1,113 @@
+import contextlib
 import datetime as dt
-from typing import List
+import os
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
 from sqlalchemy import (
+    bindparam,
+    cast,
     create_engine,
+    event,
     select,
+    BigInteger,
     Column,
+    Date,
     Integer,
     Text,
     JSON,
     DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    inspect,
+    text,
+    update,
+)
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import declarative_base, relationship, Session
+from sqlalchemy.pool import SingletonThreadPool
+from .config import (
+    EXPERIMENT_TABLENAME,
+    EXPERIMENT_VALUES_TABLENAME,
+    QUERY_BATCH_SIZE,
+    RUN_TABLENAME,
+    SCHEMA_ATTEMPTS,
+    SCHEMA_RETRY_DELAY,
+    SQLITE_FAST_PRAGMAS,
+    SUMMARY_TABLENAME,
 )
-from sqlalchemy.orm import declarative_base, Session
-from .config import EXPERIMENT_TABLENAME
-from .common import mark_utc
-from .json_tools import json_serializer, json_deserializer
+from .common import PytestExperimentsError, mark_utc
+from .compression import compressing_serializer
+from .json_tools import json_digest, json_serializer, json_deserializer
 
 
 Base = declarative_base()
 
 
+class RunModel(Base):
+    """The data model for a run: the pytest session that ran experiments.
+
+    The metadata of the session is stored once per run rather than with
+    every experiment, which references its run.
+    """
+
+    __tablename__ = RUN_TABLENAME
+    __table_args__ = (Index("ix_runs_start_time", "start_time"),)
+
+    id = Column(
+        "id", Text, primary_key=True, comment="A unique identifier of a run"
+    )
+    start_time = Column(
+        "start_time",
+        DateTime,
+        comment="The UTC timestamp of the session start",
+    )
+    end_time = Column(
+        "end_time", DateTime, comment="The UTC timestamp of the session end"
+    )
+    git_sha = Column(
+        "git_sha",
+        Text,
+        nullable=True,
+        comment="The git commit checked out in the project, if any",
+    )
+    hostname = Column("hostname", Text, comment="The host the session ran on")
+    argv = Column(
+        "argv", JSON, comment="The command line arguments of the session"
+    )
+    python = Column("python", Text, comment="The python version")
+    packages = Column(
+        "packages",
+        JSON,
+        comment="The versions of the installed packages, keyed by name",
+    )
+
+    @property
+    def start_time_tz(self) -> dt.datetime:
+        """The timezone-aware session start timestamp."""
+        return mark_utc(self.start_time)
+
+    @property
+    def end_time_tz(self) -> dt.datetime:
+        """The timezone-aware session end timestamp."""
+        return mark_utc(self.end_time)
+
+
+def _parameters_digest(context) -> str:
+    return json_digest(context.get_current_parameters()["parameters"])
+
+
 class ExperimentModel(Base):
     """The data model for an experiment.
 
@@ -33,6 +123,17 @@ class ExperimentModel(Base):
     """
 
     __tablename__ = EXPERIMENT_TABLENAME
+    __table_args__ = (
+        Index("ix_experiments_name_start_time", "name", "start_time"),
+        Index("ix_experiments_outcome", "outcome"),
+        Index("ix_experiments_run_id", "run_id"),
+        Index(
+            "ix_experiments_name_parameters_digest",
+            "name",
+            "parameters_digest",
+            "start_time",
+        ),
+    )
 
     id = Column(
         "id",
@@ -70,6 +171,64 @@ class ExperimentModel(Base):
         nullable=False,
         comment="Data collected during the experiment",
     )
+    parameters_digest = Column(
+        "parameters_digest",
+        Text,
+        nullable=True,
+        default=_parameters_digest,
+        comment="A digest of the experiment parameters (see json_digest)",
+    )
+    fingerprint = Column(
+        "fingerprint",
+        Text,
+        nullable=True,
+        index=True,
+        comment="A digest of the experiment name, parameters and code",
+    )
+    cpu_time = Column(
+        "cpu_time",
+        Float,
+        nullable=True,
+        comment="The CPU time used during the experiment, in seconds",
+    )
+    peak_rss_delta = Column(
+        "peak_rss_delta",
+        BigInteger,
+        nullable=True,
+        comment="The growth of the peak resident set size, in bytes",
+    )
+    alloc_peak = Column(
+        "alloc_peak",
+        BigInteger,
+        nullable=True,
+        comment="The peak memory allocated by python, in bytes",
+    )
+    gc_collections = Column(
+        "gc_collections",
+        Integer,
+        nullable=True,
+        comment="The number of garbage collections during the experiment",
+    )
+    timings = Column(
+        "timings",
+        JSON(none_as_null=True),
+        nullable=True,
+        comment="Summary statistics of timed sections, in nanoseconds",
+    )
+    series = Column(
+        "series",
+        JSON(none_as_null=True),
+        nullable=True,
+        comment="Metrics logged at each step, as arrays",
+    )
+    run_id = Column(
+        "run_id",
+        Text,
+        ForeignKey(f"{RUN_TABLENAME}.id"),
+        nullable=True,
+        comment="The run the experiment was recorded in",
+    )
+    values = relationship("ExperimentValueModel", cascade="all, delete-orphan")
 
     @property
     def start_time_tz(self) -> dt.datetime:
@@ -82,21 +241,580 @@ class ExperimentModel(Base):
         return mark_utc(self.end_time)
 
 
+class ExperimentValueModel(Base):
+    """An indexed copy of a parameter or datum of an experiment.
+
+    Parameters and data are stored in JSON columns which cannot be indexed
+    portably. Keys that are frequently used to select experiments may be
+    *promoted*: their values are also written to this table, in a typed and
+    indexed column, when the experiment is recorded.
+    """
+
+    __tablename__ = EXPERIMENT_VALUES_TABLENAME
+    __table_args__ = (
+        Index("ix_experiment_values_number", "source", "key", "number"),
+        Index("ix_experiment_values_text", "source", "key", "text"),
+    )
+
+    experiment_id = Column(
+        "experiment_id",
+        Integer,
+        ForeignKey(f"{EXPERIMENT_TABLENAME}.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="The experiment the value belongs to",
+    )
+    source = Column(
+        "source",
+        Text,
+        primary_key=True,
+        comment='The column the value was taken from: "parameters" or "data"',
+    )
+    key = Column("key", Text, primary_key=True, comment="The key of the value")
+    number = Column(
+        "number", Float, comment="The value if it is a number or boolean"
+    )
+    text = Column("text", Text, comment="The value if it is a string")
+
+
+class ExperimentSummaryModel(Base):
+    """A daily summary of experiments removed from the database.
+
+    Summaries are written when old experiments are downsampled (see
+    `pytest_experiments.retention.prune`): one row per experiment name and
+    day, with the number of experiments by outcome and the count, mean,
+    minimum and maximum of each numeric datum they recorded.
+    """
+
+    __tablename__ = SUMMARY_TABLENAME
+    __table_args__ = (
+        Index("ix_experiment_summaries_name_day", "name", "day", unique=True),
+    )
+
+    id = Column("id", Integer, primary_key=True, autoincrement=True)
+    name = Column(
+        "name", Text, nullable=False, comment="The name of the experiments"
+    )
+    day = Column(
+        "day",
+        Date,
+        nullable=False,
+        comment="The UTC date the experiments started",
+    )
+    experiments = Column(
+        "experiments",
+        Integer,
+        nullable=False,
+        comment="The number of experiments summarized",
+    )
+    outcomes = Column(
+        "outcomes",
+        JSON,
+        nullable=False,
+        comment="The number of experiments by outcome",
+    )
+    data = Column(
+        "data",
+        JSON,
+        nullable=False,
+        comment="The count, mean, min and max of each numeric datum",
+    )
+
+
+def promoted_values(
+    experiment: ExperimentModel, promote: Iterable[str]
+) -> List[ExperimentValueModel]:
+    """Return the promoted values of an experiment.
+
+    Args:
+        experiment (ExperimentModel): The experiment.
+        promote: The keys to promote, prefixed with their column name (e.g.
+            ``"parameters.lr"``). Keys whose value is missing or not a
+            number, boolean or string are skipped.
+    """
+    values = []
+    for column in promote:
+        source, key = split_promoted_key(column)
+        value = getattr(experiment, source).get(key)
+        if value is None:
+            continue
+        kind = _json_kind(value, strict=False)
+        if kind == "as_string":
+            values.append(
+                ExperimentValueModel(source=source, key=key, text=value)
+            )
+        elif kind is not None:
+            values.append(
+                ExperimentValueModel(source=source, key=key, number=value)
+            )
+    return values
+
+
+def split_promoted_key(column: str):
+    """Split a promoted key into its column name and key."""
+    source, _, key = column.partition(".")
+    if source not in ("parameters", "data") or not key:
+        raise StorageError(
+            f"Promoted keys must look like 'parameters.<key>' or "
+            f"'data.<key>', got {column!r}"
+        )
+    return source, key
+
+
+_JSON_COLUMNS = frozenset(
+    c.name
+    for c in ExperimentModel.__table__.columns
+    if isinstance(c.type, JSON)
+)
+
+
+class ExperimentRow:
+    """A compact, read-only experiment.
+
+    Rows hold the values of the columns of the experiments table in a
+    tuple, selected with `raw_experiment_columns`, and take a fraction of
+    the memory of `ExperimentModel` instances, which carry ORM state. Columns
+    are accessed as attributes, as on `ExperimentModel`. JSON columns are
+    decoded the first time they are accessed and the decoded value is
+    memoized, so listing the names, outcomes or timestamps of many
+    experiments decodes nothing.
+
+    Args:
+        values: The values of the columns, in the order of `_fields`.
+    """
+
+    __slots__ = ("_values", "_decoded")
+    _fields = tuple(c.name for c in ExperimentModel.__table__.columns)
+    _index = {name: i for i, name in enumerate(_fields)}
+
+    def __init__(self, values: Sequence[Any]) -> None:
+        object.__setattr__(self, "_values", tuple(values))
+        object.__setattr__(self, "_decoded", None)
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            value = self._values[self._index[name]]
+        except KeyError:
+            raise AttributeError(
+                f"{type(self).__name__!r} object has no attribute {name!r}"
+            ) from None
+        if value is None or name not in _JSON_COLUMNS:
+            return value
+        if self._decoded is None:
+            object.__setattr__(self, "_decoded", {})
+        try:
+            return self._decoded[name]
+        except KeyError:
+            decoded = self._decoded[name] = json_deserializer(value)
+            return decoded
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ExperimentRow):
+            return NotImplemented
+        return self._values == other._values
+
+    def __hash__(self) -> int:
+        return hash(self._values)
+
+    def __reduce__(self):
+        return type(self), (self._values,)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(id={self.id!r}, name={self.name!r})"
+
+    def _asdict(self) -> Dict[str, Any]:
+        """Return the columns of the row, decoded, keyed by name."""
+        return {name: getattr(self, name) for name in self._fields}
+
+    @property
+    def start_time_tz(self) -> dt.datetime:
+        """The timezone-aware experiment start timestamp."""
+        return mark_utc(self.start_time)
+
+    @property
+    def end_time_tz(self) -> dt.datetime:
+        """The timezone-aware experiment end timestamp."""
+        return mark_utc(self.end_time)
+
+
+def raw_experiment_columns() -> list:
+    """Return the columns of the experiments table with raw JSON columns.
+
+    JSON columns are cast to text, so they are selected without being
+    deserialized.
+    """
+    return [
+        cast(c, Text).label(c.name) if c.name in _JSON_COLUMNS else c
+        for c in ExperimentModel.__table__.columns
+    ]
+
+
+def experiment_to_payload(experiment: ExperimentModel) -> dict:
+    """Render an experiment as a dict of primitive values.
+
+    The payload contains only strings, numbers and `None` so that it can be
+    sent between processes (e.g. from a pytest-xdist worker). Timestamps are
+    rendered in ISO format and JSON columns as JSON strings.
+    """
+    payload = {}
+    for column in _payload_columns():
+        value = getattr(experiment, column.name)
+        if value is not None and isinstance(column.type, DateTime):
+            value = value.isoformat()
+        elif isinstance(column.type, JSON):
+            value = json_serializer(value)
+        payload[str(column.name)] = value
+    return payload
+
+
+def experiment_from_payload(payload: dict) -> ExperimentModel:
+    """Rebuild an experiment from the output of `experiment_to_payload`."""
+    values = {}
+    for column in _payload_columns():
+        value = payload.get(column.name)
+        if value is not None and isinstance(column.type, DateTime):
+            value = dt.datetime.fromisoformat(value)
+        elif value is not None and isinstance(column.type, JSON):
+            value = json_deserializer(value)
+        values[column.name] = value
+    return ExperimentModel(**values)
+
+
+def _payload_columns():
+    return [c for c in ExperimentModel.__table__.columns if not c.primary_key]
+
+
+def experiment_column(column: str):
+    """Return the SQL expression for a column of the experiments table.
+
+    JSON keys are given as the column name followed by a dot and the key,
+    e.g. ``"data.loss"``.
+    """
+    table_column, _, key = column.partition(".")
+    if table_column not in ExperimentModel.__table__.columns:
+        raise StorageError(f"Unknown experiment column: {table_column!r}")
+    expression = getattr(ExperimentModel, table_column)
+    if not key:
+        return expression
+    if not isinstance(expression.type, JSON):
+        raise StorageError(f"Column {table_column!r} is not a JSON column")
+    return expression[key].label(column)
+
+
+def experiment_filters(
+    name: Optional[str] = None,
+    outcome: Union[str, Iterable[str], None] = None,
+    since: Optional[dt.datetime] = None,
+    until: Optional[dt.datetime] = None,
+    parameters: Optional[Dict[str, Any]] = None,
+    promote: Iterable[str] = (),
+    run_id: Optional[str] = None,
+) -> list:
+    """Return the SQL criteria selecting experiments.
+
+    See `StorageManager.query_experiments` for a description of the
+    arguments. Parameters listed in `promote` (e.g. ``"parameters.lr"``) are
+    selected through the indexed `ExperimentValueModel` table.
+    """
+    criteria = []
+    if name is not None:
+        pattern = glob_to_like(name)
+        criteria.append(ExperimentModel.name.like(pattern, escape="\\"))
+    if isinstance(outcome, str):
+        criteria.append(ExperimentModel.outcome == outcome)
+    elif outcome is not None:
+        criteria.append(ExperimentModel.outcome.in_(list(outcome)))
+    if since is not None:
+        criteria.append(ExperimentModel.start_time >= since)
+    if until is not None:
+        criteria.append(ExperimentModel.start_time < until)
+    if run_id is not None:
+        criteria.append(ExperimentModel.run_id == run_id)
+    for key, value in (parameters or {}).items():
+        if f"parameters.{key}" in promote:
+            criterion = promoted_value_criterion("parameters", key, value)
+            criteria.append(criterion)
+        else:
+            element = ExperimentModel.parameters[key]
+            criteria.append(json_value_criterion(element, value))
+    return criteria
+
+
+def promoted_value_criterion(source: str, key: str, value):
+    """Return a criterion selecting experiments by a promoted value.
+
+    If `value` is a list, tuple or set the promoted value must equal one of
+    its items.
+    """
+    values = _criterion_values(value)
+    kind = _json_kind(values[0])
+    if kind == "as_string":
+        column = ExperimentValueModel.text
+    else:
+        column = ExperimentValueModel.number
+        values = [float(v) for v in values]
+    matches = select(ExperimentValueModel.experiment_id).where(
+        ExperimentValueModel.source == source,
+        ExperimentValueModel.key == key,
+        column.in_(values),
+    )
+    return ExperimentModel.id.in_(matches)
+
+
+def json_value_criterion(element, value):
+    """Return a criterion comparing a JSON element to a value.
+
+    If `value` is a list, tuple or set the element must equal one of its
+    items.
+    """
+    values = _criterion_values(value)
+    typed = getattr(element, _json_kind(values[0]))()
+    if len(values) == 1:
+        return typed == values[0]
+    return typed.in_(values)
+
+
+def _criterion_values(value) -> list:
+    """Return the values to compare against and check their types."""
+    values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+    if not values:
+        raise StorageError("Cannot select from an empty set of values")
+    if len({_json_kind(v) for v in values}) != 1:
+        raise StorageError(f"Values must all have the same type: {value!r}")
+    return values
+
+
+def _json_kind(value, strict: bool = True) -> Optional[str]:
+    """Return the name of the JSON comparator method for a value.
+
+    Raises a `StorageError` for unsupported values if `strict` is True and
+    returns None otherwise.
+    """
+    if isinstance(value, bool):
+        return "as_boolean"
+    if isinstance(value, (int, float)):
+        return "as_float"
+    if isinstance(value, str):
+        return "as_string"
+    if not strict:
+        return None
+    raise StorageError(f"Cannot select JSON values of type {type(value)}")
+
+
+def glob_to_like(pattern: str) -> str:
+    """Translate a glob pattern to a SQL LIKE pattern escaped with \\."""
+    like = []
+    for char in pattern:
+        if char in "\\%_":
+            like.append("\\" + char)
+        elif char == "*":
+            like.append("%")
+        elif char == "?":
+            like.append("_")
+        else:
+            like.append(char)
+    return "".join(like)
+
+
+def is_sqlite(db_uri: str) -> bool:
+    """Return True if `db_uri` refers to a SQLite database."""
+    return make_url(db_uri).get_backend_name() == "sqlite"
+
+
 def initialize_database(engine):
-    """Initialize a database with the experiments table."""
-    return Base.metadata.create_all(engine)
+    """Initialize a database with the experiments tables.
+
+    Tables and indexes that are missing, e.g. from a database created by an
+    earlier version of this package, are added.
+
+    Args:
+        engine: An engine, or a connection in a transaction (e.g. the
+            synchronous connection of an asyncio engine).
+    """
+    Base.metadata.create_all(engine)
+    create_missing_columns(engine)
+    create_missing_indexes(engine)
+
+
+def initialize_database_with_retry(
+    engine: Engine, attempts: int = SCHEMA_ATTEMPTS
+):
+    """Initialize a database, retrying if another process initializes it.
+
+    Processes that start together, such as pytest-xdist workers, may all
+    find the schema missing and race to create it; all but one then fail
+    on tables or indexes that already exist, and find them on retry.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            initialize_database(engine)
+            return
+        except DBAPIError:
+            if attempt == attempts:
+                raise
+            time.sleep(SCHEMA_RETRY_DELAY * attempt)
+
+
+def check_database(engine: Engine):
+    """Check that a database exists and has an up to date schema.
+
+    Unlike `initialize_database`, this never writes to the database, and a
+    SQLite database file that does not exist is not created.
+
+    Raises:
+        StorageError: If the database, or any of its tables or columns, is
+            missing.
+    """
+    url = engine.url
+    database = url.database
+    if (
+        url.get_backend_name() == "sqlite"
+        and database
+        and database != ":memory:"
+        and not database.startswith("file:")
+        and not os.path.exists(database)
+    ):
+        raise StorageError(f"No experiments database at {database}")
+    inspector = inspect(engine)
+    if not inspector.has_table(EXPERIMENT_TABLENAME):
+        raise StorageError(f"{url!r} is not an experiments database")
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            missing = [table.name]
+        else:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            missing = [
+                f"{table.name}.{column.name}"
+                for column in table.columns
+                if column.name not in existing
+            ]
+        if missing:
+            raise StorageError(
+                f"The experiments database {url!r} is out of date (missing "
+                f"{', '.join(missing)}); run `pytest-experiments migrate`"
+            )
+
+
+def create_missing_columns(engine):
+    """Add the columns of existing tables that are missing.
+
+    Only nullable columns without server defaults may be added this way.
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        columns = inspector.get_columns(table.name)
+        existing = {column["name"] for column in columns}
+        missing = [c for c in table.columns if c.name not in existing]
+        if not missing:
+            continue
+        with _begin(engine) as connection:
+            for column in missing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ADD COLUMN {column.name} {column_type}"
+                    )
+                )
+
+
+@contextlib.contextmanager
+def _begin(engine):
+    """Begin a transaction on an engine, or use a connection's transaction."""
+    if isinstance(engine, Engine):
+        with engine.begin() as connection:
+            yield connection
+    else:
+        yield engine
+
+
+def create_missing_indexes(engine):
+    """Create the indexes of existing tables that are missing."""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        indexes = inspector.get_indexes(table.name)
+        existing = {index["name"] for index in indexes}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(engine)
+
+
+def use_sqlite_pragmas(engine, pragmas: Dict[str, Any]):
+    """Set `pragmas` on every new connection to a SQLite database."""
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
 
 
 class StorageManager:
-    def __init__(self, db_uri: str) -> None:
+    """Manage the connection to an experiments database.
+
+    Args:
+        db_uri (str): The database URI.
+        sqlite_fast (bool): If True and the database is SQLite, trade some
+            durability for write throughput: the database uses write-ahead
+            logging with `synchronous=NORMAL` (see `SQLITE_FAST_PRAGMAS`)
+            and each thread keeps a single long-lived connection.
+        promote: Parameters and data keys (e.g. ``"parameters.lr"`` or
+            ``"data.loss"``) to promote to the indexed experiment values
+            table when experiments are recorded.
+        compression (str): If ``"zlib"`` or ``"zstd"``, compress large JSON
+            documents (see `pytest_experiments.compression`). Compressed
+            documents are read transparently, but their keys cannot be
+            selected or filtered on in SQL; promote the keys you query.
+        compression_level (int): The compression level; the algorithm's
+            default if None.
+        initialize (bool): If True, create the database, or migrate its
+            schema, if needed. Otherwise the database is only checked (see
+            `check_database`), e.g. to read an existing database.
+    """
+
+    def __init__(
+        self,
+        db_uri: str,
+        sqlite_fast: bool = False,
+        promote: Iterable[str] = (),
+        compression: Optional[str] = None,
+        compression_level: Optional[int] = None,
+        initialize: bool = True,
+    ) -> None:
         self._db_uri = db_uri
+        self.promote = tuple(promote)
+        for column in self.promote:
+            split_promoted_key(column)
+        sqlite_fast = sqlite_fast and is_sqlite(db_uri)
+        engine_options = {}
+        if sqlite_fast:
+            engine_options["poolclass"] = SingletonThreadPool
+        serializer = json_serializer
+        if compression is not None:
+            serializer = compressing_serializer(compression, compression_level)
         self.engine = create_engine(
             db_uri,
-            json_serializer=json_serializer,
+            json_serializer=serializer,
             json_deserializer=json_deserializer,
             future=True,
+            **engine_options,
         )
-        initialize_database(self.engine)
+        if sqlite_fast:
+            use_sqlite_pragmas(self.engine, SQLITE_FAST_PRAGMAS)
+        if initialize:
+            initialize_database_with_retry(self.engine)
+            return
+        try:
+            check_database(self.engine)
+        except StorageError:
+            self.engine.dispose()
+            raise
 
     @property
     def db_uri(self) -> str:
@@ -112,10 +830,326 @@ class StorageManager:
         Args:
             experiment (ExperimentModel): The experiment to record.
         """
+        if self.promote:
+            experiment.values = promoted_values(experiment, self.promote)
         with self.create_session() as session, session.begin():
             session.add(experiment)
 
-    def get_all_experiments(self) -> List[ExperimentModel]:
-        """Return all experiments in the database."""
+    def record_experiments(self, experiments: Iterable[ExperimentModel]):
+        """Record many experiments to the database in a single transaction.
+
+        The experiments are written with a bulk insert which is considerably
+        faster than recording each experiment individually.
+
+        Args:
+            experiments (Iterable[ExperimentModel]): The experiments to
+                record.
+        """
+        if not self.promote:
+            with self.create_session() as session, session.begin():
+                session.bulk_save_objects(experiments)
+            return
+        experiments = list(experiments)
+        with self.create_session() as session, session.begin():
+            # the ids of the experiments are needed to write their values
+            session.bulk_save_objects(experiments, return_defaults=True)
+            session.bulk_save_objects(self._promoted_values(experiments))
+
+    def _promoted_values(
+        self, experiments: Iterable[ExperimentModel], skip=frozenset()
+    ) -> List[ExperimentValueModel]:
+        """Return the promoted values of experiments that have ids.
+
+        Values whose ``(experiment_id, source, key)`` is in `skip` are
+        omitted.
+        """
+        values = []
+        for experiment in experiments:
+            for value in promoted_values(experiment, self.promote):
+                value.experiment_id = experiment.id
+                if (value.experiment_id, value.source, value.key) not in skip:
+                    values.append(value)
+        return values
+
+    def backfill_promoted_values(
+        self, batch_size: int = QUERY_BATCH_SIZE
+    ) -> int:
+        """Write the promoted values of previously recorded experiments.
+
+        Use this after promoting a new key to populate its values for the
+        experiments already in the database. Experiments are processed
+        `batch_size` at a time, each batch in its own transaction.
+
+        Returns:
+            int: The number of values written.
+        """
+        written = 0
+        last_id = None
+        while self.promote:
+            statement = select(ExperimentModel).order_by(ExperimentModel.id)
+            if last_id is not None:
+                statement = statement.where(ExperimentModel.id > last_id)
+            with self.create_session() as session, session.begin():
+                experiments = (
+                    session.execute(statement.limit(batch_size))
+                    .scalars()
+                    .all()
+                )
+                if not experiments:
+                    break
+                ids = [experiment.id for experiment in experiments]
+                existing = session.execute(
+                    select(
+                        ExperimentValueModel.experiment_id,
+                        ExperimentValueModel.source,
+                        ExperimentValueModel.key,
+                    ).where(ExperimentValueModel.experiment_id.in_(ids))
+                )
+                values = self._promoted_values(
+                    experiments, skip=frozenset(map(tuple, existing))
+                )
+                session.bulk_save_objects(values)
+            written += len(values)
+            last_id = ids[-1]
+        return written
+
+    def backfill_parameter_digests(
+        self, batch_size: int = QUERY_BATCH_SIZE
+    ) -> int:
+        """Write the parameters digest of previously recorded experiments.
+
+        Experiments recorded before the digest was introduced have none and
+        are not part of regression baselines until it is written.
+        Experiments are processed `batch_size` at a time, each batch in its
+        own transaction.
+
+        Returns:
+            int: The number of experiments updated.
+        """
+        written = 0
+        statement = (
+            select(ExperimentModel.id, ExperimentModel.parameters)
+            .where(ExperimentModel.parameters_digest.is_(None))
+            .order_by(ExperimentModel.id)
+            .limit(batch_size)
+        )
+        while True:
+            with self.create_session() as session, session.begin():
+                rows = session.execute(statement).all()
+                if not rows:
+                    return written
+                session.execute(
+                    update(ExperimentModel)
+                    .where(ExperimentModel.id == bindparam("row_id"))
+                    .values(parameters_digest=bindparam("digest"))
+                    .execution_options(synchronize_session=False),
+                    [
+                        {"row_id": id_, "digest": json_digest(parameters)}
+                        for id_, parameters in rows
+                    ],
+                )
+            written += len(rows)
+
+    def record_run(self, run: RunModel):
+        """Record a run."""
+        with self.create_session() as session, session.begin():
+            session.add(run)
+
+    def finish_run(self, run_id: str, end_time: dt.datetime):
+        """Record the end of a run."""
+        statement = (
+            update(RunModel)
+            .where(RunModel.id == run_id)
+            .values(end_time=end_time)
+        )
+        with self.create_session() as session, session.begin():
+            session.execute(statement)
+
+    def get_runs(self, limit: Optional[int] = None) -> List[RunModel]:
+        """Return the latest runs, most recent first."""
+        statement = select(RunModel).order_by(RunModel.start_time.desc())
+        if limit is not None:
+            statement = statement.limit(limit)
+        with self.create_session() as session:
+            return session.execute(statement).scalars().all()
+
+    def get_summaries(
+        self, name: Optional[str] = None
+    ) -> List[ExperimentSummaryModel]:
+        """Return the daily summaries of removed experiments.
+
+        Args:
+            name (str): A glob pattern that experiment names must match.
+        """
+        statement = select(ExperimentSummaryModel).order_by(
+            ExperimentSummaryModel.name, ExperimentSummaryModel.day
+        )
+        if name is not None:
+            statement = statement.where(
+                ExperimentSummaryModel.name.like(
+                    glob_to_like(name), escape="\\"
+                )
+            )
+        with self.create_session() as session:
+            return session.execute(statement).scalars().all()
+
+    def get_all_experiments(self, lazy: bool = False) -> List[Any]:
+        """Return all experiments in the database.
+
+        Args:
+            lazy (bool): If True, return compact, read-only `ExperimentRow`
+                instances, whose JSON columns are decoded on first access,
+                rather than `ExperimentModel` instances.
+        """
+        if lazy:
+            with self.engine.connect() as connection:
+                statement = select(*raw_experiment_columns())
+                return list(map(ExperimentRow, connection.execute(statement)))
         with self.create_session() as session:
             return session.execute(select(ExperimentModel)).scalars().all()
+
+    def query_experiments(
+        self,
+        name: Optional[str] = None,
+        outcome: Union[str, Iterable[str], None] = None,
+        since: Optional[dt.datetime] = None,
+        until: Optional[dt.datetime] = None,
+        parameters: Optional[Dict[str, Any]] = None,
+        columns: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+        batch_size: int = QUERY_BATCH_SIZE,
+        lazy: bool = False,
+        run_id: Optional[str] = None,
+    ) -> Iterator[Any]:
+        """Stream the experiments that match some criteria.
+
+        Rows are fetched from the database `batch_size` at a time so that
+        arbitrarily many experiments can be processed in constant memory.
+        Experiments are yielded in the order they were recorded.
+
+        Args:
+            name (str): A glob pattern (e.g. ``"test_model.py::*"``) that
+                experiment names must match.
+            outcome: An outcome, or several outcomes, to select.
+            since (datetime): Select experiments started at or after this
+                UTC timestamp.
+            until (datetime): Select experiments started before this UTC
+                timestamp.
+            parameters (dict): Parameter values to select. A list, tuple or
+                set of values selects any of them. Values must be strings,
+                numbers or booleans. Promoted parameters are selected through
+                an index.
+            columns: Project only these columns. Each column is either a
+                column name (e.g. ``"outcome"``) or a key of the parameters
+                or data prefixed with the column name (e.g.
+                ``"data.loss"``).
+            limit (int): The maximum number of experiments to return.
+            batch_size (int): The number of rows to fetch at a time.
+            lazy (bool): If True and `columns` is None, yield compact,
+                read-only `ExperimentRow` instances, whose JSON columns are
+                decoded on first access.
+            run_id (str): Select the experiments of this run.
+
+        Yields:
+            `ExperimentModel` or `ExperimentRow` instances or, if `columns`
+            is given, rows with one value per column.
+        """
+        lazy = lazy and columns is None
+        if lazy:
+            statement = select(*raw_experiment_columns())
+        elif columns is None:
+            statement = select(ExperimentModel)
+        else:
+            statement = select(*map(experiment_column, columns))
+        criteria = experiment_filters(
+            name, outcome, since, until, parameters, self.promote, run_id
+        )
+        statement = statement.where(*criteria).order_by(ExperimentModel.id)
+        if limit is not None:
+            statement = statement.limit(limit)
+        if lazy:
+            with self.engine.connect() as connection:
+                result = connection.execution_options(
+                    stream_results=True
+                ).execute(statement)
+                for partition in result.partitions(batch_size):
+                    yield from map(ExperimentRow, partition)
+            return
+        statement = statement.execution_options(yield_per=batch_size)
+        with self.create_session() as session:
+            result = session.execute(statement)
+            if columns is None:
+                result = result.scalars()
+            yield from result
+
+    def dispose(self):
+        """Close all pooled connections held by the engine."""
+        self.engine.dispose()
+
+
+class StorageRegistry:
+    """A registry of storage managers keyed by database URI.
+
+    A registry lives for the duration of a pytest session so that the engine
+    and schema for each database are created once rather than once per
+    experiment.
+
+    Args:
+        writer_factory: An optional callable that wraps a storage manager in
+            a writer (e.g. a `BufferedWriter`). If omitted, experiments are
+            written directly through the storage manager. It may be replaced
+            until the first writer is created.
+        store_factory: A callable that creates a storage manager from a
+            database URI.
+    """
+
+    def __init__(
+        self,
+        writer_factory: Optional[Callable[[StorageManager], Any]] = None,
+        store_factory: Callable[[str], StorageManager] = StorageManager,
+    ) -> None:
+        self._stores: Dict[str, StorageManager] = {}
+        self._store_factory = store_factory
+        self._writers: Dict[str, Any] = {}
+        self.writer_factory = writer_factory
+        self.errors: List[Any] = []
+
+    def get(self, db_uri: str) -> StorageManager:
+        """Return the storage manager for `db_uri`, creating it if needed."""
+        store = self._stores.get(db_uri)
+        if store is None:
+            store = self._stores[db_uri] = self._store_factory(db_uri)
+        return store
+
+    def get_writer(self, db_uri: str) -> Any:
+        """Return the object used to record experiments to `db_uri`."""
+        store = self.get(db_uri)
+        if self.writer_factory is None:
+            return store
+        writer = self._writers.get(db_uri)
+        if writer is None:
+            writer = self._writers[db_uri] = self.writer_factory(store)
+        return writer
+
+    def flush(self):
+        """Flush any experiments pending in the registered writers."""
+        for writer in self._writers.values():
+            writer.flush()
+
+    def close(self):
+        """Close every registered writer and storage manager.
+
+        Failures reported by writers that do not raise (e.g. a
+        `BackgroundWriter`) are collected in `errors`.
+        """
+        for writer in self._writers.values():
+            writer.close()
+            self.errors.extend(getattr(writer, "errors", ()))
+        self._writers.clear()
+        for store in self._stores.values():
+            store.dispose()
+        self._stores.clear()
+
+
+class StorageError(PytestExperimentsError):
+    pass
@@ -0,0 +1,93 @@
+"""Time sections of experiments and benchmark functions."""
+
+import functools
+import time
+from array import array
+from typing import Callable, Dict, Sequence
+
+
+class Timer:
+    """Time a section of code; usable as a context manager or decorator.
+
+    Each timed run appends its duration in nanoseconds to `samples`.
+
+    Args:
+        samples (array): The array to append durations to.
+    """
+
+    def __init__(self, samples: array) -> None:
+        self.samples = samples
+        self._starts = []
+
+    def __enter__(self) -> "Timer":
+        self._starts.append(time.perf_counter_ns())
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        end = time.perf_counter_ns()
+        self.samples.append(end - self._starts.pop())
+
+    def __call__(self, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            with self:
+                return fn(*args, **kwargs)
+
+        return timed
+
+
+def benchmark(fn: Callable[[], object], repeat: int, warmup: int) -> array:
+    """Call `fn` repeatedly and return the duration of each call.
+
+    The durations, in nanoseconds, are written into an array allocated
+    before the timing loop, so the loop itself does not allocate.
+
+    Args:
+        fn: The function to benchmark; it is called without arguments.
+        repeat (int): The number of timed calls.
+        warmup (int): The number of untimed calls made first.
+    """
+    if repeat < 1 or warmup < 0:
+        raise ValueError("repeat must be positive and warmup non-negative")
+    for _ in range(warmup):
+        fn()
+    samples = array("q", bytes(8 * repeat))
+    clock = time.perf_counter_ns
+    for i in range(repeat):
+        start = clock()
+        fn()
+        samples[i] = clock() - start
+    return samples
+
+
+def summarize(samples: Sequence[int]) -> Dict[str, float]:
+    """Return summary statistics of durations in nanoseconds.
+
+    The statistics are the number of samples and the total, mean, minimum,
+    first quartile, median, third quartile, interquartile range and maximum
+    durations, all in nanoseconds. Quartiles are linearly interpolated.
+    """
+    ordered = sorted(samples)
+    count = len(ordered)
+    total = sum(ordered)
+    q1, median, q3 = (quantile(ordered, q) for q in (0.25, 0.5, 0.75))
+    return {
+        "count": count,
+        "total": total,
+        "mean": total / count,
+        "min": ordered[0],
+        "q1": q1,
+        "median": median,
+        "q3": q3,
+        "iqr": q3 - q1,
+        "max": ordered[-1],
+    }
+
+
+def quantile(ordered: Sequence[float], q: float) -> float:
+    """Return the `q` quantile of sorted values, linearly interpolated."""
+    position = q * (len(ordered) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    fraction = position - lower
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * fraction
@@ -0,0 +1,228 @@
+"""Strategies for writing finished experiments to the database."""
+import queue
+import threading
+import time
+from typing import List, NamedTuple, Optional
+from .config import (
+    MAX_PENDING_EXPERIMENTS,
+    WRITER_BATCH_SIZE,
+    WORKEROUTPUT_KEY,
+)
+from .common import PytestExperimentsError
+from .store import (
+    StorageManager,
+    ExperimentModel,
+    experiment_to_payload,
+    initialize_database,
+)
+
+
+class BufferedWriter:
+    """Collect finished experiments in memory and write them in batches.
+
+    Pending experiments are written with a single bulk insert once
+    `flush_every` experiments are pending or `flush_interval` seconds have
+    elapsed since the last flush, whichever happens first. The interval is
+    checked whenever an experiment is recorded. At most `max_pending`
+    experiments are held in memory at any time. Failures of the final flush
+    on `close` are collected in `errors` rather than raised.
+
+    Args:
+        store (StorageManager): The storage manager to write to.
+        flush_every (int): The number of pending experiments that triggers
+            a flush.
+        flush_interval (float): The number of seconds after which pending
+            experiments are flushed.
+        max_pending (int): The maximum number of experiments to hold in
+            memory.
+    """
+
+    def __init__(
+        self,
+        store: StorageManager,
+        flush_every: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_pending: int = MAX_PENDING_EXPERIMENTS,
+    ) -> None:
+        if flush_every is not None and flush_every < 1:
+            raise WriterError("flush_every must be a positive integer.")
+        if max_pending < 1:
+            raise WriterError("max_pending must be a positive integer.")
+        self.store = store
+        self.flush_every = min(flush_every or max_pending, max_pending)
+        self.flush_interval = flush_interval
+        self.errors: List[WriteFailure] = []
+        self._pending: List[ExperimentModel] = []
+        self._last_flush = time.monotonic()
+
+    @property
+    def db_uri(self) -> str:
+        return self.store.db_uri
+
+    @property
+    def pending(self) -> int:
+        """The number of experiments waiting to be written."""
+        return len(self._pending)
+
+    def record_experiment(self, experiment: ExperimentModel):
+        """Add an experiment to the buffer, flushing if necessary."""
+        self._pending.append(experiment)
+        if self._should_flush():
+            self.flush()
+
+    def _should_flush(self) -> bool:
+        if len(self._pending) >= self.flush_every:
+            return True
+        if self.flush_interval is None:
+            return False
+        return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self):
+        """Write all pending experiments to the database."""
+        pending, self._pending = self._pending, []
+        self._last_flush = time.monotonic()
+        if pending:
+            self.store.record_experiments(pending)
+
+    def close(self):
+        """Flush any pending experiments, collecting failures in `errors`."""
+        pending = len(self._pending)
+        try:
+            self.flush()
+        except Exception as e:  # pylint: disable=broad-except
+            self.errors.append(WriteFailure(e, pending))
+
+
+class WriteFailure(NamedTuple):
+    """A batch of experiments that could not be written."""
+
+    error: BaseException
+    experiments: int
+
+
+class BackgroundWriter:
+    """Write finished experiments to the database from a dedicated thread.
+
+    Recording an experiment only places it on a queue, so notebook teardown
+    never waits on the database. The writer thread owns its own connection
+    and writes whatever is queued in batches of at most `batch_size`.
+    Failed writes are collected in `errors` rather than raised.
+
+    Args:
+        store (StorageManager): The storage manager to write to.
+        batch_size (int): The maximum number of experiments per insert.
+        max_pending (int): The maximum number of queued experiments;
+            recording blocks while the queue is full.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        store: StorageManager,
+        batch_size: int = WRITER_BATCH_SIZE,
+        max_pending: int = MAX_PENDING_EXPERIMENTS,
+    ) -> None:
+        if batch_size < 1:
+            raise WriterError("batch_size must be a positive integer.")
+        self.store = store
+        self.batch_size = batch_size
+        self.errors: List[WriteFailure] = []
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def db_uri(self) -> str:
+        return self.store.db_uri
+
+    def record_experiment(self, experiment: ExperimentModel):
+        """Queue an experiment to be written by the writer thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="experiments-writer", daemon=True
+            )
+            self._thread.start()
+        self._queue.put(experiment)
+
+    def _run(self):
+        initialized = False
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is self._STOP
+            experiments = batch[:-1] if stop else batch
+            try:
+                if not initialized:
+                    # in-memory SQLite databases are private to each thread
+                    initialize_database(self.store.engine)
+                    initialized = True
+                if experiments:
+                    self.store.record_experiments(experiments)
+            except Exception as e:  # pylint: disable=broad-except
+                self.errors.append(WriteFailure(e, len(experiments)))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """Block until every queued experiment has been written."""
+        self._queue.join()
+
+    def close(self):
+        """Write every queued experiment and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self._thread = None
+
+
+class WorkerOutputWriter:
+    """Send finished experiments from a pytest-xdist worker to the controller.
+
+    Experiments are rendered as payloads (see `experiment_to_payload`) and
+    stored in the worker output. The plugin sends pending payloads to the
+    controller along with the next test report, so a worker only holds the
+    experiments of its running test; pytest-xdist sends the rest of the
+    worker output when the worker finishes. The controller then writes the
+    experiments of every worker, so workers never contend for the database.
+
+    Args:
+        store (StorageManager): The storage manager of the worker session.
+        workeroutput (dict): The `workeroutput` of the worker config.
+    """
+
+    def __init__(self, store: StorageManager, workeroutput: dict) -> None:
+        self.store = store
+        self._payloads: List[dict] = workeroutput.setdefault(
+            WORKEROUTPUT_KEY, []
+        )
+
+    @property
+    def db_uri(self) -> str:
+        return self.store.db_uri
+
+    @property
+    def pending(self) -> int:
+        """The number of experiments waiting to be sent to the controller."""
+        return len(self._payloads)
+
+    def record_experiment(self, experiment: ExperimentModel):
+        """Add an experiment to the worker output."""
+        self._payloads.append(experiment_to_payload(experiment))
+
+    def flush(self):
+        """Do nothing; payloads are sent with the next test report."""
+
+    def close(self):
+        """Do nothing; the worker output is sent when the worker finishes."""
+
+
+class WriterError(PytestExperimentsError):
+    pass
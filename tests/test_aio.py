@@ -0,0 +1,115 @@
+import asyncio
+import datetime as dt
+import pytest
+from pytest_experiments.store import ExperimentModel, RunModel, StorageManager
+
+pytest.importorskip("aiosqlite")
+
+from pytest_experiments.aio import (  # noqa: E402
+    AsyncStorageError,
+    AsyncStorageManager,
+    AsyncWriter,
+    LoopThread,
+    async_db_uri,
+)
+
+
+@pytest.fixture
+def db_uri(tmp_path):
+    return f"sqlite:///{tmp_path / 'experiments.db'}"
+
+
+def experiment(name, loss, run_id=None):
+    return ExperimentModel(
+        name=name,
+        start_time=dt.datetime(2021, 6, 30),
+        outcome="passed",
+        parameters={"lr": loss / 10},
+        data={"loss": loss},
+        run_id=run_id,
+    )
+
+
+@pytest.mark.parametrize(
+    "db_uri, expected",
+    [
+        ("sqlite:///e.db", "sqlite+aiosqlite:///e.db"),
+        ("sqlite+aiosqlite:///e.db", "sqlite+aiosqlite:///e.db"),
+        ("postgresql://localhost/e", "postgresql+asyncpg://localhost/e"),
+        (
+            "postgresql+psycopg2://localhost/e",
+            "postgresql+psycopg2://localhost/e",
+        ),
+    ],
+)
+def test_async_db_uri(db_uri, expected):
+    assert async_db_uri(db_uri) == expected
+
+
+def test_async_store(db_uri):
+    async def main():
+        store = AsyncStorageManager(db_uri, promote=["parameters.lr"])
+        await store.record_run(RunModel(id="run"))
+        await store.record_experiment(experiment("test_a", 1.0, "run"))
+        await store.record_experiments(
+            [experiment("test_b", 2.0, "run"), experiment("test_b", 3.0)]
+        )
+        await store.finish_run("run", dt.datetime(2021, 7, 1))
+        everything = await store.get_all_experiments()
+        losses = [
+            exp.data["loss"]
+            async for exp in store.query_experiments(
+                name="test_b", parameters={"lr": 0.3}
+            )
+        ]
+        await store.dispose()
+        return everything, losses
+
+    everything, losses = asyncio.run(main())
+    assert [exp.name for exp in everything] == ["test_a", "test_b", "test_b"]
+    assert losses == [3.0]
+
+    store = StorageManager(db_uri, promote=["parameters.lr"])
+    assert store.get_runs()[0].end_time == dt.datetime(2021, 7, 1)
+    assert len(list(store.query_experiments(run_id="run"))) == 2
+    assert len(list(store.query_experiments(parameters={"lr": 0.3}))) == 1
+    store.dispose()
+
+
+def test_async_writer_shares_one_loop(db_uri):
+    writer = AsyncWriter(AsyncStorageManager(db_uri))
+    future = writer.record_experiment_soon(experiment("test_soon", 1.0))
+
+    async def record(loss):
+        await writer.record_experiment(experiment("test_awaited", loss))
+
+    # each call runs in a new event loop, as tests do
+    asyncio.run(record(2.0))
+    asyncio.run(record(3.0))
+    future.result()
+    writer.close()
+    assert writer.errors == []
+
+    store = StorageManager(db_uri)
+    names = sorted(exp.name for exp in store.get_all_experiments())
+    assert names == ["test_awaited", "test_awaited", "test_soon"]
+    store.dispose()
+
+
+def test_async_writer_collects_errors(db_uri):
+    writer = AsyncWriter(AsyncStorageManager(db_uri))
+    future = writer.record_experiment_soon(ExperimentModel(name=None))
+    writer.flush()
+    assert future.exception() is not None
+    assert len(writer.errors) == 1
+    assert writer.errors[0].experiments == 1
+    writer.close()
+
+
+def test_closed_loop_thread():
+    loop_thread = LoopThread()
+    loop_thread.close()
+    coroutine = asyncio.sleep(0)
+    with pytest.raises(AsyncStorageError):
+        loop_thread.submit(coroutine)
+    coroutine.close()
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from pytest_experiments import json_tools
+from pytest_experiments.artifacts import (
+    ArtifactError,
+    ArtifactRef,
+    ArtifactStore,
+    max_json_size,
+)
+
+
+def test_numpy_artifacts_are_memory_mapped(tmp_path):
+    store = ArtifactStore(tmp_path)
+    a = np.arange(100.0).reshape((10, 10))
+    ref = store.put(a)
+    assert ref.kind == "npy"
+    assert store.path(ref).exists()
+    loaded = store.load(ref)
+    assert isinstance(loaded, np.memmap)
+    assert np.array_equal(loaded, a)
+    assert np.array_equal(store.load(ref, mmap_mode=False), a)
+
+
+def test_artifacts_are_deduplicated(tmp_path):
+    store = ArtifactStore(tmp_path)
+    first = store.put({"weights": [1.0, 2.0, 3.0]})
+    second = store.put({"weights": [1.0, 2.0, 3.0]})
+    assert first == second
+    assert first.kind == "json"
+    files = [p for p in tmp_path.rglob("*") if p.is_file()]
+    assert files == [store.path(first)]
+    assert store.load(first) == {"weights": [1.0, 2.0, 3.0]}
+
+
+def test_bytes_artifacts(tmp_path):
+    store = ArtifactStore(tmp_path)
+    ref = store.put(b"\x00\x01\x02")
+    assert ref.kind == "bytes"
+    assert ref.size == 3
+    assert bytes(store.load(ref)) == b"\x00\x01\x02"
+
+
+def test_maybe_put(tmp_path):
+    store = ArtifactStore(tmp_path, min_size=64)
+    assert store.maybe_put(1.0) == 1.0
+    assert store.maybe_put([1, 2, 3]) == [1, 2, 3]
+    ref = store.maybe_put(np.zeros(8))
+    assert isinstance(ref, ArtifactRef)
+    assert ref.size > 64
+
+
+def test_maybe_put_only_encodes_large_values(tmp_path, monkeypatch):
+    encoded = []
+
+    def json_serializer(value):
+        encoded.append(value)
+        return json_tools.json_serializer(value)
+
+    monkeypatch.setattr(
+        "pytest_experiments.artifacts.json_serializer", json_serializer
+    )
+    store = ArtifactStore(tmp_path, min_size=1024)
+    small = {"loss": 0.5, "epochs": [1, 2, 3], "name": "fit"}
+    assert store.maybe_put(small) == small
+    assert store.maybe_put({"weights": np.zeros(4)})["weights"].size == 4
+    assert encoded == []
+    ref = store.maybe_put({"losses": [0.25] * 1_000})
+    assert isinstance(ref, ArtifactRef)
+    assert store.load(ref) == {"losses": [0.25] * 1_000}
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        {"a": [1.0 / 3, -(2 ** 70), True, None, 'quote "this"\n']},
+        [np.arange(5), np.linspace(-1e300, 1e-300, 7)],
+        ["\u00e9" * 10, {1: 2.5}],
+    ],
+)
+def test_max_json_size_is_an_upper_bound(value):
+    size = len(json_tools.json_serializer(value).encode())
+    assert max_json_size(value, 1 << 20) >= size
+    assert max_json_size(value, 8) >= 8
+    assert max_json_size([object()], 1 << 20) is None
+
+
+def test_missing_artifact(tmp_path):
+    store = ArtifactStore(tmp_path)
+    with pytest.raises(ArtifactError):
+        store.load(ArtifactRef("0" * 64, "json", 0))
+
+
+def test_artifact_ref_serde():
+    ref = ArtifactRef("ab" * 32, "npy", 128)
+    encoded = json_tools.json_serializer({"ref": ref})
+    assert json_tools.json_deserializer(encoded) == {"ref": ref}
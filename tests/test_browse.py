@@ -0,0 +1,104 @@
+import datetime as dt
+import pytest
+from pytest_experiments.browse import (
+    BrowseError,
+    compare_runs,
+    latest_experiments,
+    stats,
+    trends,
+)
+from pytest_experiments.store import ExperimentModel, RunModel, StorageManager
+
+START = dt.datetime(2021, 6, 1)
+
+
+@pytest.fixture(params=[(), ("data.loss",)], ids=["json", "promoted"])
+def store(request, tmp_path):
+    store = StorageManager(
+        f"sqlite:///{tmp_path / 'experiments.db'}", promote=request.param
+    )
+    for run in range(3):
+        store.record_run(
+            RunModel(id=f"run{run}", start_time=START + dt.timedelta(run))
+        )
+        for i in range(4):
+            store.record_experiment(
+                ExperimentModel(
+                    name=f"test_fit[{i}]",
+                    start_time=START + dt.timedelta(days=run, minutes=i),
+                    outcome="failed" if run == i else "passed",
+                    parameters={"lr": 0.1 if i % 2 else 0.01},
+                    data={"loss": float(10 * run + i), "tag": "x"},
+                    run_id=f"run{run}",
+                )
+            )
+    yield store
+    store.dispose()
+
+
+def test_latest_experiments(store):
+    rows = list(latest_experiments(store, ["outcome", "data.loss"]))
+    assert rows == [
+        ("test_fit[0]", "passed", 20.0),
+        ("test_fit[1]", "passed", 21.0),
+        ("test_fit[2]", "failed", 22.0),
+        ("test_fit[3]", "passed", 23.0),
+    ]
+    rows = latest_experiments(store, ["data.loss"], run_id="run0")
+    assert [row[1] for row in rows] == [0.0, 1.0, 2.0, 3.0]
+
+
+def test_compare_runs(store):
+    (delta,) = compare_runs(store, "run0", "run2", name="test_fit[1]")
+    assert delta == ("test_fit[1]", "data.loss", 1.0, 21.0)
+    deltas = compare_runs(store, "run0", "run2")
+    assert [(d.name, d.metric) for d in deltas] == [
+        (f"test_fit[{i}]", "data.loss") for i in range(4)
+    ]
+    assert deltas[1].before == 1.0
+    assert deltas[1].delta == 20.0
+    assert deltas[1].relative == 20.0
+    assert deltas[0].relative is None
+    assert compare_runs(store, "run0", "run1", ["data.loss"]) == [
+        d._replace(after=d.before + 10) for d in deltas
+    ]
+
+
+def test_trends(store):
+    by_day = trends(store)
+    assert [t.period for t in by_day] == [
+        "2021-06-01",
+        "2021-06-02",
+        "2021-06-03",
+    ]
+    assert all(t.outcomes == {"failed": 1, "passed": 3} for t in by_day)
+    assert by_day[0].pass_rate == 0.75
+    by_run = trends(store, by="run", name="test_fit[0]")
+    assert by_run[0] == ("run0", {"failed": 1})
+    assert by_run[1] == ("run1", {"passed": 1})
+    with pytest.raises(BrowseError):
+        trends(store, by="week")
+
+
+def test_stats(store):
+    results = stats(store, "data.loss", percentiles=[50, 100])
+    assert results[0] == (
+        "test_fit[0]",
+        3,
+        10.0,
+        0.0,
+        20.0,
+        {50: 10.0, 100: 20.0},
+    )
+    assert len(results) == 4
+    (overall,) = stats(store, "data.loss", by=None, percentiles=[25])
+    assert overall.count == 12
+    assert overall.mean == 11.5
+    assert overall.percentiles == {25: 2.75}
+    by_lr = stats(store, "data.loss", by="parameters.lr", outcome="passed")
+    assert [(float(s.group), s.count) for s in by_lr] == [(0.01, 4), (0.1, 5)]
+    assert stats(store, "data.tag") == []
+    with pytest.raises(BrowseError):
+        stats(store, "loss")
+    with pytest.raises(BrowseError):
+        stats(store, "data.loss", percentiles=[101])
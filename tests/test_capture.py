@@ -0,0 +1,76 @@
+import datetime as dt
+import numpy as np
+from pytest_experiments.capture import ParameterCapture, ValueDigest
+from pytest_experiments.json_tools import json_deserializer, json_serializer
+
+
+def test_small_values_are_kept():
+    capture = ParameterCapture(max_size=1_024)
+    now = dt.datetime.utcnow()
+    for value in (1, 0.5, None, True, "sgd", now, np.float64(0.5)):
+        assert capture.capture(value) is value
+    assert capture.capture((1, {"a": [2]})) == [1, {"a": [2]}]
+    small = np.arange(3)
+    assert capture.capture(small) is small
+    assert capture.hashed == 0
+
+
+def test_large_values_are_digested():
+    capture = ParameterCapture(max_size=1_024)
+    x = np.arange(1_000, dtype="float64").reshape(10, 100)
+    digest = capture.capture(x)
+    assert isinstance(digest, ValueDigest)
+    assert digest.type == "numpy.ndarray"
+    assert digest.shape == (10, 100)
+    assert digest.dtype == "<f8"
+    assert digest.size == 8_000
+    assert digest == ParameterCapture(1_024).capture(x.copy())
+    assert digest == ParameterCapture(1_024).capture(np.asfortranarray(x))
+    assert digest != ParameterCapture(1_024).capture(x + 1)
+    assert digest != ParameterCapture(1_024).capture(x.reshape(100, 10))
+
+    data = capture.capture({"x": x, "lr": 0.1})
+    assert data == {"x": digest, "lr": 0.1}
+    assert capture.capture(b"\x00" * 2_000).size == 2_000
+    assert capture.capture("a" * 2_000).digest is not None
+    assert capture.capture(list(range(200))).shape == (200,)
+
+
+def test_unknown_types_are_summarized():
+    class Model:
+        pass
+
+    digest = ParameterCapture().capture(Model())
+    assert digest.type.endswith("<locals>.Model")
+    assert digest.digest is None
+
+
+def test_digests_are_memoized():
+    capture = ParameterCapture(max_size=1_024)
+    x = np.zeros(1_000)
+    first = capture.capture(x)
+    assert capture.capture(x) is first
+    assert capture.hashed == 1
+    del x
+    assert not capture._memo
+    capture.capture(np.ones(1_000))
+    assert capture.hashed == 2
+
+
+def test_keyed_values_are_memoized():
+    capture = ParameterCapture(max_size=1_024)
+    data = list(range(1_000))
+    first = capture.capture(data, key="dataset")
+    assert capture.capture(data, key="dataset") is first
+    assert capture.hashed == 1
+    assert capture.capture(list(data), key="dataset") == first
+    assert capture.hashed == 2
+    capture.forget("dataset")
+    assert not capture.remembers("dataset")
+    capture.capture(data)
+    assert capture.hashed == 3
+
+
+def test_digest_json_round_trip():
+    digest = ParameterCapture(max_size=0).capture(np.zeros((2, 3)))
+    assert json_deserializer(json_serializer({"x": digest})) == {"x": digest}
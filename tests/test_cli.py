@@ -0,0 +1,155 @@
+import numpy as np
+import pytest
+from sqlalchemy import text, update
+from pytest_experiments.cli import main
+from pytest_experiments.store import ExperimentModel, StorageManager
+
+
+@pytest.fixture
+def db_uri(tmp_path):
+    db_uri = f"sqlite:///{tmp_path / 'experiments.db'}"
+    store = StorageManager(db_uri)
+    store.record_experiments(
+        ExperimentModel(
+            name=f"test_fit[{i}]",
+            outcome="passed" if i else "failed",
+            parameters={"i": i, "opt": "sgd"},
+            data={"loss": 1.0 / (i + 1)},
+        )
+        for i in range(4)
+    )
+    store.dispose()
+    return db_uri
+
+
+def test_export(db_uri, tmp_path, capsys):
+    output = tmp_path / "out.npz"
+    assert (
+        main(
+            [
+                "--database",
+                db_uri,
+                "export",
+                str(output),
+                "--outcome=passed",
+                "--param",
+                "opt=sgd",
+                "--param",
+                "i=[1, 3]",
+            ]
+        )
+        == 0
+    )
+    assert capsys.readouterr().out == f"exported 2 experiment(s) to {output}\n"
+    assert np.load(output)["parameters.i"].tolist() == [1, 3]
+
+
+def test_export_error(db_uri, tmp_path, capsys):
+    assert main(["--database", db_uri, "export", str(tmp_path / "x.csv")]) == 1
+    assert capsys.readouterr().err.startswith("error: Cannot export")
+
+
+def test_invalid_parameter(db_uri):
+    with pytest.raises(SystemExit):
+        main(["--database", db_uri, "export", "out.npz", "--param", "opt"])
+
+
+def test_prune(db_uri, tmp_path, capsys):
+    archive = tmp_path / "archive.jsonl.gz"
+    argv = ["--database", db_uri, "prune", "--name", "test_fit[0]"]
+    assert main(argv + ["--keep-last=0", f"--archive={archive}"]) == 0
+    assert capsys.readouterr().out == (
+        "removed 1 experiment(s), 0 promoted value(s) and 0 run(s)\n"
+    )
+    assert archive.exists()
+    store = StorageManager(db_uri)
+    assert len(store.get_all_experiments()) == 3
+    store.dispose()
+    assert main(["--database", db_uri, "prune", "--compact"]) == 1
+    assert capsys.readouterr().err.startswith("error: Give keep_last")
+
+
+def test_list(db_uri, capsys):
+    argv = ["--database", db_uri, "list", "--column=data.loss"]
+    assert main(argv + ["--outcome=passed"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ["name", "outcome", "start_time", "data.loss"]
+    assert [line.split()[0] for line in lines[1:]] == [
+        "test_fit[1]",
+        "test_fit[2]",
+        "test_fit[3]",
+    ]
+    assert lines[1].split()[-1] == "0.5"
+
+
+def test_stats_and_trends(db_uri, capsys):
+    argv = ["--database", db_uri, "stats", "data.loss", "--by=all"]
+    assert main(argv + ["--percentile=50"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ["all", "count", "mean", "min", "max", "p50"]
+    assert lines[1].split() == [
+        "all",
+        "4",
+        "0.520833",
+        "0.25",
+        "1",
+        "0.416667",
+    ]
+    assert main(["--database", db_uri, "trends", "--by=run"]) == 0
+    assert capsys.readouterr().out.split() == [
+        "run",
+        "total",
+        "pass",
+        "rate",
+    ]
+
+
+def test_stats_of_promoted_values(tmp_path, capsys):
+    db_uri = f"sqlite:///{tmp_path / 'experiments.db'}"
+    store = StorageManager(db_uri, promote=["data.loss"])
+    store.record_experiments(
+        ExperimentModel(
+            name="test_fit", outcome="passed", parameters={}, data={"loss": x}
+        )
+        for x in (0.5, 1.5)
+    )
+    # only the promoted values can be read
+    with store.engine.begin() as connection:
+        connection.execute(update(ExperimentModel).values(data={}))
+    store.dispose()
+
+    argv = ["--database", db_uri, "--promote=data.loss", "stats", "data.loss"]
+    assert main(argv) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[1].split() == ["test_fit", "2", "1", "0.5", "1.5"]
+    assert main(["--database", db_uri, "stats", "data.loss"]) == 0
+    assert len(capsys.readouterr().out.splitlines()) == 1
+
+
+def test_compare_without_runs(db_uri, capsys):
+    assert main(["--database", db_uri, "compare"]) == 1
+    assert capsys.readouterr().err.startswith("error: Give two run ids")
+
+
+def test_read_commands_do_not_create_databases(tmp_path, capsys):
+    path = tmp_path / "new.db"
+    assert main(["--database", f"sqlite:///{path}", "list"]) == 1
+    assert (
+        capsys.readouterr().err
+        == f"error: No experiments database at {path}\n"
+    )
+    assert not path.exists()
+
+
+def test_read_commands_do_not_migrate(db_uri, capsys):
+    store = StorageManager(db_uri)
+    with store.engine.begin() as connection:
+        connection.execute(text("DROP TABLE experiment_summaries"))
+    store.dispose()
+
+    assert main(["--database", db_uri, "list"]) == 1
+    error = capsys.readouterr().err
+    assert "missing experiment_summaries" in error
+    assert "pytest-experiments migrate" in error
+    assert main(["--database", db_uri, "migrate"]) == 0
+    assert main(["--database", db_uri, "list"]) == 0
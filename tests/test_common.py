@@ -22,3 +22,10 @@ def test_type_name_of():
 def test_any_are_none():
     assert common.any_are_none(None, 0.0)
     assert not common.any_are_none(False, 0)
+
+
+def test_as_number():
+    assert common.as_number(2) == 2.0
+    assert common.as_number(0.5) == 0.5
+    for value in (True, "1", None, float("nan"), float("inf"), 10 ** 400):
+        assert common.as_number(value) is None
@@ -0,0 +1,62 @@
+import base64
+import json
+import numpy as np
+import pytest
+from pytest_experiments.compression import (
+    CompressionError,
+    check_compression,
+    compressing_serializer,
+)
+from pytest_experiments.json_tools import json_deserializer, json_serializer
+from pytest_experiments.store import ExperimentModel, StorageManager
+
+
+@pytest.mark.parametrize("algorithm", ["zlib", "zstd"])
+def test_compressing_serializer(algorithm):
+    if algorithm == "zstd":
+        pytest.importorskip("zstandard")
+    serialize = compressing_serializer(algorithm, level=5, min_size=100)
+    small = {"loss": 0.5}
+    assert serialize(small) == json_serializer(small)
+    large = {"losses": [0.5] * 1000, "weights": np.zeros(2000)}
+    text = serialize(large)
+    assert len(text) < len(json_serializer(large)) / 10
+    assert json.loads(text)["__typename__"] == algorithm
+    decoded = json_deserializer(text)
+    assert decoded["losses"] == large["losses"]
+    assert np.array_equal(decoded["weights"], large["weights"])
+
+
+def test_incompressible_documents_are_not_compressed():
+    serialize = compressing_serializer("zlib", min_size=10)
+    noise = np.random.default_rng(0).bytes(3000)
+    document = {"noise": base64.b64encode(noise).decode()}
+    assert serialize(document) == json_serializer(document)
+
+
+def test_check_compression():
+    check_compression("zlib", 9)
+    for algorithm, level in [("lzma", None), ("zlib", 99)]:
+        with pytest.raises(CompressionError):
+            check_compression(algorithm, level)
+
+
+def test_compressed_store(tmp_path):
+    db_uri = f"sqlite:///{tmp_path / 'experiments.db'}"
+    plain = StorageManager(db_uri)
+    plain.record_experiment(
+        ExperimentModel(name="old", outcome="passed", parameters={}, data={})
+    )
+    store = StorageManager(db_uri, compression="zlib", compression_level=9)
+    data = {"losses": list(range(1000))}
+    store.record_experiment(
+        ExperimentModel(name="new", outcome="passed", parameters={}, data=data)
+    )
+    old, new = plain.get_all_experiments()
+    assert old.data == {}
+    assert new.data == data
+    with store.engine.connect() as connection:
+        raw = connection.exec_driver_sql(
+            "SELECT data FROM experiments WHERE name = 'new'"
+        ).scalar()
+    assert json.loads(raw)["__typename__"] == "zlib"
@@ -1,4 +1,9 @@
-from pytest_experiments.store import StorageManager
+import json
+import numpy as np
+import pytest
+from pytest_experiments import json_tools, serde
+from pytest_experiments.artifacts import ArtifactRef, ArtifactStore
+from pytest_experiments.store import ExperimentModel, StorageManager
 
 
 def test_notebook_fixture(testdir):
@@ -30,6 +35,31 @@ def test_notebook_fixture(testdir):
     assert result.ret == 0
 
 
+def test_notebook_store_is_shared(testdir):
+    """Ensure that all notebooks in a session share one storage manager."""
+    testdir.makepyfile(
+        """
+        import pytest
+
+        stores = []
+
+        @pytest.mark.parametrize("a", [1, 2, 3])
+        def test_shared_store(notebook, a):
+            stores.append(notebook.store)
+            assert all(store is stores[0] for store in stores)
+    """
+    )
+
+    result = testdir.runpytest(
+        "--experiments-database=sqlite:///:memory:", "-v"
+    )
+
+    result.stdout.re_match_lines(
+        [r".*::test_shared_store\[3\] PASSED.*"],
+    )
+    assert result.ret == 0
+
+
 def test_help_message(testdir):
     """Ensure that our options appear in `pytest --help`"""
     result = testdir.runpytest(
@@ -152,3 +182,713 @@ def test_experiment_parameters(testdir):
 
     # make sure that that we get a '0' exit code for the testsuite
     assert result.ret == 0
+
+
+@pytest.mark.parametrize(
+    "option",
+    ["--experiments-flush-every=2", "--experiments-flush-interval=60"],
+)
+def test_buffered_experiments(testdir, option):
+    """Test that buffered experiments are written by the end of the session."""
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.parametrize("a", [1, 2, 3])
+        def test_buffered(notebook, a):
+            notebook.record(a=a)
+
+        def test_interrupted():
+            raise KeyboardInterrupt
+    """
+    )
+
+    result = testdir.runpytest_subprocess(option, "-v")
+    result.stdout.fnmatch_lines(["*KeyboardInterrupt*"])
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    experiments = store.get_all_experiments()
+    assert [exp.data for exp in experiments] == [{"a": 1}, {"a": 2}, {"a": 3}]
+
+
+def test_async_experiments(testdir):
+    """Test that experiments are written by the background writer."""
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.parametrize("a", [1, 2, 3])
+        def test_async(notebook, a):
+            notebook.record(a=a)
+    """
+    )
+
+    result = testdir.runpytest("--experiments-async", "-v")
+    assert result.ret == 0
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    experiments = store.get_all_experiments()
+    assert [exp.data for exp in experiments] == [{"a": 1}, {"a": 2}, {"a": 3}]
+
+
+@pytest.mark.parametrize(
+    "option", ["--experiments-async", "--experiments-flush-every=10"]
+)
+def test_write_failures_are_reported(testdir, option):
+    """Test that write failures appear in the terminal summary."""
+    testdir.makeconftest(
+        """
+        from pytest_experiments.store import StorageManager
+
+        def record_experiments(self, experiments):
+            raise RuntimeError("database is gone")
+
+        StorageManager.record_experiments = record_experiments
+    """
+    )
+    testdir.makepyfile(
+        """
+        def test_async(notebook):
+            notebook.record(a=1)
+    """
+    )
+
+    result = testdir.runpytest_subprocess(option)
+    result.stdout.fnmatch_lines(
+        [
+            "*= experiments =*",
+            "failed to write 1 experiment(s): *database is gone*",
+        ]
+    )
+
+
+def test_xdist_experiments(testdir):
+    """Test that experiments run on xdist workers are written once."""
+    pytest.importorskip("xdist")
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.parametrize("a", list(range(8)))
+        def test_distributed(notebook, a):
+            notebook.record(a=a)
+    """
+    )
+
+    result = testdir.runpytest_subprocess("-n", "2")
+    assert result.ret == 0
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    experiments = store.get_all_experiments()
+    assert sorted(exp.data["a"] for exp in experiments) == list(range(8))
+    assert all(exp.parameters == {"a": exp.data["a"]} for exp in experiments)
+    assert all(exp.outcome == "passed" for exp in experiments)
+
+
+def test_xdist_controller_writes_in_bulk(testdir):
+    """Test that the controller writes the experiments of workers in bulk."""
+    pytest.importorskip("xdist")
+    testdir.makeconftest(
+        """
+        import json
+        from pytest_experiments.store import StorageManager
+
+        calls = {"record_experiment": 0, "record_experiments": []}
+        record_experiments = StorageManager.record_experiments
+
+        def record_experiment(self, experiment):
+            calls["record_experiment"] += 1
+
+        def record_in_bulk(self, experiments):
+            experiments = list(experiments)
+            calls["record_experiments"].append(len(experiments))
+            record_experiments(self, experiments)
+
+        StorageManager.record_experiment = record_experiment
+        StorageManager.record_experiments = record_in_bulk
+
+        def pytest_unconfigure(config):
+            if not hasattr(config, "workerinput"):
+                with open("calls.json", "w") as f:
+                    json.dump(calls, f)
+    """
+    )
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.parametrize("a", list(range(8)))
+        def test_distributed(notebook, a):
+            notebook.record(a=a)
+    """
+    )
+
+    assert testdir.runpytest_subprocess("-n", "2").ret == 0
+
+    calls = json.loads((testdir.tmpdir / "calls.json").read_text("utf-8"))
+    assert calls == {"record_experiment": 0, "record_experiments": [8]}
+
+
+def test_xdist_worker_crash_keeps_finished_experiments(testdir):
+    """Test that workers send their experiments as their tests finish."""
+    pytest.importorskip("xdist")
+    testdir.makepyfile(
+        """
+        import os
+        import pytest
+
+        @pytest.mark.parametrize("a", list(range(3)))
+        def test_distributed(notebook, a):
+            notebook.record(a=a)
+
+        def test_crash():
+            os._exit(1)
+    """
+    )
+
+    result = testdir.runpytest_subprocess("-n", "1")
+    assert result.ret == pytest.ExitCode.TESTS_FAILED
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    experiments = store.get_all_experiments()
+    assert sorted(exp.data["a"] for exp in experiments) == [0, 1, 2]
+
+
+def test_sqlite_fast_experiments(testdir):
+    """Test that experiments are persisted with the fast SQLite profile."""
+    testdir.makepyfile(
+        """
+        def test_fast(notebook):
+            notebook.record(hello="world")
+    """
+    )
+
+    result = testdir.runpytest("--experiments-sqlite-fast")
+    assert result.ret == 0
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    experiments = store.get_all_experiments()
+    assert [exp.data for exp in experiments] == [{"hello": "world"}]
+    with store.engine.connect() as connection:
+        journal_mode = connection.exec_driver_sql("PRAGMA journal_mode")
+        assert journal_mode.scalar() == "wal"
+
+
+def test_numpy_binary_experiments(testdir):
+    """Test that large arrays are stored in binary form."""
+    testdir.makepyfile(
+        """
+        import numpy as np
+
+        def test_array(notebook):
+            notebook.record(small=np.arange(3), large=np.arange(16.0))
+    """
+    )
+
+    default = serde.NUMPY_BINARY_MIN_SIZE
+    result = testdir.runpytest("--experiments-numpy-binary-min-size=10")
+    assert result.ret == 0
+    assert serde.NUMPY_BINARY_MIN_SIZE == default
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    with store.engine.connect() as connection:
+        raw = connection.exec_driver_sql("SELECT data FROM experiments")
+        data = json.loads(raw.scalar())
+    assert data["small"]["__data__"] == [0, 1, 2]
+    assert data["large"]["__data__"]["dtype"] == "<f8"
+    (experiment,) = store.get_all_experiments()
+    assert np.array_equal(experiment.data["large"], np.arange(16.0))
+
+
+def test_artifact_experiments(testdir):
+    """Test that large recorded values are stored as artifacts."""
+    testdir.makepyfile(
+        """
+        import numpy as np
+        import pytest
+
+        @pytest.mark.parametrize("a", [1, 2])
+        def test_artifacts(notebook, a):
+            notebook.record(a=a, weights=np.ones(1000))
+    """
+    )
+
+    result = testdir.runpytest(
+        "--experiments-artifacts=artifacts",
+        "--experiments-artifact-min-size=1024",
+    )
+    assert result.ret == 0
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    first, second = store.get_all_experiments()
+    assert first.parameters == {"a": 1}
+    assert first.data["a"] == 1
+    assert isinstance(first.data["weights"], ArtifactRef)
+    assert first.data["weights"] == second.data["weights"]
+
+    artifacts = ArtifactStore(testdir.tmpdir / "artifacts")
+    assert np.array_equal(artifacts.load(first.data["weights"]), np.ones(1000))
+
+
+def test_promoted_experiments(testdir):
+    """Test that promoted keys are written to the experiment values table."""
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.parametrize("lr", [0.1, 0.01])
+        def test_promoted(notebook, lr):
+            notebook.record(loss=lr * 2)
+    """
+    )
+
+    result = testdir.runpytest(
+        "--experiments-promote=parameters.lr",
+        "--experiments-promote=data.loss",
+    )
+    assert result.ret == 0
+
+    store = StorageManager(
+        f"sqlite:///{testdir.tmpdir / 'experiments.db'}",
+        promote=["parameters.lr"],
+    )
+    (experiment,) = store.query_experiments(parameters={"lr": 0.01})
+    assert experiment.data == {"loss": 0.02}
+    assert {v.key: v.number for v in store_values(store)} == {
+        "lr": 0.01,
+        "loss": 0.02,
+    }
+
+
+def store_values(store):
+    with store.create_session() as session:
+        experiment = session.get(ExperimentModel, 2)
+        return list(experiment.values)
+
+
+def test_reuse_experiments(testdir):
+    """Test that unchanged experiments are replayed rather than run."""
+    source = """
+        import pytest
+
+        VERSION = {}
+
+        @pytest.mark.parametrize("a", [1, 2])
+        def test_expensive(notebook, a):
+            with open("runs", "a") as f:
+                f.write(str(a))
+            notebook.record(result=a * VERSION)
+    """
+    testdir.makepyfile(source.format(1))
+
+    def run(*options):
+        result = testdir.runpytest("--experiments-reuse", *options)
+        assert result.ret == 0
+        return result
+
+    run().stdout.fnmatch_lines(["reused 0 of 2 experiment result(s) (0.0%)"])
+    run().stdout.fnmatch_lines(["reused 2 of 2 experiment result(s) (100.0%)"])
+    assert (testdir.tmpdir / "runs").read() == "12"
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    experiments = store.get_all_experiments()
+    assert [exp.data["result"] for exp in experiments] == [1, 2]
+    assert all(exp.fingerprint for exp in experiments)
+
+    run("--experiments-reuse-max-age=0").stdout.fnmatch_lines(
+        ["reused 0 of 2 *"]
+    )
+    run("--experiments-reuse-max-runs=1").stdout.fnmatch_lines(
+        ["reused 2 of 2 *"]
+    )
+    testdir.makepyfile(source.format(2))
+    run().stdout.fnmatch_lines(["reused 0 of 2 *"])
+    assert (testdir.tmpdir / "runs").read() == "121212"
+    experiments = store.get_all_experiments()
+    assert [exp.data["result"] for exp in experiments[-2:]] == [2, 4]
+
+
+def test_reuse_does_not_depend_on_other_tests(testdir):
+    """Test that results are reused by runs of a subset of the tests."""
+    source = """
+        def test_{0}(notebook):
+            notebook.record(version={1})
+    """
+    testdir.makepyfile(
+        test_a=source.format("a", 1), test_b=source.format("b", 1)
+    )
+
+    def run(*args):
+        result = testdir.runpytest("--experiments-reuse", *args)
+        assert result.ret == 0
+        return result
+
+    run().stdout.fnmatch_lines(["reused 0 of 2 *"])
+    run().stdout.fnmatch_lines(["reused 2 of 2 *"])
+    run("test_a.py").stdout.fnmatch_lines(["reused 1 of 1 *"])
+    testdir.makepyfile(test_b=source.format("b", 2))
+    run().stdout.fnmatch_lines(["reused 1 of 2 *"])
+
+
+@pytest.mark.parametrize(
+    "option",
+    [None, "--experiments-instrument", "--experiments-trace-allocations"],
+)
+def test_instrumented_experiments(testdir, option):
+    """Test that resource usage is recorded only when requested."""
+    testdir.makepyfile(
+        """
+        def test_allocate(notebook):
+            data = bytearray(5_000_000)
+    """
+    )
+
+    result = testdir.runpytest(*filter(None, [option]))
+    assert result.ret == 0
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    (experiment,) = store.get_all_experiments()
+    if option is None:
+        assert experiment.cpu_time is None
+        assert experiment.gc_collections is None
+    else:
+        assert experiment.cpu_time >= 0
+        assert experiment.gc_collections >= 0
+        assert experiment.peak_rss_delta >= 0
+    if option == "--experiments-trace-allocations":
+        assert experiment.alloc_peak >= 5_000_000
+    else:
+        assert experiment.alloc_peak is None
+
+
+def test_timed_experiments(testdir):
+    """Test that timed sections and benchmarks are recorded."""
+    testdir.makepyfile(
+        """
+        def test_timed(notebook):
+            with notebook.timer("fit"):
+                sum(range(1000))
+            square = notebook.timer("square")(lambda x: x * x)
+            square(2)
+            square(3)
+            stats = notebook.benchmark(lambda: None, repeat=20, name="noop")
+            assert stats["count"] == 20
+
+        def test_untimed(notebook):
+            pass
+    """
+    )
+
+    result = testdir.runpytest()
+    assert result.ret == 0
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    timed, untimed = store.get_all_experiments()
+    assert untimed.timings is None
+    assert set(timed.timings) == {"fit", "square", "noop"}
+    assert timed.timings["square"]["count"] == 2
+    assert timed.timings["noop"]["count"] == 20
+    assert timed.timings["fit"]["min"] > 0
+
+
+def test_regression_detection(testdir):
+    """Test that regressions from previous runs are reported."""
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.parametrize("lr", [0.1])
+        def test_fit(notebook, lr):
+            with open("loss") as f:
+                notebook.record(loss=float(f.read()))
+    """
+    )
+    options = ("--experiments-regression=data.loss", "-p", "no:cacheprovider")
+    loss = testdir.tmpdir / "loss"
+    for value in ("1.0", "1.1", "0.9", "1.0", "1.05"):
+        loss.write(value)
+        result = testdir.runpytest(*options)
+        result.stdout.fnmatch_lines(["0 regression(s) in 1 checked *"])
+
+    loss.write("1.02")
+    testdir.runpytest(*options).stdout.fnmatch_lines(
+        ["0 regression(s) in 1 checked *"]
+    )
+    loss.write("5.0")
+    result = testdir.runpytest(*options)
+    assert result.ret == 0
+    result.stdout.fnmatch_lines(
+        [
+            "1 regression(s) in 1 checked experiment(s)",
+            "  *test_fit[[]0.1[]]: data.loss = 5, baseline 1.01 * 6 runs *",
+        ]
+    )
+    result = testdir.runpytest(*options, "--experiments-fail-on-regression")
+    assert result.ret == 1
+    result = testdir.runpytest_subprocess(*options, "-n", "2")
+    result.stdout.fnmatch_lines(["1 regression(s) in 1 checked *"])
+    result = testdir.runpytest(*options, "--experiments-regression=loss")
+    assert result.ret == pytest.ExitCode.USAGE_ERROR
+
+
+def test_logged_series(testdir):
+    """Test that series logged at every step are stored as arrays."""
+    testdir.makepyfile(
+        """
+        def test_iterate(notebook):
+            for step in range(100_000):
+                notebook.log(step, loss=1 / (step + 1))
+            notebook.log(100_000, accuracy=1.0)
+
+        def test_no_series(notebook):
+            pass
+    """
+    )
+
+    result = testdir.runpytest()
+    assert result.ret == 0
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    logged, unlogged = store.get_all_experiments()
+    assert unlogged.series is None
+    assert set(logged.series) == {"step", "loss", "accuracy"}
+    assert np.array_equal(logged.series["step"], np.arange(100_001))
+    assert logged.series["loss"].dtype == np.float64
+    assert np.allclose(logged.series["loss"][:-1], 1 / np.arange(1, 100_001))
+    assert np.isnan(logged.series["accuracy"][:-1]).all()
+
+
+@pytest.mark.parametrize("backend", ["json", "orjson"])
+def test_registered_types(testdir, backend):
+    """Test that types registered by a conftest hook are stored."""
+    from fractions import Fraction
+
+    pytest.importorskip(backend)
+    testdir.makeconftest(
+        """
+        from fractions import Fraction
+
+        def pytest_experiments_register_types(registry):
+            registry.register(
+                Fraction,
+                encoder=lambda f: [f.numerator, f.denominator],
+                decoder=lambda d: Fraction(*d),
+            )
+    """
+    )
+    testdir.makepyfile(
+        """
+        from fractions import Fraction
+
+        def test_fraction(notebook):
+            notebook.record(ratio=Fraction(1, 3), half=0.5)
+    """
+    )
+
+    result = testdir.runpytest(f"--experiments-json-backend={backend}")
+    assert result.ret == 0
+    # the backend and the registered types do not leak out of the session
+    assert json_tools.json_backend() == "json"
+    assert json_tools.TYPES.encoder(Fraction) is None
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    (experiment,) = store.get_all_experiments()
+    assert experiment.data == {"ratio": [1, 3], "half": 0.5}
+
+
+def test_compressed_experiments(testdir):
+    """Test that large payloads are compressed when requested."""
+    testdir.makepyfile(
+        """
+        def test_large(notebook):
+            notebook.record(losses=[0.25] * 10_000)
+    """
+    )
+
+    result = testdir.runpytest("--experiments-compression=zlib")
+    assert result.ret == 0
+    result = testdir.runpytest(
+        "--experiments-compression=zlib", "--experiments-compression-level=42"
+    )
+    assert result.ret == pytest.ExitCode.USAGE_ERROR
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    (experiment,) = store.get_all_experiments()
+    assert experiment.data == {"losses": [0.25] * 10_000}
+    with store.engine.connect() as connection:
+        raw = connection.exec_driver_sql("SELECT data FROM experiments")
+        assert len(raw.scalar()) < 1_000
+
+
+@pytest.mark.parametrize("workers", [None, "2"])
+def test_experiment_runs(testdir, workers):
+    """Test that each session records one run shared by its experiments."""
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.parametrize("a", range(4))
+        def test_a(notebook, a):
+            pass
+    """
+    )
+    args = ["-n", workers] if workers else []
+
+    assert testdir.runpytest_subprocess(*args).ret == 0
+    assert testdir.runpytest_subprocess(*args, "-k", "a").ret == 0
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    latest, first = store.get_runs()
+    assert latest.argv[-2:] == ["-k", "a"]
+    assert latest.start_time < latest.end_time
+    assert first.end_time <= latest.start_time
+    experiments = store.get_all_experiments()
+    assert [e.run_id for e in experiments] == [first.id] * 4 + [latest.id] * 4
+    for experiment in experiments:
+        assert "experiments_run" not in experiment.parameters
+
+
+@pytest.mark.parametrize("workers", [None, "2"])
+def test_no_run_without_experiments(testdir, workers):
+    """Test that sessions without experiments do not create a database."""
+    if workers:
+        pytest.importorskip("xdist")
+    testdir.makepyfile(
+        """
+        def test_plain():
+            pass
+    """
+    )
+    args = ["-n", workers] if workers else []
+    assert testdir.runpytest_subprocess(*args).ret == 0
+    assert not (testdir.tmpdir / "experiments.db").exists()
+
+
+@pytest.mark.parametrize(
+    "dataset, typename, size",
+    [
+        ("np.arange(100_000)", "numpy.ndarray", 800_000),
+        ("list(range(100_000))", "list", None),
+        ("{i: i for i in range(100_000)}", "dict", None),
+    ],
+)
+def test_large_parameters_are_digested(testdir, dataset, typename, size):
+    """Test that large fixture values are stored as a digest, hashed once."""
+    testdir.makeconftest(
+        f"""
+        import numpy as np
+        import pytest
+
+        @pytest.fixture(scope="session")
+        def dataset():
+            return {dataset}
+
+        def pytest_sessionfinish(session):
+            capture = session.config._experiments_capture
+            print(f"hashed {{capture.hashed}} values")
+    """
+    )
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.parametrize("a", range(3))
+        def test_fit(notebook, dataset, a):
+            pass
+    """
+    )
+    result = testdir.runpytest("-s")
+    assert result.ret == 0
+    result.stdout.fnmatch_lines(["*hashed 1 values*"])
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    experiments = store.get_all_experiments()
+    assert len(experiments) == 3
+    for experiment in experiments:
+        digest = experiment.parameters["dataset"]
+        assert digest.type == typename
+        assert digest.shape == (100_000,)
+        assert digest.size == size
+    assert len({e.parameters["dataset"] for e in experiments}) == 1
+
+
+def test_unhashable_fixture_params(testdir):
+    """Test that shared fixtures with dict and list params are captured."""
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.fixture(scope="module", params=[{"lr": 0.1}, [1, 2]])
+        def config(request):
+            return request.param
+
+        @pytest.mark.parametrize("a", range(2))
+        def test_fit(notebook, config, a):
+            pass
+    """
+    )
+    result = testdir.runpytest()
+    assert result.ret == 0
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    configs = [e.parameters["config"] for e in store.get_all_experiments()]
+    assert sorted(map(str, configs)) == sorted(
+        map(str, [{"lr": 0.1}, {"lr": 0.1}, [1, 2], [1, 2]])
+    )
+
+
+def test_async_notebook(testdir):
+    """Test that async notebooks are written through the asyncio engine."""
+    pytest.importorskip("aiosqlite")
+    testdir.makepyfile(
+        """
+        import asyncio
+        import pytest
+
+        async def fit(notebook, a):
+            await asyncio.sleep(0)
+            notebook.record(loss=1 / a)
+
+        @pytest.mark.parametrize("a", [1, 2, 4])
+        def test_fit(async_notebook, a):
+            asyncio.run(fit(async_notebook, a))
+
+        def test_writer(experiments_async_writer, async_notebook):
+            assert async_notebook.writer is experiments_async_writer
+    """
+    )
+    result = testdir.runpytest("-v")
+    assert result.ret == 0
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    experiments = store.get_all_experiments()
+    losses = sorted(exp.data["loss"] for exp in experiments if exp.data)
+    assert losses == [0.25, 0.5, 1.0]
+    assert {exp.outcome for exp in experiments} == {"passed"}
+    assert len(experiments) == 4
+    assert {exp.run_id for exp in experiments} == {store.get_runs()[0].id}
+
+
+def test_async_notebook_finished_in_test(testdir):
+    """Test that async notebooks are only finished after their test."""
+    pytest.importorskip("aiosqlite")
+    testdir.makepyfile(
+        """
+        import asyncio
+
+        async def fit(notebook):
+            notebook.record(loss=0.5)
+            await notebook.finish()
+
+        def test_fit(async_notebook):
+            asyncio.run(fit(async_notebook))
+    """
+    )
+    result = testdir.runpytest("-v")
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*ExperimentError: An async experiment*"])
+
+    store = StorageManager(f"sqlite:///{testdir.tmpdir / 'experiments.db'}")
+    (experiment,) = store.get_all_experiments()
+    assert experiment.data == {"loss": 0.5}
+    assert experiment.outcome == "failed"
@@ -0,0 +1,82 @@
+import datetime as dt
+import numpy as np
+import pytest
+from pytest_experiments.export import ExportError, export_experiments
+from pytest_experiments.store import ExperimentModel, StorageManager
+
+START = dt.datetime(2021, 12, 1)
+
+
+@pytest.fixture
+def store():
+    store = StorageManager("sqlite:///:memory:")
+    store.record_experiments(
+        ExperimentModel(
+            name=f"test_fit[{i}]",
+            start_time=START + dt.timedelta(days=i),
+            end_time=START + dt.timedelta(days=i, hours=1),
+            outcome="passed",
+            parameters={"i": i, "opt": "sgd", "shape": [i, i]},
+            data={"loss": 1.0 / (i + 1), "converged": i > 2, "n": i}
+            if i != 4
+            else {"loss": 0.2, "extra": "x"},
+        )
+        for i in range(5)
+    )
+    return store
+
+
+def test_export_parquet(store, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "experiments.parquet"
+    assert export_experiments(store, path, batch_size=2) == 5
+    table = pq.read_table(path)
+    assert table.column_names == [
+        "id",
+        "name",
+        "outcome",
+        "start_time",
+        "end_time",
+        "parameters.i",
+        "parameters.opt",
+        "parameters.shape",
+        "data.loss",
+        "data.converged",
+        "data.n",
+        "data.extra",
+    ]
+    assert str(table.schema.field("parameters.i").type) == "int64"
+    assert str(table.schema.field("data.converged").type) == "bool"
+    assert str(table.schema.field("parameters.shape").type) == "string"
+    assert table.column("data.n").to_pylist() == [0, 1, 2, 3, None]
+    assert table.column("data.extra").to_pylist() == [None] * 4 + ["x"]
+    assert table.column("start_time").to_pylist()[1] == START + dt.timedelta(
+        days=1
+    )
+
+
+def test_export_arrow_with_selection(store, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    path = tmp_path / "experiments.arrow"
+    assert export_experiments(store, path, parameters={"i": [1, 2]}) == 2
+    with pa.memory_map(str(path)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    assert table.column("name").to_pylist() == ["test_fit[1]", "test_fit[2]"]
+    assert "data.extra" not in table.column_names
+
+
+def test_export_npz(store, tmp_path):
+    path = tmp_path / "experiments.npz"
+    assert export_experiments(store, path, batch_size=3) == 5
+    arrays = np.load(path)
+    assert arrays["id"].tolist() == [1, 2, 3, 4, 5]
+    assert arrays["parameters.opt"].tolist() == ["sgd"] * 5
+    assert np.allclose(arrays["data.loss"], [1.0, 0.5, 1 / 3, 0.25, 0.2])
+    assert arrays["data.n"].dtype == np.float64
+    assert np.isnan(arrays["data.n"][-1])
+    assert arrays["start_time"].dtype == np.dtype("datetime64[us]")
+
+
+def test_export_unknown_format(store, tmp_path):
+    with pytest.raises(ExportError):
+        export_experiments(store, tmp_path / "experiments.csv")
@@ -0,0 +1,26 @@
+import gc
+import tracemalloc
+from pytest_experiments.instrument import ResourceMonitor
+
+
+def test_resource_monitor():
+    monitor = ResourceMonitor()
+    monitor.start()
+    sum(i * i for i in range(200_000))
+    gc.collect()
+    usage = monitor.stop()
+    assert usage.cpu_time > 0
+    assert usage.gc_collections >= 1
+    assert usage.peak_rss_delta is None or usage.peak_rss_delta >= 0
+    assert usage.alloc_peak is None
+
+
+def test_resource_monitor_traces_allocations():
+    assert not tracemalloc.is_tracing()
+    monitor = ResourceMonitor(trace_allocations=True)
+    monitor.start()
+    data = bytearray(10_000_000)
+    del data
+    usage = monitor.stop()
+    assert usage.alloc_peak >= 10_000_000
+    assert not tracemalloc.is_tracing()
@@ -1,6 +1,7 @@
 import datetime as dt
 import numpy as np
 import json
+import pytest
 
 from numpy.lib.arraysetops import isin
 from pytest_experiments import json_tools
@@ -26,3 +27,118 @@ def test_serialize_deserialize():
     assert data["world"] == custom_decode["world"]
     assert isinstance(custom_decode["range"], np.ndarray)
     assert np.allclose(data["range"], custom_decode["range"])
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class Point3(Point):
+    pass
+
+
+def test_type_registry():
+    registry = json_tools.TypeRegistry(
+        {"datetime": (lambda d: "legacy", dt.datetime.fromisoformat)}
+    )
+    assert registry.encoder(Point) is None
+    registry.register(Point, lambda p: [p.x, p.y], lambda d: Point(*d))
+    name, encoder = registry.encoder(Point3)
+    assert name == "Point"
+    assert encoder(Point3(1, 2)) == [1, 2]
+    assert registry.decoder("Point")([1, 2]).y == 2
+    registry.register(Point3, lambda p: [p.x], lambda d: Point3(*d, 0))
+    assert registry.encoder(Point3)[0] == "Point3"
+    assert registry.encoder(Point)[0] == "Point"
+
+    class Timestamp(dt.datetime):
+        pass
+
+    name, encoder = registry.encoder(Timestamp)
+    assert name == "datetime"
+    assert encoder(None) == "legacy"
+
+
+def test_registered_types_roundtrip():
+    json_tools.TYPES.register(
+        Point,
+        lambda p: {"x": p.x, "y": p.y},
+        lambda d: Point(**d),
+        name="test_json_tools.Point",
+    )
+    encoded = json_tools.json_serializer({"p": Point3(1, 2)})
+    assert json.loads(encoded)["p"]["__typename__"] == "test_json_tools.Point"
+    decoded = json_tools.json_deserializer(encoded)["p"]
+    assert isinstance(decoded, Point)
+    assert (decoded.x, decoded.y) == (1, 2)
+
+
+def test_unknown_types_warn():
+    class Unknown:
+        pass
+
+    with pytest.warns(json_tools.SerializationWarning, match="Unknown"):
+        assert json_tools.json_serializer({"u": Unknown()}) == '{"u": null}'
+
+
+@pytest.fixture
+def orjson_backend():
+    pytest.importorskip("orjson")
+    json_tools.use_json_backend("orjson")
+    yield
+    json_tools.use_json_backend("json")
+
+
+def test_orjson_backend(orjson_backend):
+    now = dt.datetime.utcnow()
+    data = {
+        "float": np.float64(0.5),
+        "when": now,
+        "range": np.arange(5),
+        "big": np.linspace(0, 1, 2048),
+        1: "int key",
+        "nan": float("nan"),
+    }
+    decoded = json_tools.json_deserializer(json_tools.json_serializer(data))
+    assert decoded["float"] == 0.5
+    assert decoded["when"] == now
+    assert np.array_equal(decoded["range"], np.arange(5))
+    assert np.array_equal(decoded["big"], data["big"])
+    assert decoded["1"] == "int key"
+    assert decoded["nan"] is None
+
+
+@pytest.mark.parametrize("backend", ["json", "orjson"])
+def test_numpy_scalars(backend):
+    pytest.importorskip(backend)
+    json_tools.use_json_backend(backend)
+    try:
+        data = {
+            "f32": np.float32(0.5),
+            "i64": np.int64(2),
+            "flag": np.bool_(True),
+            "wide": 2 ** 70,
+        }
+        encoded = json_tools.json_serializer(data)
+    finally:
+        json_tools.use_json_backend("json")
+    decoded = json_tools.json_deserializer(encoded)
+    assert decoded == {"f32": 0.5, "i64": 2, "flag": True, "wide": 2 ** 70}
+    assert type(decoded["i64"]) is int
+
+
+def test_registry_copy_and_restore():
+    registry = json_tools.TypeRegistry({"datetime": (str, str)})
+    snapshot = registry.copy()
+    registry.register(Point, repr, repr)
+    assert registry.encoder(Point) is not None
+    registry.restore(snapshot)
+    assert registry.encoder(Point) is None
+    assert registry.encoder(dt.datetime)[0] == "datetime"
+
+
+def test_unknown_json_backend():
+    with pytest.raises(ValueError):
+        json_tools.use_json_backend("pickle")
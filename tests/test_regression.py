@@ -0,0 +1,151 @@
+import datetime as dt
+import math
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import update
+from pytest_experiments.common import ExperimentOutcome
+from pytest_experiments.regression import (
+    Baseline,
+    Metric,
+    RegressionDetector,
+    RegressionError,
+)
+from pytest_experiments.store import ExperimentModel, StorageManager
+
+
+def test_parse_metric():
+    assert Metric.parse("data.loss") == Metric("data", "loss")
+    assert Metric.parse("data.accuracy:higher") == Metric(
+        "data", "accuracy", None, True
+    )
+    assert Metric.parse("timings.fit") == Metric("timings", "fit", "median")
+    assert Metric.parse("timings.model.fit.min:lower") == Metric(
+        "timings", "model.fit", "min", False
+    )
+    assert Metric.parse("timings.fit").label == "timings.fit.median"
+    for spec in ("loss", "data.", "parameters.lr", "data.loss:up"):
+        with pytest.raises(RegressionError):
+            Metric.parse(spec)
+
+
+def test_metric_value():
+    loss = Metric.parse("data.loss")
+    assert loss.value({"loss": 1}) == 1.0
+    assert loss.value({"loss": "high"}) is None
+    assert loss.value({"loss": True}) is None
+    assert loss.value({"loss": math.nan}) is None
+    assert loss.value(None) is None
+    fit = Metric.parse("timings.fit")
+    assert fit.value({"fit": {"median": 5}}) == 5.0
+    assert fit.value({"predict": {"median": 5}}) is None
+
+
+def test_score():
+    baseline = Baseline(median=10.0, scale=2.0, runs=5)
+    loss = Metric.parse("data.loss")
+    accuracy = Metric.parse("data.accuracy:higher")
+    assert RegressionDetector.score(loss, 16.0, baseline) == 3.0
+    assert RegressionDetector.score(accuracy, 16.0, baseline) == -3.0
+    constant = Baseline(median=0.0, scale=0.0, runs=5)
+    assert RegressionDetector.score(loss, 1.0, constant) == math.inf
+    assert RegressionDetector.score(loss, 0.0, constant) == 0.0
+
+
+@pytest.fixture
+def history(tmp_path):
+    store = StorageManager(f"sqlite:///{tmp_path / 'experiments.db'}")
+    start = dt.datetime(2024, 1, 1)
+    losses = [1.0, 1.1, 0.9, 1.0, 1.05, 0.95, 50.0]
+    store.record_experiments(
+        ExperimentModel(
+            name="test_fit",
+            start_time=start + dt.timedelta(minutes=i),
+            outcome=outcome,
+            parameters={"lr": lr},
+            data={"loss": loss},
+            timings={"fit": {"median": 100 * loss}},
+        )
+        for i, (lr, loss, outcome) in enumerate(
+            [(0.1, loss, "passed") for loss in losses]
+            + [(0.1, 1000.0, "failed"), (0.2, 1000.0, "passed")]
+        )
+    )
+    return store
+
+
+def finished(loss, created_at=dt.datetime(2024, 2, 1), lr=0.1):
+    return SimpleNamespace(
+        name="test_fit",
+        created_at=created_at,
+        outcome=ExperimentOutcome.passed,
+        parameters={"lr": lr},
+        data={"loss": loss},
+        timings={"fit": {"median": 100 * loss}},
+    )
+
+
+def test_baselines(history):
+    detector = RegressionDetector(history, ["data.loss", "timings.fit"])
+    baselines = detector.baselines(finished(1.0))
+    assert baselines[Metric.parse("data.loss")] == Baseline(
+        1.0, pytest.approx(1.4826 * 0.05), 7
+    )
+    assert baselines[Metric.parse("timings.fit")].runs == 7
+    detector.runs = detector.min_runs = 3
+    assert baselines != detector.baselines(finished(1.0))
+    assert detector.baselines(finished(1.0))[Metric.parse("data.loss")] == (
+        Baseline(1.05, pytest.approx(1.4826 * 0.1), 3)
+    )
+    early = finished(1.0, created_at=dt.datetime(2024, 1, 1, 0, 2))
+    assert detector.baselines(early) == {}
+
+
+def test_check(history):
+    detector = RegressionDetector(history, ["data.loss"])
+    assert detector.check(finished(1.1)) == []
+    (regression,) = detector.check(finished(2.0))
+    assert regression.name == "test_fit"
+    assert regression.metric == "data.loss"
+    assert regression.value == 2.0
+    assert regression.median == 1.0
+    assert regression.runs == 7
+    assert regression.score > 3
+    assert detector.check(finished(2.0, lr=0.3)) == []
+    failed = finished(2.0)
+    failed.outcome = ExperimentOutcome.failed
+    assert detector.check(failed) == []
+    assert detector.checked == 3
+    assert detector.regressions == [regression]
+    assert "test_fit: data.loss = 2" in str(regression)
+
+
+def test_baselines_of_compressed_experiments(tmp_path):
+    store = StorageManager(
+        f"sqlite:///{tmp_path / 'experiments.db'}", compression="zlib"
+    )
+    store.record_experiments(
+        ExperimentModel(
+            name="test_fit",
+            start_time=dt.datetime(2024, 1, 1, i),
+            outcome="passed",
+            parameters={"lr": 0.1},
+            data={"loss": 1.0, "log": "x" * (2000 if i % 2 else 0)},
+        )
+        for i in range(6)
+    )
+    detector = RegressionDetector(store, ["data.loss"])
+    baselines = detector.baselines(finished(1.0))
+    assert baselines[Metric.parse("data.loss")] == Baseline(1.0, 0.01, 6)
+
+
+def test_baselines_after_backfill(history):
+    with history.engine.begin() as connection:
+        connection.execute(
+            update(ExperimentModel.__table__).values(parameters_digest=None)
+        )
+    detector = RegressionDetector(history, ["data.loss"])
+    assert detector.baselines(finished(1.0)) == {}
+    assert history.backfill_parameter_digests(batch_size=4) == 9
+    assert detector.baselines(finished(1.0))[Metric.parse("data.loss")] == (
+        Baseline(1.0, pytest.approx(1.4826 * 0.05), 7)
+    )
@@ -0,0 +1,152 @@
+import datetime as dt
+import gzip
+import json
+import pytest
+from pytest_experiments.retention import RetentionError, compact, prune
+from pytest_experiments.store import (
+    ExperimentModel,
+    RunModel,
+    StorageManager,
+    experiment_from_payload,
+)
+
+NOW = dt.datetime(2021, 6, 30, 12)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StorageManager(
+        f"sqlite:///{tmp_path / 'experiments.db'}", promote=["data.loss"]
+    )
+    old, new = RunModel(id="old"), RunModel(id="new")
+    old.end_time = new.end_time = NOW
+    store.record_run(old)
+    store.record_run(new)
+    for name in ("test_fit", "test_predict"):
+        for day in range(10):
+            start_time = NOW - dt.timedelta(days=9 - day)
+            store.record_experiment(
+                ExperimentModel(
+                    name=name,
+                    start_time=start_time,
+                    outcome="passed" if day % 3 else "failed",
+                    parameters={"day": day},
+                    data={"loss": float(day), "note": "x"},
+                    run_id="old" if day < 5 else "new",
+                )
+            )
+    yield store
+    store.dispose()
+
+
+def days(store, name):
+    return [e.parameters["day"] for e in store.query_experiments(name=name)]
+
+
+def test_keep_last(store):
+    result = prune(store, keep_last=3, batch_size=4)
+    assert result == (14, 14, 1)
+    assert days(store, "test_fit") == [7, 8, 9]
+    assert days(store, "test_predict") == [7, 8, 9]
+    assert [run.id for run in store.get_runs()] == ["new"]
+    assert prune(store, keep_last=3) == (0, 0, 0)
+
+
+def test_keep_within(store):
+    result = prune(
+        store, keep_within=dt.timedelta(days=2), name="*fit", now=NOW
+    )
+    assert result.experiments == 7
+    assert days(store, "test_fit") == [7, 8, 9]
+    assert len(days(store, "test_predict")) == 10
+
+
+def test_keep_last_or_within(store):
+    window = dt.timedelta(days=4)
+    prune(store, keep_last=2, keep_within=window, now=NOW)
+    assert days(store, "test_fit") == [5, 6, 7, 8, 9]
+    prune(store, keep_last=4, keep_within=dt.timedelta(0), now=NOW)
+    assert days(store, "test_fit") == [6, 7, 8, 9]
+
+
+def test_downsample_and_archive(store, tmp_path):
+    archive = tmp_path / "archive.jsonl.gz"
+    prune(store, keep_last=8, downsample=True, archive=archive, batch_size=1)
+    prune(store, keep_last=5, downsample=True, archive=archive, batch_size=2)
+
+    summaries = store.get_summaries(name="test_fit")
+    assert [s.day for s in summaries] == [
+        (NOW - dt.timedelta(days=9 - day)).date() for day in range(5)
+    ]
+    first = summaries[0]
+    assert first.experiments == 1
+    assert first.outcomes == {"failed": 1}
+    assert first.data == {
+        "loss": {"count": 1, "mean": 0.0, "min": 0.0, "max": 0.0}
+    }
+    assert len(store.get_summaries()) == 10
+
+    with gzip.open(archive, "rt") as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 10
+    experiment = experiment_from_payload(lines[0])
+    assert experiment.name == "test_fit"
+    assert experiment.parameters == {"day": 0}
+
+
+def test_summaries_are_merged(store):
+    # two experiments of test_fit start on the same day
+    start_time = NOW - dt.timedelta(days=9, hours=2)
+    store.record_experiment(
+        ExperimentModel(
+            name="test_fit",
+            start_time=start_time,
+            outcome="passed",
+            parameters={},
+            data={"loss": 2.0},
+        )
+    )
+    prune(store, keep_last=10, name="test_fit", downsample=True, batch_size=1)
+    (summary,) = store.get_summaries()
+    assert summary.experiments == 1
+    prune(store, keep_last=9, name="test_fit", downsample=True, batch_size=1)
+    (summary,) = store.get_summaries()
+    assert summary.experiments == 2
+    assert summary.outcomes == {"failed": 1, "passed": 1}
+    assert summary.data["loss"] == {
+        "count": 2,
+        "mean": 1.0,
+        "min": 0.0,
+        "max": 2.0,
+    }
+
+
+def test_invalid_policies(store):
+    with pytest.raises(RetentionError):
+        prune(store)
+    with pytest.raises(RetentionError):
+        prune(store, keep_last=-1)
+    with pytest.raises(RetentionError):
+        prune(store, keep_last=1, batch_size=0)
+
+
+def test_compact(store):
+    def free_pages():
+        with store.engine.connect() as connection:
+            result = connection.exec_driver_sql("PRAGMA freelist_count")
+            return result.scalar()
+
+    store.record_experiments(
+        ExperimentModel(
+            name="test_large",
+            outcome="passed",
+            parameters={},
+            data={"blob": "x" * 10_000},
+        )
+        for _ in range(20)
+    )
+    prune(store, keep_last=0)
+    assert free_pages() > 0
+    compact(store)
+    assert free_pages() == 0
+    compact(store, vacuum=False)
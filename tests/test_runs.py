@@ -0,0 +1,64 @@
+import datetime as dt
+import subprocess
+from pytest_experiments.runs import Run, git_sha, installed_packages
+from pytest_experiments.store import ExperimentModel, StorageManager
+
+
+def test_run(tmp_path):
+    store = StorageManager(f"sqlite:///{tmp_path / 'experiments.db'}")
+    run = Run(rootdir=tmp_path, argv=["-k", "fit"])
+    assert len(run.id) == 32
+    assert Run("abc").id == "abc"
+    run.record(store)
+    run.record(store)
+    store.record_experiment(
+        ExperimentModel(
+            name="test_fit",
+            outcome="passed",
+            parameters={},
+            data={},
+            run_id=run.id,
+        )
+    )
+    run.finish()
+
+    (model,) = store.get_runs()
+    assert model.id == run.id
+    assert model.start_time == run.start_time
+    assert model.end_time >= model.start_time
+    assert model.end_time_tz.tzinfo is dt.timezone.utc
+    assert model.argv == ["-k", "fit"]
+    assert model.git_sha is None
+    assert model.hostname
+    assert "pytest" in model.packages
+    (experiment,) = store.query_experiments(run_id=run.id)
+    assert experiment.name == "test_fit"
+    assert list(store.query_experiments(run_id="other")) == []
+
+
+def test_git_sha(tmp_path):
+    assert git_sha(tmp_path) is None
+    subprocess.run(["git", "init", "-q"], cwd=tmp_path, check=True)
+    subprocess.run(
+        [
+            "git",
+            "-c",
+            "user.name=test",
+            "-c",
+            "user.email=test@example.com",
+            "commit",
+            "-q",
+            "--allow-empty",
+            "-m",
+            "initial",
+        ],
+        cwd=tmp_path,
+        check=True,
+    )
+    assert len(git_sha(tmp_path)) == 40
+
+
+def test_installed_packages():
+    packages = installed_packages()
+    assert "SQLAlchemy" in packages or "sqlalchemy" in packages
+    assert list(packages) == sorted(packages)
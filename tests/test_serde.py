@@ -1,4 +1,5 @@
 import datetime as dt
+from array import array
 import numpy as np
 import json
 from pytest_experiments import serde
@@ -20,3 +21,29 @@ def test_numpy_array_serde():
     decoded = serde.numpy_decode(encoded)
     assert isinstance(decoded, type(a))
     assert np.allclose(a, decoded)
+
+
+def test_numpy_array_binary_serde():
+    a = np.linspace(0.0, 1.0, serde.NUMPY_BINARY_MIN_SIZE).reshape((4, -1))
+    encoded = serde.numpy_encode(a.T)
+    assert set(encoded) == {"dtype", "shape", "buffer"}
+    assert json.dumps(encoded)
+    decoded = serde.numpy_decode(encoded)
+    assert decoded.dtype == a.dtype
+    assert np.array_equal(a.T, decoded)
+    decoded[0, 0] = 2.0  # decoded arrays are writable
+
+
+def test_numpy_array_binary_serde_structured():
+    a = np.zeros(serde.NUMPY_BINARY_MIN_SIZE, dtype=[("x", "i4"), ("y", "f8")])
+    assert isinstance(serde.numpy_encode(a), list)
+
+
+def test_array_serde():
+    for typecode in "bBhHiIlLqQfd":
+        a = array(typecode, range(5))
+        encoded = serde.array_encode(a)
+        assert json.dumps(encoded)
+        decoded = serde.numpy_decode(encoded)
+        assert decoded.dtype.itemsize == a.itemsize
+        assert decoded.tolist() == a.tolist()
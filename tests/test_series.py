@@ -0,0 +1,45 @@
+import math
+import pytest
+from pytest_experiments.series import Series
+
+
+def test_series():
+    series = Series(chunk_size=3)
+    series.append(0, {"loss": 1.0})
+    series.append(1, {"loss": 0.5, "accuracy": 0.9})
+    series.append(2, {})
+    series.append(5, {"accuracy": 1, "lr": 0.1})
+    assert len(series) == 4
+    assert series.names == ["loss", "accuracy", "lr"]
+    arrays = series.arrays()
+    assert list(arrays) == ["step", "loss", "accuracy", "lr"]
+    assert arrays["step"].tolist() == [0, 1, 2, 5]
+    assert arrays["loss"][:2].tolist() == [1.0, 0.5]
+    assert all(map(math.isnan, arrays["loss"][2:]))
+    assert math.isnan(arrays["accuracy"][0])
+    assert arrays["accuracy"][1::2].tolist() == [0.9, 1.0]
+    assert all(map(math.isnan, arrays["lr"][:3]))
+    assert arrays["lr"][3] == 0.1
+    assert [a.tobytes() for a in series.arrays().values()] == [
+        a.tobytes() for a in arrays.values()
+    ]
+    series.close()
+    assert len(series) == 0
+    assert series.arrays() == {"step": arrays["step"][:0]}
+
+
+def test_long_series():
+    series = Series(chunk_size=1000)
+    for step in range(10_500):
+        series.append(step, {"x": step / 2})
+    series.append(10_500, {"y": 1.0})
+    arrays = series.arrays()
+    assert arrays["step"].tolist() == list(range(10_501))
+    assert arrays["x"][:-1].tolist() == [step / 2 for step in range(10_500)]
+    assert sum(1 for y in arrays["y"] if math.isnan(y)) == 10_500
+    series.close()
+
+
+def test_series_chunk_size():
+    with pytest.raises(ValueError):
+        Series(chunk_size=0)
@@ -0,0 +1,330 @@
+import datetime as dt
+import pickle
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, inspect, select
+from pytest_experiments.store import (
+    ExperimentModel,
+    ExperimentValueModel,
+    StorageError,
+    StorageManager,
+    StorageRegistry,
+    experiment_from_payload,
+    experiment_to_payload,
+    initialize_database,
+    is_sqlite,
+)
+from pytest_experiments.json_tools import json_deserializer
+
+
+def make_experiment(i):
+    return ExperimentModel(
+        name=f"test_{i}",
+        outcome="passed",
+        parameters={"i": i},
+        data={},
+    )
+
+
+def test_storage_registry_reuses_stores():
+    registry = StorageRegistry()
+    store = registry.get("sqlite:///:memory:")
+    assert registry.get("sqlite:///:memory:") is store
+    assert registry.get("sqlite://") is not store
+    registry.close()
+    assert registry.get("sqlite:///:memory:") is not store
+    registry.close()
+
+
+def test_experiment_payload_roundtrip():
+    now = dt.datetime.utcnow()
+    experiment = ExperimentModel(
+        name="test_payload",
+        start_time=now,
+        end_time=None,
+        outcome="passed",
+        parameters={"x": np.arange(3)},
+        data={"when": now},
+    )
+    payload = experiment_to_payload(experiment)
+    assert all(
+        value is None or isinstance(value, str) for value in payload.values()
+    )
+    rebuilt = experiment_from_payload(payload)
+    assert rebuilt.name == "test_payload"
+    assert rebuilt.start_time == now
+    assert rebuilt.end_time is None
+    assert np.array_equal(rebuilt.parameters["x"], np.arange(3))
+    assert rebuilt.data == {"when": now}
+
+
+def test_sqlite_fast_profile(tmp_path):
+    store = StorageManager(
+        f"sqlite:///{tmp_path / 'experiments.db'}", sqlite_fast=True
+    )
+    with store.engine.connect() as connection:
+        journal_mode = connection.exec_driver_sql("PRAGMA journal_mode")
+        assert journal_mode.scalar() == "wal"
+        synchronous = connection.exec_driver_sql("PRAGMA synchronous")
+        assert synchronous.scalar() == 1  # NORMAL
+        first = connection.connection.dbapi_connection
+    with store.engine.connect() as connection:
+        assert connection.connection.dbapi_connection is first
+    store.record_experiment(make_experiment(0))
+    assert len(store.get_all_experiments()) == 1
+    store.dispose()
+
+
+def test_sqlite_fast_profile_ignores_other_databases():
+    assert is_sqlite("sqlite:///experiments.db")
+    assert not is_sqlite("postgresql://localhost/experiments")
+
+
+PROMOTED = ("parameters.i", "parameters.lr", "parameters.opt", "data.loss")
+
+
+@pytest.fixture(params=[(), PROMOTED], ids=["json", "promoted"])
+def populated_store(request):
+    store = StorageManager("sqlite:///:memory:", promote=request.param)
+    start = dt.datetime(2021, 12, 1)
+    store.record_experiments(
+        ExperimentModel(
+            name=f"test_model.py::test_fit[{i}]",
+            start_time=start + dt.timedelta(days=i),
+            end_time=start + dt.timedelta(days=i, hours=1),
+            outcome="passed" if i % 3 else "failed",
+            parameters={"i": i, "lr": 0.1 if i < 5 else 0.01, "opt": "sgd"},
+            data={"loss": 1.0 / (i + 1)},
+        )
+        for i in range(10)
+    )
+    store.record_experiment(
+        ExperimentModel(
+            name="test_other.py::test_100%_[x]",
+            start_time=start,
+            outcome="passed",
+            parameters={},
+            data={},
+        )
+    )
+    return store
+
+
+def test_query_experiments_streams_models(populated_store):
+    experiments = populated_store.query_experiments(batch_size=3)
+    assert not isinstance(experiments, list)
+    assert len(list(experiments)) == 11
+
+
+def test_query_experiments_filters(populated_store):
+    def names(**criteria):
+        return [
+            e.name.split("[")[1].rstrip("]")
+            for e in populated_store.query_experiments(**criteria)
+        ]
+
+    assert names(name="test_model.py::*") == [str(i) for i in range(10)]
+    assert names(name="test_model.py::test_fit[?]", outcome="failed") == [
+        "0",
+        "3",
+        "6",
+        "9",
+    ]
+    assert names(name="*100%_*") == ["x"]
+    assert names(name="*1_0*") == []
+    assert names(
+        since=dt.datetime(2021, 12, 3), until=dt.datetime(2021, 12, 5)
+    ) == ["2", "3"]
+    assert names(parameters={"lr": 0.01, "opt": "sgd"}) == [
+        "5",
+        "6",
+        "7",
+        "8",
+        "9",
+    ]
+    assert names(parameters={"i": [1, 2]}) == ["1", "2"]
+    assert names(outcome=["passed", "failed"], limit=2) == ["0", "1"]
+
+
+def test_query_experiments_columns(populated_store):
+    rows = list(
+        populated_store.query_experiments(
+            columns=["name", "parameters.lr", "data.loss"],
+            parameters={"i": 1},
+        )
+    )
+    assert [tuple(row) for row in rows] == [
+        ("test_model.py::test_fit[1]", 0.1, 0.5)
+    ]
+    assert rows[0]._mapping["data.loss"] == 0.5
+
+
+@pytest.mark.parametrize(
+    "criteria",
+    [
+        {"columns": ["nope"]},
+        {"columns": ["name.key"]},
+        {"parameters": {"x": None}},
+        {"parameters": {"x": [1, "a"]}},
+    ],
+)
+def test_query_experiments_errors(populated_store, criteria):
+    with pytest.raises(StorageError):
+        list(populated_store.query_experiments(**criteria))
+
+
+def test_promoted_values_are_recorded(populated_store):
+    if not populated_store.promote:
+        pytest.skip("no promoted keys")
+    with populated_store.create_session() as session:
+        values = session.execute(
+            select(ExperimentValueModel).where(
+                ExperimentValueModel.experiment_id == 2
+            )
+        ).scalars()
+        assert {(v.source, v.key, v.number, v.text) for v in values} == {
+            ("parameters", "i", 1.0, None),
+            ("parameters", "lr", 0.1, None),
+            ("parameters", "opt", None, "sgd"),
+            ("data", "loss", 0.5, None),
+        }
+
+
+def test_invalid_promoted_key():
+    with pytest.raises(StorageError):
+        StorageManager("sqlite:///:memory:", promote=["lr"])
+
+
+def test_migrate_existing_database(tmp_path):
+    db_uri = f"sqlite:///{tmp_path / 'experiments.db'}"
+    engine = create_engine(db_uri)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE experiments ("
+            "id INTEGER PRIMARY KEY, start_time DATETIME, end_time DATETIME,"
+            "name TEXT NOT NULL, outcome TEXT NOT NULL,"
+            "parameters JSON NOT NULL, data JSON NOT NULL)"
+        )
+        for i, lr in enumerate([0.1, 0.01, 0.01]):
+            connection.exec_driver_sql(
+                "INSERT INTO experiments (name, outcome, parameters, data) "
+                f"VALUES ('test_{i}', 'passed', '{{\"lr\": {lr}}}', '{{}}')"
+            )
+    engine.dispose()
+
+    store = StorageManager(db_uri, promote=["parameters.lr"])
+    inspector = inspect(store.engine)
+    assert {ix["name"] for ix in inspector.get_indexes("experiments")} == {
+        "ix_experiments_name_start_time",
+        "ix_experiments_outcome",
+        "ix_experiments_fingerprint",
+        "ix_experiments_run_id",
+        "ix_experiments_name_parameters_digest",
+    }
+    columns = {c["name"] for c in inspector.get_columns("experiments")}
+    assert {"fingerprint", "run_id", "parameters_digest"} <= columns
+    assert inspector.has_table("experiment_values")
+    assert inspector.has_table("runs")
+
+    assert store.backfill_promoted_values(batch_size=2) == 3
+    assert store.backfill_promoted_values() == 0
+    selected = store.query_experiments(parameters={"lr": 0.01})
+    assert [e.name for e in selected] == ["test_1", "test_2"]
+
+
+def test_concurrent_schema_creation_is_retried(tmp_path, monkeypatch):
+    db_uri = f"sqlite:///{tmp_path / 'experiments.db'}"
+    attempts = []
+
+    def racing_initialize_database(engine):
+        # another process creates the schema while this one inspects it
+        attempts.append(engine)
+        if len(attempts) == 1:
+            initialize_database(create_engine(db_uri))
+            with engine.begin() as connection:
+                connection.exec_driver_sql("CREATE TABLE runs (id TEXT)")
+        initialize_database(engine)
+
+    monkeypatch.setattr(
+        "pytest_experiments.store.initialize_database",
+        racing_initialize_database,
+    )
+    monkeypatch.setattr("pytest_experiments.store.SCHEMA_RETRY_DELAY", 0)
+    store = StorageManager(db_uri)
+    assert len(attempts) == 2
+    assert store.get_all_experiments() == []
+
+
+def test_lazy_rows(tmp_path, monkeypatch):
+    store = StorageManager(f"sqlite:///{tmp_path / 'experiments.db'}")
+    store.record_experiments(
+        ExperimentModel(
+            name=f"test_{i}",
+            start_time=dt.datetime(2024, 1, 1, i),
+            outcome="passed",
+            parameters={"i": i},
+            data={"loss": np.arange(i)},
+        )
+        for i in range(3)
+    )
+    decoded = []
+
+    def deserializer(value):
+        decoded.append(value)
+        return json_deserializer(value)
+
+    monkeypatch.setattr(
+        "pytest_experiments.store.json_deserializer", deserializer
+    )
+    rows = store.get_all_experiments(lazy=True)
+    assert [(row.name, row.outcome) for row in rows] == [
+        (f"test_{i}", "passed") for i in range(3)
+    ]
+    assert rows[1].start_time == dt.datetime(2024, 1, 1, 1)
+    assert rows[1].series is None
+    assert decoded == []
+    assert rows[2].parameters == {"i": 2}
+    assert rows[2].parameters is rows[2].parameters
+    assert len(decoded) == 1
+    assert np.array_equal(rows[2].data["loss"], np.arange(2))
+    assert len(decoded) == 2
+    with pytest.raises(AttributeError):
+        rows[0].missing
+
+    (row,) = store.query_experiments(name="test_1", lazy=True)
+    assert repr(row) == "ExperimentRow(id=2, name='test_1')"
+    assert row.parameters == {"i": 1}
+    (row,) = store.query_experiments(name="test_1", columns=["id"], lazy=True)
+    assert row.id == 2
+
+
+def test_rows_are_immutable_records(tmp_path):
+    store = StorageManager(f"sqlite:///{tmp_path / 'experiments.db'}")
+    start = dt.datetime(2024, 1, 1)
+    store.record_experiment(
+        ExperimentModel(
+            name="test_record",
+            start_time=start,
+            end_time=start,
+            outcome="passed",
+            parameters={"lr": 0.1},
+            data={"loss": 1.0},
+        )
+    )
+    (row,) = store.get_all_experiments(lazy=True)
+    (model,) = store.get_all_experiments()
+    assert row.start_time_tz == model.start_time_tz
+    assert row.end_time_tz.tzinfo is dt.timezone.utc
+    assert row._asdict()["data"] == {"loss": 1.0}
+    assert row._fields[:3] == ("id", "start_time", "end_time")
+    with pytest.raises(AttributeError):
+        row.name = "test_other"
+    with pytest.raises(AttributeError):
+        del row.name
+    with pytest.raises(AttributeError):
+        row.other = 1
+    assert not hasattr(row, "__dict__")
+    clone = pickle.loads(pickle.dumps(row))
+    assert clone == row
+    assert hash(clone) == hash(row)
+    assert clone.parameters == {"lr": 0.1}
@@ -0,0 +1,45 @@
+import pytest
+from pytest_experiments.timing import Timer, benchmark, summarize
+from array import array
+
+
+def test_summarize():
+    stats = summarize([5, 1, 4, 2, 3])
+    assert stats["count"] == 5
+    assert stats["total"] == 15
+    assert stats["mean"] == 3
+    assert stats["min"] == 1
+    assert stats["max"] == 5
+    assert stats["median"] == 3
+    assert stats["q1"] == 2
+    assert stats["q3"] == 4
+    assert stats["iqr"] == 2
+    assert summarize([1, 2])["median"] == 1.5
+
+
+def test_timer():
+    samples = array("q")
+    timer = Timer(samples)
+    with timer:
+        with timer:
+            pass
+
+    @timer
+    def square(x):
+        """Square x."""
+        return x * x
+
+    assert square(3) == 9
+    assert square.__name__ == "square"
+    assert len(samples) == 3
+    assert samples[1] >= samples[0] >= 0
+
+
+def test_benchmark():
+    calls = []
+    samples = benchmark(lambda: calls.append(1), repeat=10, warmup=3)
+    assert len(calls) == 13
+    assert len(samples) == 10
+    assert all(sample >= 0 for sample in samples)
+    with pytest.raises(ValueError):
+        benchmark(lambda: None, repeat=0, warmup=0)
@@ -0,0 +1,117 @@
+import pytest
+from pytest_experiments.store import StorageManager, ExperimentModel
+from pytest_experiments.writers import (
+    BufferedWriter,
+    BackgroundWriter,
+    WriterError,
+)
+
+
+def make_experiment(i):
+    return ExperimentModel(
+        name=f"test_{i}",
+        outcome="passed",
+        parameters={"i": i},
+        data={},
+    )
+
+
+def test_buffered_writer_flush_every():
+    store = StorageManager("sqlite:///:memory:")
+    writer = BufferedWriter(store, flush_every=2)
+    writer.record_experiment(make_experiment(0))
+    assert writer.pending == 1
+    assert store.get_all_experiments() == []
+    writer.record_experiment(make_experiment(1))
+    assert writer.pending == 0
+    assert [e.name for e in store.get_all_experiments()] == [
+        "test_0",
+        "test_1",
+    ]
+    writer.record_experiment(make_experiment(2))
+    writer.close()
+    assert len(store.get_all_experiments()) == 3
+
+
+def test_buffered_writer_flush_interval():
+    store = StorageManager("sqlite:///:memory:")
+    writer = BufferedWriter(store, flush_interval=0.0)
+    writer.record_experiment(make_experiment(0))
+    assert writer.pending == 0
+    assert len(store.get_all_experiments()) == 1
+
+
+def test_buffered_writer_is_bounded():
+    store = StorageManager("sqlite:///:memory:")
+    writer = BufferedWriter(store, flush_every=100, max_pending=3)
+    for i in range(3):
+        writer.record_experiment(make_experiment(i))
+    assert writer.pending == 0
+    assert len(store.get_all_experiments()) == 3
+
+
+def test_buffered_writer_validation():
+    store = StorageManager("sqlite:///:memory:")
+    with pytest.raises(WriterError):
+        BufferedWriter(store, flush_every=0)
+
+
+def test_buffered_writer_collects_close_errors():
+    class BrokenStore(StorageManager):
+        def record_experiments(self, experiments):
+            raise RuntimeError("database is gone")
+
+    writer = BufferedWriter(BrokenStore("sqlite:///:memory:"), flush_every=10)
+    for i in range(3):
+        writer.record_experiment(make_experiment(i))
+    writer.close()
+    assert [failure.experiments for failure in writer.errors] == [3]
+    assert isinstance(writer.errors[0].error, RuntimeError)
+
+
+def test_background_writer(tmp_path):
+    store = StorageManager(f"sqlite:///{tmp_path / 'experiments.db'}")
+    writer = BackgroundWriter(store, batch_size=2)
+    for i in range(5):
+        writer.record_experiment(make_experiment(i))
+    writer.flush()
+    assert len(store.get_all_experiments()) == 5
+    writer.record_experiment(make_experiment(5))
+    writer.close()
+    assert len(store.get_all_experiments()) == 6
+    assert writer.errors == []
+
+
+def test_background_writer_collects_errors(tmp_path):
+    class BrokenStore(StorageManager):
+        def record_experiments(self, experiments):
+            raise RuntimeError("database is gone")
+
+    store = BrokenStore(f"sqlite:///{tmp_path / 'experiments.db'}")
+    writer = BackgroundWriter(store, batch_size=10)
+    for i in range(3):
+        writer.record_experiment(make_experiment(i))
+    writer.close()
+    assert sum(failure.experiments for failure in writer.errors) == 3
+    assert all(
+        isinstance(failure.error, RuntimeError) for failure in writer.errors
+    )
+
+
+def test_background_writer_survives_initialization_errors(
+    tmp_path, monkeypatch
+):
+    def initialize_database(engine):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(
+        "pytest_experiments.writers.initialize_database", initialize_database
+    )
+    store = StorageManager(f"sqlite:///{tmp_path / 'experiments.db'}")
+    writer = BackgroundWriter(store, batch_size=10)
+    for i in range(3):
+        writer.record_experiment(make_experiment(i))
+    writer.flush()
+    writer.close()
+    assert sum(failure.experiments for failure in writer.errors) == 3
+    assert store.get_all_experiments() == []